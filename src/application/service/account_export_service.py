@@ -0,0 +1,104 @@
+import csv
+import json
+import os
+import threading
+from typing import Callable, Optional, TextIO
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from infrastructure.repository.persistent.account_queries import ACCOUNT_COLUMNS
+
+CSV = "csv"
+JSONL = "jsonl"
+EXPORT_FORMATS = (CSV, JSONL)
+
+# Rows fetched from the cursor and written per batch
+EXPORT_BATCH_SIZE = 10000
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def export_format(path: str) -> str:
+    """Export format chosen by the file extension, CSV by default."""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    return JSONL if extension in (JSONL, "ndjson") else CSV
+
+
+def export_accounts(
+    session_factory: sessionmaker,
+    path: str,
+    file_format: str = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    progress: Optional[ProgressCallback] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> int:
+    """Streams every account, in id order, to a CSV or JSONL file and
+    returns the number of rows written.
+
+    Rows come from a server side cursor `batch_size` at a time and each
+    batch is written as soon as it arrives, so memory use does not
+    depend on the size of the table. `progress` is called after every
+    batch with (rows written, total rows). Setting `cancelled` stops
+    the export after the current batch.
+    The file is written under a temporary name and only replaces `path`
+    once complete, so a failed or cancelled export leaves no partial
+    file behind."""
+
+    file_format = file_format or export_format(path)
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {file_format}")
+
+    names = [column.key for column in ACCOUNT_COLUMNS]
+    partial_path = path + ".part"
+    written = 0
+    try:
+        with session_factory() as session, _open_output(partial_path) as file:
+            total = session.scalar(select(func.count()).select_from(AccountEntity))
+            result = session.execute(
+                select(*ACCOUNT_COLUMNS).order_by(AccountEntity.id),
+                execution_options={"yield_per": batch_size},
+            )
+
+            if file_format == CSV:
+                writer = csv.writer(file)
+                writer.writerow(names)
+                write_batch = writer.writerows
+            else:
+                dumps = json.JSONEncoder(ensure_ascii=False).encode
+
+                def write_batch(rows):
+                    file.write(
+                        "".join(dumps(dict(zip(names, row))) + "\n" for row in rows)
+                    )
+
+            for batch in result.partitions():
+                if cancelled is not None and cancelled.is_set():
+                    result.close()
+                    break
+                write_batch(batch)
+                written += len(batch)
+                if progress is not None:
+                    progress(written, max(total, written))
+    except BaseException:
+        _remove(partial_path)
+        raise
+
+    if cancelled is not None and cancelled.is_set():
+        _remove(partial_path)
+    else:
+        os.replace(partial_path, path)
+    return written
+
+
+def _open_output(path: str) -> TextIO:
+    return open(path, "w", newline="", encoding="utf-8", buffering=WRITE_BUFFER_SIZE)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
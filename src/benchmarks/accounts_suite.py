@@ -0,0 +1,275 @@
+"""Benchmarks the account model and data access hot paths on generated
+databases, and writes the results as JSON to compare across commits.
+
+Datasets come from ui.create_database with a fixed seed, so every run
+measures the same rows. They are generated once per size and kept in
+--data-dir; each run works on a copy, as editing writes to it.
+
+Run from the src directory:
+    python -m benchmarks.accounts_suite --output results.json
+    python -m benchmarks.accounts_suite --sizes 10000 100000 --output results.json
+    python -m benchmarks.compare baseline.json results.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+# Headless: no window is ever shown
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import PYQT_VERSION_STR, QT_VERSION_STR, Qt
+from PyQt6.QtGui import QStandardItemModel
+from PyQt6.QtWidgets import QApplication
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from application.service.account_export_service import export_accounts
+from benchmarks.table_model_storage import measure_data
+from infrastructure.repository.persistent.account_queries import SELECT_ALL_ACCOUNTS
+from infrastructure.repository.persistent.db_manager import set_sqlite_pragmas
+from ui.accounts.account_page_loader import AccountsPageLoader
+from ui.accounts.account_write_behind import AccountsWriteBehind
+from ui.accounts.accounts_table_model import AccountsTableModel
+from ui.create_database import create_database, create_database_engine
+from ui.model_view_ex import load_csv_model
+
+SIZES = (10_000, 100_000, 1_000_000)
+SEED = 42
+DATA_DIR = os.path.join(tempfile.gettempdir(), "pyqt-benchmarks")
+
+# Timings are the fastest of this many runs, which is the least
+# disturbed by whatever else the machine is doing
+REPEAT = 5
+# A viewport of this many rows repainted this many times per data() run
+VISIBLE_ROWS = 50
+REPAINTS = 200
+# Edits per setData run, each followed by a flush of the write behind
+EDITS = 50
+# Loading QStandardItems is slow and memory hungry; larger sizes skip it
+CSV_MAX_ROWS = 100_000
+
+FIRST_NAME = 2
+EDIT_NAMES = ("Ada", "Grace")
+
+LOWER = "lower"
+HIGHER = "higher"
+
+
+def metric(value: float, unit: str, better: str = LOWER) -> Dict:
+    return {"value": value, "unit": unit, "better": better}
+
+
+def best_time(run: Callable[[], object], repeat: int = REPEAT) -> float:
+    """Fewest seconds taken by `run`."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def calibrate() -> float:
+    """Seconds for a fixed pure Python workload: how fast this machine
+    is at the moment, for benchmarks.compare --normalize."""
+    values = [(value * 2654435761) % 1000003 for value in range(200_000)]
+    return best_time(lambda: sorted(map(str, values)))
+
+
+def dataset(rows: int, data_dir: str = DATA_DIR) -> str:
+    """Path of the generated database with `rows` accounts, created the
+    first time it is asked for."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"accounts-{rows}-{SEED}.db")
+    if not os.path.exists(path):
+        partial = path + ".part"
+        engine = create_database_engine(f"sqlite:///{partial}")
+        create_database(engine, rows, SEED)
+        engine.dispose()
+        os.replace(partial, path)
+    return path
+
+
+def load_all(session_factory: sessionmaker) -> AccountsTableModel:
+    model = AccountsTableModel()
+    with session_factory() as session:
+        model.append_rows(session.execute(SELECT_ALL_ACCOUNTS).all())
+    return model
+
+
+def load_first_page(session_factory: sessionmaker) -> AccountsTableModel:
+    with session_factory() as session:
+        model = AccountsTableModel(page_loader=AccountsPageLoader(session))
+        model.fetchMore()
+    return model
+
+
+def load_paged(session_factory: sessionmaker) -> AccountsTableModel:
+    """Every page, the way a view scrolling to the end reads them."""
+    with session_factory() as session:
+        model = AccountsTableModel(page_loader=AccountsPageLoader(session))
+        while model.canFetchMore():
+            model.fetchMore()
+    return model
+
+
+def measure_loads(session_factory: sessionmaker) -> Dict[str, Dict]:
+    return {
+        "full_load": metric(best_time(lambda: load_all(session_factory)), "s"),
+        "first_page": metric(
+            best_time(lambda: load_first_page(session_factory)) * 1000, "ms"
+        ),
+        "paged_load": metric(
+            best_time(lambda: load_paged(session_factory), repeat=1), "s"
+        ),
+    }
+
+
+def measure_sorts(session_factory: sessionmaker) -> Dict[str, Dict]:
+    """In memory sort of a fully loaded model, per column. The first
+    sort on a column builds its cached permutation, later ones reuse
+    it, so both are reported."""
+    results = {}
+    model = load_all(session_factory)
+    descending = Qt.SortOrder.DescendingOrder
+    for column in range(model.columnCount()):
+        name = model.headerData(column, Qt.Orientation.Horizontal)
+        name = name.lower().replace(" ", "_").rstrip(".")
+
+        def cold():
+            model.sort_cache.clear()
+            model.sort(column, descending)
+
+        results[f"sort_{name}_cold"] = metric(best_time(cold) * 1000, "ms")
+        results[f"sort_{name}_warm"] = metric(
+            best_time(lambda: model.sort(column, descending)) * 1000, "ms"
+        )
+    return results
+
+
+def measure_edits(session_factory: sessionmaker) -> Dict[str, Dict]:
+    """setData on the first page, then the write behind's flush, which
+    writes and commits the edit."""
+    write_behind = AccountsWriteBehind(session_factory)
+    with session_factory() as session:
+        model = AccountsTableModel(
+            page_loader=AccountsPageLoader(session), write_behind=write_behind
+        )
+        model.fetchMore()
+
+    set_data, commits = [], []
+    for edit in range(EDITS):
+        index = model.index(edit % model.rowCount(), FIRST_NAME)
+        started = time.perf_counter()
+        model.setData(index, EDIT_NAMES[edit % 2] + str(edit))
+        set_data.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        write_behind.flush()
+        commits.append(time.perf_counter() - started)
+    write_behind.timer.stop()
+
+    return {
+        "set_data": metric(statistics.median(set_data) * 1e6, "us"),
+        "commit": metric(statistics.median(commits) * 1000, "ms"),
+        "commit_p95": metric(statistics.quantiles(commits, n=20)[-1] * 1000, "ms"),
+    }
+
+
+def measure_csv(session_factory: sessionmaker, directory: str) -> Dict[str, Dict]:
+    """Export of every account to CSV, and loading that file into the
+    item model of the CSV viewer."""
+    path = os.path.join(directory, "accounts.csv")
+    results = {
+        "csv_export": metric(
+            best_time(lambda: export_accounts(session_factory, path)), "s"
+        )
+    }
+
+    def load():
+        load_csv_model(QStandardItemModel(), path)
+
+    results["csv_load"] = metric(best_time(load), "s")
+    return results
+
+
+def run_size(rows: int, data_dir: str) -> Dict[str, Dict]:
+    source = dataset(rows, data_dir)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "accounts.db")
+        shutil.copyfile(source, path)
+        engine = create_engine(f"sqlite:///{path}")
+        set_sqlite_pragmas(engine)
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+
+        results = {}
+        model = load_all(session_factory)
+        results["data_calls"] = metric(
+            measure_data(model, VISIBLE_ROWS, REPAINTS), "calls/s", HIGHER
+        )
+        del model
+        results.update(measure_loads(session_factory))
+        results.update(measure_sorts(session_factory))
+        results.update(measure_edits(session_factory))
+        if rows <= CSV_MAX_ROWS:
+            results.update(measure_csv(session_factory, directory))
+        engine.dispose()
+    return results
+
+
+def environment() -> Dict[str, str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "qt": QT_VERSION_STR,
+        "pyqt": PYQT_VERSION_STR,
+        "machine": platform.platform(),
+        "cpus": os.cpu_count(),
+        "calibration_s": calibrate(),
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--output", help="JSON file, printed when not given")
+    args = parser.parse_args(argv)
+
+    _ = QApplication([])
+
+    report = {"environment": environment(), "results": {}}
+    for rows in args.sizes:
+        print(f"[INFO] {rows:,} rows", file=sys.stderr)
+        report["results"][str(rows)] = run_size(rows, args.data_dir)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
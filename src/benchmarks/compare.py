@@ -0,0 +1,112 @@
+"""Compares two accounts_suite JSON results and flags regressions.
+
+Run from the src directory:
+    python -m benchmarks.compare baseline.json results.json --threshold 10
+
+Exits with 1 when any metric got worse by more than the threshold.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, NamedTuple
+
+# Percent a metric may get worse before it counts as a regression;
+# timings of a few milliseconds move this much between runs
+THRESHOLD = 10.0
+
+
+class Change(NamedTuple):
+    rows: str
+    name: str
+    old: float
+    new: float
+    unit: str
+    # Positive is better, negative worse, in percent of the old value
+    percent: float
+
+
+def load(path: str) -> Dict:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def speed_ratio(old: Dict, new: Dict) -> float:
+    """How much slower the machine was for `new` than for `old`, from
+    the calibration both runs made; 1.0 when either lacks it."""
+    old_time = old["environment"].get("calibration_s")
+    new_time = new["environment"].get("calibration_s")
+    if not old_time or not new_time:
+        return 1.0
+    return new_time / old_time
+
+
+def compare(old: Dict, new: Dict, ratio: float = 1.0) -> List[Change]:
+    """Changes of every metric measured in both results. New values
+    are divided by `ratio`, or multiplied for metrics where higher is
+    better, to take out a difference in machine speed."""
+    changes = []
+    for rows, metrics in new["results"].items():
+        old_metrics = old["results"].get(rows, {})
+        for name, current in metrics.items():
+            previous = old_metrics.get(name)
+            if previous is None or not previous["value"]:
+                continue
+            value = current["value"]
+            value = value / ratio if current["better"] == "lower" else value * ratio
+            percent = (value - previous["value"]) / previous["value"] * 100
+            if current["better"] == "lower":
+                percent = -percent
+            changes.append(
+                Change(
+                    rows,
+                    name,
+                    previous["value"],
+                    value,
+                    current["unit"],
+                    percent,
+                )
+            )
+    return changes
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old", help="Baseline results")
+    parser.add_argument("new", help="Results to check")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument(
+        "--normalize",
+        action="store_true",
+        help="Scale the new results by the machine speed of both runs",
+    )
+    args = parser.parse_args(argv)
+
+    old, new = load(args.old), load(args.new)
+    ratio = speed_ratio(old, new) if args.normalize else 1.0
+    changes = compare(old, new, ratio)
+    print(f"{old['environment'].get('commit')} -> {new['environment'].get('commit')}")
+    if args.normalize:
+        print(f"[INFO] New run's machine {ratio:.2f}x as slow, values scaled")
+    print(
+        f"{'rows':>9}  {'metric':<24}{'old':>14}{'new':>14}  {'unit':<8}{'change':>9}"
+    )
+    regressions = []
+    for change in changes:
+        flag = ""
+        if change.percent < -args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(change)
+        print(
+            f"{int(change.rows):>9,}  {change.name:<24}{change.old:>14,.3f}"
+            f"{change.new:>14,.3f}  {change.unit:<8}{change.percent:>+8.1f}%{flag}"
+        )
+    print(
+        f"[INFO] {len(regressions)} of {len(changes)} metrics worse by more "
+        f"than {args.threshold:g}%"
+    )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Compares the column store backed AccountsTableModel with the
+list-of-objects model it replaced.
+
+Run from the src directory:
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.table_model_storage --rows 1000000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt6.QtWidgets import QApplication
+
+from ui.accounts.accounts_table_model import AccountsTableItemModel, AccountsTableModel
+
+DEPARTMENTS = ["Production", "R&D", "Marketing", "HR", "Finance", "Engineering"]
+FIRST_NAMES = ["Emma", "Olivia", "Ava", "Liam", "Noah", "William", "James", "Mia"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Lee"]
+
+
+class ListAccountsTableModel(QAbstractTableModel):
+    """The previous list-of-objects model, kept here as the baseline."""
+
+    def __init__(self, accounts):
+        super().__init__()
+        self.accounts = accounts
+
+    def data(self, index, role):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        account = self.accounts[index.row()]
+        if index.column() == 0:
+            return account.id
+        if index.column() == 1:
+            return account.employee_id
+        if index.column() == 2:
+            return account.first_name
+        if index.column() == 3:
+            return account.last_name
+        if index.column() == 4:
+            return account.email
+        if index.column() == 5:
+            return account.department
+        if index.column() == 6:
+            return account.country_id
+        return None
+
+    def rowCount(self, index=QModelIndex()):
+        return len(self.accounts)
+
+    def columnCount(self, index=QModelIndex()):
+        return 7
+
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        name = [
+            "id",
+            "employee_id",
+            "first_name",
+            "last_name",
+            "email",
+            "department",
+            "country_id",
+        ][column]
+        self.accounts.sort(
+            key=lambda i: getattr(i, name),
+            reverse=order == Qt.SortOrder.DescendingOrder,
+        )
+        self.layoutChanged.emit()
+
+
+def make_rows(count: int):
+    for i in range(count):
+        first = FIRST_NAMES[i % len(FIRST_NAMES)]
+        # Every first name meets every last name, so both columns vary
+        last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        yield (
+            i + 1,
+            1000 + i,
+            first,
+            last,
+            f"{last}.{first}{i}@job.com".lower(),
+            DEPARTMENTS[i % len(DEPARTMENTS)],
+            i % 5 + 1,
+        )
+
+
+def build_list_model(count: int):
+    return ListAccountsTableModel(
+        [AccountsTableItemModel(*row) for row in make_rows(count)]
+    )
+
+
+def build_column_model(count: int):
+    model = AccountsTableModel()
+    model.store.extend_rows(make_rows(count))
+    return model
+
+
+def measure_memory(builder, count: int):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = builder(count)
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return model, current, elapsed
+
+
+def measure_data(model, visible_rows: int, repaints: int):
+    """Simulates repaints of a viewport of `visible_rows` rows."""
+    indexes = [
+        model.index(row, column)
+        for row in range(visible_rows)
+        for column in range(model.columnCount())
+    ]
+    role = Qt.ItemDataRole.DisplayRole
+    data = model.data
+    start = time.perf_counter()
+    for _ in range(repaints):
+        for index in indexes:
+            data(index, role)
+    elapsed = time.perf_counter() - start
+    return len(indexes) * repaints / elapsed
+
+
+def measure_sort(model):
+    start = time.perf_counter()
+    for column in range(model.columnCount()):
+        model.sort(column, Qt.SortOrder.AscendingOrder)
+    return (time.perf_counter() - start) / model.columnCount()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--visible-rows", type=int, default=50)
+    parser.add_argument("--repaints", type=int, default=200)
+    args = parser.parse_args()
+
+    _ = QApplication([])
+
+    print(
+        f"{'model':<10}{'memory MB':>12}{'build s':>10}{'data() calls/s':>18}{'sort s':>10}"
+    )
+    for name, builder in (("list", build_list_model), ("column", build_column_model)):
+        model, memory, build_time = measure_memory(builder, args.rows)
+        calls = measure_data(model, args.visible_rows, args.repaints)
+        sort_time = measure_sort(model)
+        print(
+            f"{name:<10}{memory / 2**20:>12.1f}{build_time:>10.2f}"
+            f"{calls:>18,.0f}{sort_time:>10.2f}"
+        )
+        del model
+
+
+if __name__ == "__main__":
+    main()
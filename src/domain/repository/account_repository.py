@@ -0,0 +1,102 @@
+import abc
+import datetime
+from typing import (
+    Any,
+    AsyncIterator,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+# One account as a mapping of column name to value, the unit the bulk
+# methods work in; a page row is a sequence in table column order
+AccountValues = Mapping[str, Any]
+
+
+class AbstractAccountRepository(abc.ABC):
+    """Set based access to accounts. Every method works on many rows
+    per statement; there is deliberately no per-row get or save."""
+
+    @abc.abstractmethod
+    async def add_many(self, accounts: Iterable[AccountValues]) -> int:
+        """Inserts the accounts, returning how many were inserted."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def upsert_many(self, accounts: Iterable[AccountValues]) -> int:
+        """Inserts the accounts, updating those whose id exists."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def delete_many(self, ids: Iterable[int]) -> None:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def count(self) -> int:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def fetch_page(
+        self,
+        after: Optional[Tuple],
+        limit: int,
+        sort_column: int = 0,
+        descending: bool = False,
+        nulls: bool = False,
+    ) -> List[Sequence]:
+        """Next `limit` accounts in (sort column, id) order after the
+        (sort value, id) pair `after`."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def stream_page(
+        self,
+        after: Optional[Tuple],
+        limit: int,
+        sort_column: int = 0,
+        descending: bool = False,
+        nulls: bool = False,
+        chunk_size: int = 64,
+    ) -> AsyncIterator[List[Sequence]]:
+        """Like fetch_page(), yielding the page in chunks as it arrives."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def fetch_matching(self, prefix: str) -> List[Sequence]:
+        """Accounts whose employee id, first name, last name or email
+        starts with the lower cased `prefix`."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def iterate(self, batch_size: int = 10000) -> AsyncIterator[List[Sequence]]:
+        """Yields every account in id order, `batch_size` at a time."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def fetch_changes(
+        self, since: Optional[datetime.datetime]
+    ) -> Tuple[List[Sequence], List[Sequence]]:
+        """Accounts changed after `since`, each row followed by its
+        last_updated_on, and (id, deleted_on) of the accounts deleted
+        after it. Everything when `since` is None."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def last_change(self) -> Optional[datetime.datetime]:
+        """Time of the latest change or delete, where a change feed
+        starts from."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    async def database_time(self) -> datetime.datetime:
+        """Current time on the clock that stamps the changes."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def invalidate(self) -> None:
+        """Forgets cached reads, for when changes written elsewhere,
+        such as by another process, have been found."""
+        raise NotImplementedError()
@@ -0,0 +1,130 @@
+import datetime
+
+from sqlalchemy import (
+    Column,
+    Connection,
+    DateTime,
+    Integer,
+    delete,
+    func,
+    inspect,
+    text,
+)
+
+from infrastructure.repository.persistent.account_entity import (
+    CHANGES_INDEX,
+    AccountEntity,
+)
+from infrastructure.repository.persistent.db_model_base import Base
+
+# Tombstones older than this are pruned by prune_tombstones(); a
+# change feed that has not polled for longer misses those deletes
+TOMBSTONE_RETENTION = datetime.timedelta(days=7)
+
+# Columns whose changes are tracked, everything but the id and stamp
+TRACKED_COLUMNS = (
+    "employee_id",
+    "first_name",
+    "last_name",
+    "email",
+    "department",
+    "country_id",
+)
+
+
+class AccountTombstoneEntity(Base):
+    """One row per deleted account, so readers polling for changes
+    can tell which rows to drop."""
+
+    __tablename__ = "account_tombstones"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    deleted_on = Column(
+        DateTime(timezone=True), nullable=False, index=True, server_default=func.now()
+    )
+
+
+SQLITE_TRIGGERS = (
+    # Writers that do not set the stamp themselves, such as other
+    # tools or raw SQL, still advance it
+    f"""CREATE TRIGGER IF NOT EXISTS accounts_stamp_update
+    AFTER UPDATE OF {", ".join(TRACKED_COLUMNS)} ON accounts
+    WHEN NEW.last_updated_on IS OLD.last_updated_on
+    BEGIN
+        UPDATE accounts SET last_updated_on = CURRENT_TIMESTAMP
+        WHERE id = NEW.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS accounts_stamp_insert
+    AFTER INSERT ON accounts
+    WHEN NEW.last_updated_on IS NULL
+    BEGIN
+        UPDATE accounts SET last_updated_on = CURRENT_TIMESTAMP
+        WHERE id = NEW.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS accounts_tombstone
+    AFTER DELETE ON accounts
+    BEGIN
+        INSERT OR REPLACE INTO account_tombstones (id, deleted_on)
+        VALUES (OLD.id, CURRENT_TIMESTAMP);
+    END""",
+)
+
+POSTGRESQL_TRIGGERS = (
+    """CREATE OR REPLACE FUNCTION accounts_stamp() RETURNS trigger AS $$
+    BEGIN
+        NEW.last_updated_on := now();
+        RETURN NEW;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION accounts_tombstone() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO account_tombstones (id, deleted_on) VALUES (OLD.id, now())
+        ON CONFLICT (id) DO UPDATE SET deleted_on = EXCLUDED.deleted_on;
+        RETURN OLD;
+    END $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS accounts_stamp ON accounts",
+    """CREATE TRIGGER accounts_stamp BEFORE INSERT OR UPDATE ON accounts
+    FOR EACH ROW EXECUTE FUNCTION accounts_stamp()""",
+    "DROP TRIGGER IF EXISTS accounts_tombstone ON accounts",
+    """CREATE TRIGGER accounts_tombstone AFTER DELETE ON accounts
+    FOR EACH ROW EXECUTE FUNCTION accounts_tombstone()""",
+)
+
+
+def create_change_tracking(connection: Connection) -> None:
+    """Adds last_updated_on, its index, the tombstone table and the
+    triggers maintaining them to an accounts table that already
+    exists. Safe to run on every start."""
+
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        # SQLite cannot add a column with a CURRENT_TIMESTAMP default;
+        # the insert trigger fills it in instead
+        add_column = "last_updated_on TIMESTAMP"
+        triggers = SQLITE_TRIGGERS
+    elif dialect == "postgresql":
+        add_column = "last_updated_on TIMESTAMP WITH TIME ZONE DEFAULT now()"
+        triggers = POSTGRESQL_TRIGGERS
+    else:
+        raise NotImplementedError(f"No change tracking for the {dialect} dialect")
+
+    columns = {column["name"] for column in inspect(connection).get_columns("accounts")}
+    if "last_updated_on" not in columns:
+        connection.execute(text(f"ALTER TABLE accounts ADD COLUMN {add_column}"))
+        connection.execute(
+            text("UPDATE accounts SET last_updated_on = CURRENT_TIMESTAMP")
+        )
+    for index in AccountEntity.__table__.indexes:
+        if index.name == CHANGES_INDEX:
+            index.create(connection, checkfirst=True)
+    AccountTombstoneEntity.__table__.create(connection, checkfirst=True)
+    for trigger in triggers:
+        connection.execute(text(trigger))
+
+
+def prune_tombstones(
+    connection: Connection, older_than: datetime.timedelta = TOMBSTONE_RETENTION
+) -> None:
+    cutoff = datetime.datetime.now(datetime.timezone.utc) - older_than
+    connection.execute(
+        delete(AccountTombstoneEntity).where(AccountTombstoneEntity.deleted_on < cutoff)
+    )
@@ -0,0 +1,45 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, func
+
+from infrastructure.repository.persistent.db_model_base import Base
+
+# Serves the `last_updated_on > watermark` polls of the change feed
+CHANGES_INDEX = "ix_accounts_last_updated_on"
+
+
+class AccountEntity(Base):
+    __tablename__ = "accounts"
+
+    id = Column(Integer, primary_key=True)
+    employee_id = Column(Integer, nullable=False)
+    first_name = Column(String, nullable=False)
+    last_name = Column(String, nullable=False)
+    email = Column(String, nullable=False)
+    department = Column(String, nullable=False)
+    country_id = Column(Integer, ForeignKey("countries.id"))
+    # Kept current by triggers as well, see account_change_tracking
+    last_updated_on = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    # One (column, id) index per sortable column, matching the
+    # ORDER BY used by keyset pagination in account_queries. Their
+    # leading column also serves equality and prefix filters, so email,
+    # department and country_id need no index of their own. Employee
+    # ids are unique, so uq_accounts_employee_id serves their pages
+    __table_args__ = tuple(
+        Index(f"ix_accounts_{name}_id", name, "id")
+        for name in (
+            "first_name",
+            "last_name",
+            "email",
+            "department",
+            "country_id",
+        )
+    ) + (
+        Index(CHANGES_INDEX, "last_updated_on"),
+        Index("uq_accounts_employee_id", "employee_id", unique=True),
+        # Lookups by full name, last name first as it is the more selective
+        Index("ix_accounts_last_name_first_name", "last_name", "first_name"),
+        # Ids of deleted accounts are never reused, tombstones rely on it
+        {"sqlite_autoincrement": True},
+    )
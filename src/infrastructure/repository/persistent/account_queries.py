@@ -0,0 +1,237 @@
+import datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    ColumnElement,
+    DateTime,
+    Integer,
+    Select,
+    and_,
+    bindparam,
+    func,
+    or_,
+    select,
+    tuple_,
+)
+
+from infrastructure.repository.persistent.account_change_tracking import (
+    AccountTombstoneEntity,
+)
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from infrastructure.repository.persistent.country_entity import CountryEntity
+
+# Keeps each DELETE under SQLite's bound parameter limit
+DELETE_BATCH_SIZE = 500
+
+# Longest employee id a numeric prefix search looks for
+MAX_EMPLOYEE_ID_DIGITS = 18
+
+# Column order matches the columns shown by the account table model.
+ACCOUNT_COLUMNS = (
+    AccountEntity.id,
+    AccountEntity.employee_id,
+    AccountEntity.first_name,
+    AccountEntity.last_name,
+    AccountEntity.email,
+    AccountEntity.department,
+    AccountEntity.country_id,
+)
+
+# Columns shown as a name from a lookup table sort by that name: sort
+# column -> (name column, the key it is looked up by). Their pages
+# join the lookup table and return the name as an extra last column,
+# the sort value the next page seeks past
+SORT_NAMES = {6: (CountryEntity.country, CountryEntity.id)}
+
+# Sort columns whose values are unique, so the id adds nothing to
+# their order: their pages order and seek on the value alone, which
+# the column's unique index serves without an id in it
+UNIQUE_SORT_COLUMNS = frozenset({1})
+
+
+def accounts_page_query(
+    after: Optional[Tuple],
+    limit: int,
+    sort_column: int = 0,
+    descending: bool = False,
+    nulls: bool = False,
+) -> Tuple[Select, Dict[str, Any]]:
+    """The keyset paginated query returning the next `limit` accounts
+    ordered by (sort column, id), starting after the (sort value, id)
+    pair in `after`, and the parameters to execute it with.
+    Seeks on the (column, id) index instead of using OFFSET, so the
+    cost of a page does not grow with how far the user has scrolled.
+
+    Databases disagree on where NULLs sort, so rows with a NULL sort
+    value are read in a second pass (`nulls=True`) ordered by id alone.
+    They always come after the non NULL rows, whatever the direction.
+
+    Columns in SORT_NAMES are ordered by the looked up name instead,
+    and `after` holds a name. Accounts without a name, because their
+    key is NULL or has no lookup row, are read by the NULL pass."""
+
+    statement = accounts_page_statement(
+        sort_column, descending, nulls, after is not None
+    )
+    params: Dict[str, Any] = {"limit": limit}
+    if after is not None:
+        params["after_value"], params["after_id"] = after
+    return statement, params
+
+
+@lru_cache(maxsize=None)
+def accounts_page_statement(
+    sort_column: int, descending: bool, nulls: bool, seek: bool
+) -> Select:
+    """One page query per shape, with the limit and the seek position
+    as bound parameters. Reusing the same statement object skips
+    building it and generating its cache key on every page, and its
+    SQL is compiled once per engine."""
+
+    key = AccountEntity.id
+    column = ACCOUNT_COLUMNS[sort_column]
+    after_id = bindparam("after_id", type_=key.type)
+    stmt = select(*ACCOUNT_COLUMNS).limit(bindparam("limit", type_=Integer))
+    if sort_column in SORT_NAMES:
+        # Walks the lookup table's name index and, per name, the
+        # (key, id) index of the accounts. Outer joined, so accounts
+        # whose key has no lookup row get a NULL name
+        name, name_key = SORT_NAMES[sort_column]
+        stmt = stmt.add_columns(name).outerjoin(name.table, name_key == column)
+        column = name
+
+    if column is key or nulls:
+        if nulls:
+            stmt = stmt.where(column.is_(None))
+        stmt = stmt.order_by(key.desc() if descending else key)
+        if seek:
+            stmt = stmt.where(key < after_id if descending else key > after_id)
+        return stmt
+
+    if sort_column in UNIQUE_SORT_COLUMNS:
+        stmt = stmt.order_by(column.desc() if descending else column)
+        if seek:
+            after = bindparam("after_value", type_=column.type)
+            stmt = stmt.where(column < after if descending else column > after)
+        return stmt
+
+    stmt = stmt.where(column.is_not(None))
+    if descending:
+        stmt = stmt.order_by(column.desc(), key.desc())
+    else:
+        stmt = stmt.order_by(column, key)
+    if seek:
+        position = tuple_(column, key)
+        after = tuple_(bindparam("after_value", type_=column.type), after_id)
+        stmt = stmt.where(position < after if descending else position > after)
+    return stmt
+
+
+def accounts_prefix_query(prefix: str) -> Select:
+    """Accounts whose employee id, first name, last name or email starts
+    with `prefix`, a lower cased search text. Each condition is a range
+    on the leading column of an index, `column >= prefix AND column <
+    next prefix`, so the database seeks instead of scanning. Names are
+    stored capitalized, so text columns are searched for the prefix as
+    given, capitalized and in capitals; other mixes of case are missed."""
+    conditions = []
+    for column in (
+        AccountEntity.first_name,
+        AccountEntity.last_name,
+        AccountEntity.email,
+    ):
+        for variant in sorted({prefix, prefix.capitalize(), prefix.upper()}):
+            conditions.append(and_(column >= variant, column < _prefix_end(variant)))
+    if prefix.isascii() and prefix.isdigit():
+        conditions.extend(_employee_id_ranges(prefix))
+    return select(*ACCOUNT_COLUMNS).where(or_(*conditions))
+
+
+def _prefix_end(prefix: str) -> str:
+    """The first string after every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _employee_id_ranges(digits: str) -> List[ColumnElement[bool]]:
+    """Employee ids written starting with `digits`: the number itself,
+    then one range per longer length, 120 to 129, 1200 to 1299 and so on."""
+    if digits.startswith("0"):
+        # Only zero itself is written with a leading zero
+        return [AccountEntity.employee_id == 0] if digits == "0" else []
+    first = int(digits)
+    conditions = [AccountEntity.employee_id == first]
+    for extra in range(1, MAX_EMPLOYEE_ID_DIGITS - len(digits) + 1):
+        scale = 10**extra
+        conditions.append(
+            AccountEntity.employee_id.between(first * scale, (first + 1) * scale - 1)
+        )
+    return conditions
+
+
+# Whole table reads, built once
+SELECT_ACCOUNT_COUNT = select(func.count()).select_from(AccountEntity)
+SELECT_ALL_ACCOUNTS = select(*ACCOUNT_COLUMNS).order_by(AccountEntity.id)
+
+# Change feed polls; `since` is a last_updated_on or deleted_on value,
+# or CHANGES_EPOCH for everything
+CHANGES_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_since = bindparam("since", type_=DateTime(timezone=True))
+SELECT_CHANGED_ACCOUNTS = (
+    select(*ACCOUNT_COLUMNS, AccountEntity.last_updated_on)
+    .where(AccountEntity.last_updated_on > _since)
+    .order_by(AccountEntity.last_updated_on)
+)
+SELECT_DELETED_ACCOUNTS = (
+    select(AccountTombstoneEntity.id, AccountTombstoneEntity.deleted_on)
+    .where(AccountTombstoneEntity.deleted_on > _since)
+    .order_by(AccountTombstoneEntity.deleted_on)
+)
+SELECT_LAST_CHANGE = select(
+    func.max(AccountEntity.last_updated_on),
+    select(func.max(AccountTombstoneEntity.deleted_on)).scalar_subquery(),
+)
+# The database clock, which stamps the changes
+SELECT_DATABASE_TIME = select(func.now())
+
+
+def select_country_names() -> Select:
+    """(id, name) of every country, for the country lookup."""
+    return select(CountryEntity.id, CountryEntity.country)
+
+
+def select_department_names() -> Select:
+    """Names of the departments in use, for the department lookup.
+    Served from the department index rather than the table."""
+    return (
+        select(AccountEntity.department)
+        .where(AccountEntity.department.is_not(None))
+        .distinct()
+    )
+
+
+def delete_conditions(ids: Iterable[int]) -> Iterable[ColumnElement[bool]]:
+    """WHERE clauses matching the accounts in `ids`, each within
+    DELETE_BATCH_SIZE bound parameters. Runs of consecutive ids become
+    one BETWEEN, so deleting a block of rows costs two parameters
+    however long it is."""
+    runs = []
+    for key in sorted(ids):
+        if runs and runs[-1][1] == key - 1:
+            runs[-1][1] = key
+        else:
+            runs.append([key, key])
+
+    ranges = []
+    singles = []
+    for first, last in runs:
+        if last - first >= 2:
+            ranges.append(AccountEntity.id.between(first, last))
+        else:
+            singles.extend(range(first, last + 1))
+
+    per_statement = DELETE_BATCH_SIZE // 2
+    for start in range(0, len(ranges), per_statement):
+        yield or_(*ranges[start : start + per_statement])
+    for start in range(0, len(singles), DELETE_BATCH_SIZE):
+        yield AccountEntity.id.in_(singles[start : start + DELETE_BATCH_SIZE])
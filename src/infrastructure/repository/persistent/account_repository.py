@@ -0,0 +1,212 @@
+import datetime
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Row, delete, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from domain.repository.account_repository import (
+    AbstractAccountRepository,
+    AccountValues,
+)
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from infrastructure.repository.persistent.account_queries import (
+    CHANGES_EPOCH,
+    SELECT_ACCOUNT_COUNT,
+    SELECT_ALL_ACCOUNTS,
+    SELECT_CHANGED_ACCOUNTS,
+    SELECT_DATABASE_TIME,
+    SELECT_DELETED_ACCOUNTS,
+    SELECT_LAST_CHANGE,
+    accounts_page_query,
+    accounts_prefix_query,
+    delete_conditions,
+)
+from infrastructure.repository.persistent.query_cache import (
+    QueryResultCache,
+    statement_tables,
+)
+
+# Rows per executemany call and per transaction in bulk writes
+BULK_BATCH_SIZE = 10000
+STREAM_BATCH_SIZE = 10000
+
+accounts_table = AccountEntity.__table__
+
+
+def batched(items: Iterable, size: int) -> Iterable[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class AccountRepository(AbstractAccountRepository):
+    """Accounts through an async session factory, normally
+    DbManager.session_factory.
+
+    Bulk writes go through Core executemany on the table, not ORM
+    objects, one transaction per BULK_BATCH_SIZE rows, so loading a
+    large file neither builds an identity map nor holds one huge
+    transaction open. Reads are keyset paginated on (sort column, id)
+    or streamed from a server side cursor.
+
+    With a QueryResultCache, pages and counts are served from it until
+    a write through this repository, or through a watched engine,
+    invalidates them."""
+
+    def __init__(
+        self, session_factory: async_sessionmaker, cache: QueryResultCache = None
+    ) -> None:
+        self.session_factory = session_factory
+        self.cache = cache
+
+    async def add_many(self, accounts: Iterable[AccountValues]) -> int:
+        return await self._execute_batches(insert(accounts_table), accounts)
+
+    async def upsert_many(self, accounts: Iterable[AccountValues]) -> int:
+        async with self.session_factory() as session:
+            statement = self._upsert_statement(session)
+        return await self._execute_batches(statement, accounts)
+
+    async def delete_many(self, ids: Iterable[int]) -> None:
+        async with self.session_factory() as session, session.begin():
+            for condition in delete_conditions(ids):
+                await session.execute(delete(accounts_table).where(condition))
+        self._invalidate()
+
+    async def count(self) -> int:
+        rows = await self._fetch(SELECT_ACCOUNT_COUNT)
+        return rows[0][0]
+
+    async def fetch_page(
+        self,
+        after: Optional[Tuple],
+        limit: int,
+        sort_column: int = 0,
+        descending: bool = False,
+        nulls: bool = False,
+    ) -> List[Row]:
+        statement, params = accounts_page_query(
+            after, limit, sort_column=sort_column, descending=descending, nulls=nulls
+        )
+        return await self._fetch(statement, params)
+
+    async def stream_page(
+        self,
+        after: Optional[Tuple],
+        limit: int,
+        sort_column: int = 0,
+        descending: bool = False,
+        nulls: bool = False,
+        chunk_size: int = 64,
+    ) -> AsyncIterator[List[Row]]:
+        statement, params = accounts_page_query(
+            after, limit, sort_column=sort_column, descending=descending, nulls=nulls
+        )
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(statement, params)
+            version = self.cache.version
+            rows = self.cache.get(key)
+            if rows is not None:
+                for start in range(0, len(rows), chunk_size):
+                    yield rows[start : start + chunk_size]
+                return
+
+        rows = []
+        async with self.session_factory() as session:
+            result = await session.stream(statement, params)
+            async for chunk in result.partitions(chunk_size):
+                rows.extend(chunk)
+                yield chunk
+        # Only reached when the whole page was read
+        if key is not None:
+            self.cache.put(key, statement_tables(statement), rows, version)
+
+    async def fetch_matching(self, prefix: str) -> List[Row]:
+        return await self._fetch(accounts_prefix_query(prefix))
+
+    async def iterate(
+        self, batch_size: int = STREAM_BATCH_SIZE
+    ) -> AsyncIterator[List[Row]]:
+        async with self.session_factory() as session:
+            result = await session.stream(
+                SELECT_ALL_ACCOUNTS,
+                execution_options={"yield_per": batch_size},
+            )
+            async for batch in result.partitions():
+                yield batch
+
+    async def fetch_changes(
+        self, since: Optional[datetime.datetime]
+    ) -> Tuple[List[Row], List[Row]]:
+        # Never cached: finding writes the cache has not seen is the point
+        params = {"since": CHANGES_EPOCH if since is None else since}
+        async with self.session_factory() as session:
+            changed = (await session.execute(SELECT_CHANGED_ACCOUNTS, params)).all()
+            deleted = (await session.execute(SELECT_DELETED_ACCOUNTS, params)).all()
+        return changed, deleted
+
+    async def last_change(self) -> Optional[datetime.datetime]:
+        async with self.session_factory() as session:
+            stamps = (await session.execute(SELECT_LAST_CHANGE)).one()
+        return max((stamp for stamp in stamps if stamp is not None), default=None)
+
+    async def database_time(self) -> datetime.datetime:
+        async with self.session_factory() as session:
+            return (await session.execute(SELECT_DATABASE_TIME)).scalar_one()
+
+    def invalidate(self) -> None:
+        self._invalidate()
+
+    async def _execute_batches(
+        self, statement, accounts: Iterable[AccountValues]
+    ) -> int:
+        written = 0
+        async with self.session_factory() as session:
+            for batch in batched(accounts, BULK_BATCH_SIZE):
+                async with session.begin():
+                    await session.execute(statement, batch)
+                self._invalidate()
+                written += len(batch)
+        return written
+
+    async def _fetch(self, statement, params: Dict[str, Any] = None) -> List[Row]:
+        """Rows of `statement`, from the cache when possible."""
+        if self.cache is None:
+            async with self.session_factory() as session:
+                return (await session.execute(statement, params)).all()
+
+        key = self.cache.key(statement, params)
+        version = self.cache.version
+        rows = self.cache.get(key)
+        if rows is None:
+            async with self.session_factory() as session:
+                rows = (await session.execute(statement, params)).all()
+            self.cache.put(key, statement_tables(statement), rows, version)
+        return rows
+
+    def _invalidate(self) -> None:
+        if self.cache is not None:
+            self.cache.invalidate_tables((accounts_table.name,))
+
+    @staticmethod
+    def _upsert_statement(session: AsyncSession):
+        """INSERT ... ON CONFLICT (id) DO UPDATE in the session's dialect."""
+        dialect = session.bind.dialect.name
+        if dialect == "sqlite":
+            statement = sqlite.insert(accounts_table)
+        elif dialect == "postgresql":
+            statement = postgresql.insert(accounts_table)
+        else:
+            raise NotImplementedError(f"No upsert for the {dialect} dialect")
+
+        return statement.on_conflict_do_update(
+            index_elements=[accounts_table.c.id],
+            set_={
+                column.name: statement.excluded[column.name]
+                for column in accounts_table.columns
+                if not column.primary_key
+            },
+        )
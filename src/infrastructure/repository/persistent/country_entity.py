@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Index, Integer, String
+
+from infrastructure.repository.persistent.db_model_base import Base
+
+
+class CountryEntity(Base):
+    __tablename__ = "countries"
+
+    id = Column(Integer, primary_key=True)
+    country = Column(String(20), nullable=False)
+
+    __table_args__ = (Index("uq_countries_country", "country", unique=True),)
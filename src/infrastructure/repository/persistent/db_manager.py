@@ -1,7 +1,23 @@
 import abc
+import asyncio as aio
+import itertools
+import time
+from contextlib import AsyncExitStack
+from threading import Lock
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-import psycopg2
+from sqlalchemy import Engine, Executable, create_engine, event, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext import asyncio
+from sqlalchemy.orm import sessionmaker
+
+from infrastructure.repository.persistent.db_pool_metrics import (
+    InstrumentedAsyncQueuePool,
+    PoolMetrics,
+    instrument_engine,
+)
+from infrastructure.repository.persistent.migrations import apply_migrations
+from infrastructure.repository.persistent.routing_session import RoutingSession
 
 
 class AbstractDbManager(abc.ABC):
@@ -13,23 +29,82 @@ class AbstractDbManager(abc.ABC):
     def check_conn(self) -> bool:
         raise NotImplementedError()
 
+    @abc.abstractmethod
+    async def check_conn_async(self) -> bool:
+        raise NotImplementedError()
+
     # @abc.abstractmethod
     # async def get_session(self):
     #     raise NotImplementedError()
 
 
 CHECK_CONN_TIMEOUT = 3
+# A health check result is reused for this many seconds
+CHECK_CONN_TTL = 10
+# Seconds between background health checks
+CHECK_CONN_INTERVAL = 30
+
+# Connection pool defaults, overridable per setup() call
+POOL_SIZE = 5
+POOL_MAX_OVERFLOW = 10
+POOL_RECYCLE = 1800  # seconds; -1 keeps connections forever
+POOL_PRE_PING = True
+POOL_TIMEOUT = 30  # seconds to wait for a free connection
+
+# Compiled SQL kept per engine by SQLAlchemy (its default is 500)
+COMPILED_CACHE_SIZE = 1000
+# Statements each connection keeps prepared: asyncpg's
+# prepared_statement_cache_size, or sqlite3's cached_statements
+STATEMENT_CACHE_SIZE = 256
+
+# Connections opened ahead of the first query by start_prewarm()
+PREWARM_CONNECTIONS = 2
+
+# Applied to every new SQLite connection. WAL lets readers run while
+# a write is in progress, and with it synchronous=NORMAL only syncs
+# at checkpoints, which is still safe against application crashes.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # negative values are KiB, so 64 MiB
+    "busy_timeout": 5000,  # ms to wait for a lock before failing
+}
+
+
+def set_sqlite_pragmas(engine: Engine, pragmas: Dict[str, Any] = None) -> None:
+    """Runs the PRAGMA statements on every connection `engine` opens.
+    Works for pysqlite engines and the sync_engine of aiosqlite ones."""
+    pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
 
 
 class DbManager(AbstractDbManager):
-    """Manages connections to the database."""
+    """Manages connections to the database.
+
+    Besides the primary `engine` there can be read-only replica
+    engines. The session factory then routes plain reads to a replica
+    and everything else to the primary, see RoutingSession. Replicas
+    that fail a health check or drop a connection get no reads until a
+    later check passes, and with none left reads go to the primary."""
 
     instance = None
+    _instance_lock = Lock()
 
     @staticmethod
     def get_instance():
-        if not DbManager.instance:
-            DbManager.instance = DbManager()
+        """The shared DbManager, created on first use by whichever
+        thread gets here first."""
+        if DbManager.instance is None:
+            with DbManager._instance_lock:
+                if DbManager.instance is None:
+                    DbManager.instance = DbManager()
         return DbManager.instance
 
     def __init__(self):
@@ -38,12 +113,35 @@ class DbManager(AbstractDbManager):
         self.engine: asyncio.AsyncEngine = None
         # self.session_factory: asyncio.async_sessionmaker = None
 
+        # SQLite only: a sync engine on the same file, for code that
+        # runs outside the event loop, such as worker threads
+        self.sync_engine: Engine = None
+        self.sync_session_factory: sessionmaker = None
+
         self.db_host: str = None
         self.db_port: str = None
         self.db_name: str = None
         self.db_user: str = None
         self.db_pass: str = None
 
+        self.replica_engines: List[asyncio.AsyncEngine] = []
+        # Last health check result per replica; unchecked ones are used
+        self.replica_ok: Dict[asyncio.AsyncEngine, bool] = {}
+        self._next_replica = itertools.count()
+
+        # Every engine reports into its own metrics, as each has a pool
+        self.pool_metrics = PoolMetrics()
+        self.replica_metrics: Dict[asyncio.AsyncEngine, PoolMetrics] = {}
+        # query_cache_size of the engines, for statement_cache_stats()
+        self.compiled_cache_size = COMPILED_CACHE_SIZE
+
+        # Last health check result and when it was taken (monotonic)
+        self.conn_ok = False
+        self.conn_checked_at: Optional[float] = None
+        self._check_task: aio.Task = None
+        self._health_task: aio.Task = None
+        self._prewarm_task: aio.Task = None
+
     def setup(
         self,
         db_host: str,
@@ -51,50 +149,399 @@ class DbManager(AbstractDbManager):
         db_name: str,
         db_user: str,
         db_pass: str,
+        pool_size: int = POOL_SIZE,
+        max_overflow: int = POOL_MAX_OVERFLOW,
+        pool_recycle: int = POOL_RECYCLE,
+        pool_pre_ping: bool = POOL_PRE_PING,
+        pool_timeout: float = POOL_TIMEOUT,
+        compiled_cache_size: int = COMPILED_CACHE_SIZE,
+        statement_cache_size: int = STATEMENT_CACHE_SIZE,
+        replica_hosts: Sequence[str] = (),
     ):
-        self.db_url = (
-            f"postgresql+asyncpg://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
-        )
+        """`replica_hosts` are read-only replicas of the database, as
+        "host" or "host:port", reached with the same credentials."""
+
+        def url(host: str) -> str:
+            if ":" not in host:
+                host = f"{host}:{db_port}"
+            return (
+                f"postgresql+asyncpg://{db_user}:{db_pass}@{host}/{db_name}"
+                f"?prepared_statement_cache_size={statement_cache_size}"
+            )
+
+        self.db_url = url(f"{db_host}:{db_port}")
         self.db_host = db_host
         self.db_port = db_port
         self.db_name = db_name
         self.db_user = db_user
         self.db_pass = db_pass
 
+        self._create_engine(
+            [url(host) for host in replica_hosts],
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+            pool_timeout=pool_timeout,
+            query_cache_size=compiled_cache_size,
+        )
+
+    def setup_sqlite(
+        self,
+        db_path: str,
+        pool_size: int = POOL_SIZE,
+        max_overflow: int = POOL_MAX_OVERFLOW,
+        pool_timeout: float = POOL_TIMEOUT,
+        pragmas: Dict[str, Any] = None,
+        compiled_cache_size: int = COMPILED_CACHE_SIZE,
+        statement_cache_size: int = STATEMENT_CACHE_SIZE,
+        replica_paths: Sequence[str] = (),
+    ):
+        """Uses the SQLite file `db_path` through aiosqlite, with
+        SQLITE_PRAGMAS (or `pragmas`) applied to every connection.
+        Also sets up `sync_engine` and `sync_session_factory` on the
+        same file. The files in `replica_paths` are opened read-only
+        as replicas; nothing copies writes to them."""
+        self.db_url = f"sqlite+aiosqlite:///{db_path}"
+        self.db_name = db_path
+
+        # A local file has no stale connections to ping or recycle
+        self._create_engine(
+            [
+                f"sqlite+aiosqlite:///file:{path}?mode=ro&uri=true"
+                for path in replica_paths
+            ],
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_recycle=-1,
+            pool_pre_ping=False,
+            pool_timeout=pool_timeout,
+            query_cache_size=compiled_cache_size,
+            connect_args={"cached_statements": statement_cache_size},
+        )
+        pragmas = SQLITE_PRAGMAS if pragmas is None else pragmas
+        set_sqlite_pragmas(self.engine.sync_engine, pragmas)
+        # The journal mode is the primary's to set
+        read_pragmas = {
+            name: value for name, value in pragmas.items() if name != "journal_mode"
+        }
+        for replica in self.replica_engines:
+            set_sqlite_pragmas(replica.sync_engine, read_pragmas)
+
+        self.sync_engine = create_engine(
+            f"sqlite:///{db_path}",
+            query_cache_size=compiled_cache_size,
+            connect_args={"cached_statements": statement_cache_size},
+        )
+        set_sqlite_pragmas(self.sync_engine, pragmas)
+        self.sync_session_factory = sessionmaker(
+            autocommit=False,
+            autoflush=False,
+            bind=self.sync_engine,
+        )
+
+    def _create_engine(self, replica_urls: Sequence[str] = (), **engine_options):
         self.engine = asyncio.create_async_engine(
             self.db_url,
+            poolclass=InstrumentedAsyncQueuePool,
+            **engine_options,
             # echo=True,
         )
+        self.compiled_cache_size = engine_options.get(
+            "query_cache_size", COMPILED_CACHE_SIZE
+        )
+        self.conn_checked_at = None
+        self.pool_metrics.reset()
+        instrument_engine(self.engine.sync_engine, self.pool_metrics)
 
-        self.session_factory = asyncio.async_sessionmaker(
-            autocommit=False,
-            autoflush=False,
-            bind=self.engine,
+        self.replica_engines = []
+        self.replica_ok = {}
+        self.replica_metrics = {}
+        for url in replica_urls:
+            replica = asyncio.create_async_engine(
+                url, poolclass=InstrumentedAsyncQueuePool, **engine_options
+            )
+            self.replica_metrics[replica] = PoolMetrics()
+            instrument_engine(replica.sync_engine, self.replica_metrics[replica])
+            self._watch_replica(replica)
+            self.replica_engines.append(replica)
+
+        if self.replica_engines:
+            self.session_factory = asyncio.async_sessionmaker(
+                autocommit=False,
+                autoflush=False,
+                bind=self.engine,
+                sync_session_class=RoutingSession,
+                router=self,
+            )
+        else:
+            self.session_factory = asyncio.async_sessionmaker(
+                autocommit=False,
+                autoflush=False,
+                bind=self.engine,
+            )
+
+    def _watch_replica(self, replica: asyncio.AsyncEngine):
+        """Takes `replica` out of rotation as soon as it fails to
+        connect or drops a connection, without waiting for a check."""
+
+        @event.listens_for(replica.sync_engine, "handle_error")
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.replica_ok[replica] = False
+
+    def write_engine(self) -> Engine:
+        return self.engine.sync_engine
+
+    def read_engine(self) -> Engine:
+        """The next healthy replica in turn, or the primary if there
+        is none."""
+        healthy = [
+            replica
+            for replica in self.replica_engines
+            if self.replica_ok.get(replica, True)
+        ]
+        if not healthy:
+            return self.engine.sync_engine
+        return healthy[next(self._next_replica) % len(healthy)].sync_engine
+
+    def replica_health(self) -> Dict[str, Optional[bool]]:
+        """Last health check result of every replica by URL, None when
+        it has not been checked yet."""
+        return {
+            replica.url.render_as_string(hide_password=True): self.replica_ok.get(
+                replica
+            )
+            for replica in self.replica_engines
+        }
+
+    def migrate(self) -> List[int]:
+        """Brings the schema up to date, see migrations. Uses the sync
+        engine when there is one, so it can run before the event loop.
+        Returns the versions applied."""
+        if self.sync_engine is None:
+            raise RuntimeError("No sync engine; use migrate_async()")
+        with self.sync_engine.connect() as connection:
+            return apply_migrations(connection)
+
+    async def migrate_async(self) -> List[int]:
+        async with self.engine.connect() as connection:
+            return await connection.run_sync(apply_migrations)
+
+    def start_prewarm(
+        self,
+        connections: int = PREWARM_CONNECTIONS,
+        statements: Sequence[Tuple[Executable, Dict[str, Any]]] = (),
+    ) -> aio.Task:
+        """Runs prewarm() in the background, on the running event loop
+        or, when called before the loop runs, on the loop set for this
+        thread, where it starts as soon as that loop runs."""
+        try:
+            loop = aio.get_running_loop()
+        except RuntimeError:
+            loop = aio.get_event_loop_policy().get_event_loop()
+        self._prewarm_task = loop.create_task(self.prewarm(connections, statements))
+        return self._prewarm_task
+
+    async def prewarm(
+        self,
+        connections: int = PREWARM_CONNECTIONS,
+        statements: Sequence[Tuple[Executable, Dict[str, Any]]] = (),
+    ):
+        """Opens up to `connections` pooled connections on the primary
+        and on every replica, and runs `statements` once on each engine,
+        so that connecting, the dialect's first connect setup and
+        compiling the hot queries are paid before the first real query.
+        Pass statements that read nothing, such as a page with limit 0."""
+        await aio.gather(
+            *(
+                self._prewarm_engine(engine, connections, statements)
+                for engine in (self.engine, *self.replica_engines)
+            )
         )
 
+    async def _prewarm_engine(
+        self,
+        engine: asyncio.AsyncEngine,
+        connections: int,
+        statements: Sequence[Tuple[Executable, Dict[str, Any]]],
+    ):
+        connections = min(connections, engine.sync_engine.pool.size())
+        if connections <= 0:
+            return
+        # The first connection goes back to the pool as soon as it is
+        # ready, so a query arriving meanwhile does not open its own
+        async with engine.connect() as connection:
+            for statement, params in statements:
+                await connection.execute(statement, params)
+        # Then all are held open together, so the pool creates the rest
+        async with AsyncExitStack() as stack:
+            for _ in range(connections):
+                await stack.enter_async_context(engine.connect())
+
+    async def dispose(self):
+        """Stops the background tasks and closes every pooled connection
+        of the primary, the replicas and the sync engine."""
+        self.stop_health_checks()
+        tasks = [
+            task
+            for task in (self._check_task, self._prewarm_task)
+            if task is not None and not task.done()
+        ]
+        for task in tasks:
+            task.cancel()
+        await aio.gather(*tasks, return_exceptions=True)
+
+        for engine in (self.engine, *self.replica_engines):
+            if engine is not None:
+                await engine.dispose()
+        if self.sync_engine is not None:
+            self.sync_engine.dispose()
+        self.conn_checked_at = None
+
     def check_conn(self) -> bool:
-        """Checks the connection to the database.
-        Check is performed in sync mode."""
+        """Returns the state of the connection to the database. With an
+        event loop running, that is the last known state, without
+        waiting: when it is older than CHECK_CONN_TTL a fresh check is
+        started in the background. Otherwise the check runs here, on
+        this thread's event loop, and its result is returned."""
+
+        if self.engine is None:
+            return False
+        if self._conn_status_fresh():
+            return self.conn_ok
+        try:
+            aio.get_running_loop()
+        except RuntimeError:
+            return self._check_now()
+        self._start_check()
+        return self.conn_ok
+
+    async def check_conn_async(self) -> bool:
+        """Checks the connection with SELECT 1 on a pooled connection.
+        A result younger than CHECK_CONN_TTL is returned as is, and
+        concurrent callers share one check."""
 
-        if not self.db_host:
+        if self.engine is None:
             return False
+        if self._conn_status_fresh():
+            return self.conn_ok
+        return await aio.shield(self._start_check())
 
+    def start_health_checks(self, interval: float = CHECK_CONN_INTERVAL) -> aio.Task:
+        """Refreshes the health check every `interval` seconds until
+        stop_health_checks() is called. Like start_prewarm(), it can be
+        called before the event loop runs."""
+        self.stop_health_checks()
         try:
-            conn = psycopg2.connect(
-                host=self.db_host,
-                port=self.db_port,
-                dbname=self.db_name,
-                user=self.db_user,
-                password=self.db_pass,
-                connect_timeout=CHECK_CONN_TIMEOUT,
-            )
-            conn.close()
+            loop = aio.get_running_loop()
+        except RuntimeError:
+            loop = aio.get_event_loop_policy().get_event_loop()
+        self._health_task = loop.create_task(self._health_checks(interval))
+        return self._health_task
+
+    def stop_health_checks(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+
+    async def _health_checks(self, interval: float):
+        while True:
+            await aio.shield(self._start_check())
+            await aio.sleep(interval)
+
+    def _conn_status_fresh(self) -> bool:
+        return (
+            self.conn_checked_at is not None
+            and time.monotonic() - self.conn_checked_at < CHECK_CONN_TTL
+        )
+
+    def _check_now(self) -> bool:
+        """Runs a check on this thread's event loop, which must not be
+        running. The engines' connections belong to that loop, so a
+        thread without one gets the last known state instead."""
+        try:
+            loop = aio.get_event_loop_policy().get_event_loop()
+        except RuntimeError:
+            return self.conn_ok
+        if loop.is_closed():
+            return self.conn_ok
+        return loop.run_until_complete(self._check())
+
+    def _start_check(self) -> Optional[aio.Task]:
+        """Starts a check unless one is running; returns the running one."""
+        if self._check_task is None or self._check_task.done():
+            try:
+                loop = aio.get_running_loop()
+            except RuntimeError:  # Called outside of the event loop
+                return None
+            self._check_task = loop.create_task(self._check())
+        return self._check_task
+
+    async def _check(self) -> bool:
+        """Checks the primary and every replica at once."""
+        results = await aio.gather(
+            self._ping(self.engine),
+            *(self._ping(replica) for replica in self.replica_engines),
+        )
+        self.conn_ok = results[0]
+        for replica, ok in zip(self.replica_engines, results[1:]):
+            self.replica_ok[replica] = ok
+        self.conn_checked_at = time.monotonic()
+        return self.conn_ok
+
+    async def _ping(self, engine: asyncio.AsyncEngine) -> bool:
+        try:
+            await aio.wait_for(self._select_one(engine), CHECK_CONN_TIMEOUT)
             return True
-        except psycopg2.OperationalError:
-            return False
-        except Exception:
+        except (SQLAlchemyError, OSError, aio.TimeoutError):
             return False
 
+    async def _select_one(self, engine: asyncio.AsyncEngine):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Pool counters, current and peak usage, and histograms of the
+        time spent acquiring connections, holding them and running
+        queries, in milliseconds."""
+        pool = self.engine.sync_engine.pool if self.engine is not None else None
+        return self.pool_metrics.snapshot(pool)
+
+    def replica_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """pool_stats() of every replica by URL."""
+        stats = {}
+        for replica in self.replica_engines:
+            metrics = self.replica_metrics[replica]
+            url = replica.url.render_as_string(hide_password=True)
+            stats[url] = metrics.snapshot(replica.sync_engine.pool)
+        return stats
+
+    def reset_pool_stats(self) -> None:
+        for metrics in (self.pool_metrics, *self.replica_metrics.values()):
+            metrics.reset()
+
+    def statement_cache_stats(self) -> Dict[str, Any]:
+        """Hits and misses of the compiled SQL caches of the primary and
+        the replicas since the last reset_pool_stats(), and the size
+        each was created with. Once the hot queries have run, misses
+        should stop growing."""
+        snapshots = [
+            metrics.snapshot()
+            for metrics in (self.pool_metrics, *self.replica_metrics.values())
+        ]
+        hits = sum(counters["statement_cache_hits"] for counters in snapshots)
+        misses = sum(counters["statement_cache_misses"] for counters in snapshots)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "uncached": sum(
+                counters["statement_cache_uncached"] for counters in snapshots
+            ),
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "size": self.compiled_cache_size if self.engine is not None else 0,
+        }
+
     # async def get_session(self) -> AsyncSession:
     #     async with self.session_factory() as db:
     #         try:
@@ -1,10 +1,12 @@
 import datetime
-from uuid import UUID, uuid4
+from uuid import UUID
 
 from sqlalchemy import DateTime, MetaData
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy.sql import func
 
+from infrastructure.repository.persistent.uuid7 import uuid7
+
 
 class Base(DeclarativeBase):
     metadata = MetaData(
@@ -21,7 +23,10 @@ class Base(DeclarativeBase):
 class DbModelBase(Base):
     __abstract__ = True
 
-    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid4)
+    # Time ordered, so new rows append to the primary key index;
+    # subclasses can override the default with uuid4 if ids must not
+    # reveal when a row was created
+    id: Mapped[UUID] = mapped_column(primary_key=True, default=uuid7)
 
     created_on: Mapped[datetime.datetime] = mapped_column(
         DateTime(timezone=True),
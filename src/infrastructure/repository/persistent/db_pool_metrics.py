@@ -0,0 +1,209 @@
+import time
+from bisect import bisect_left
+from threading import Lock
+from typing import Any, Dict, Sequence
+
+from sqlalchemy import Engine, event, exc
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds, in milliseconds, of the histogram buckets; the last
+# bucket counts everything slower
+LATENCY_BUCKETS_MS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class Histogram:
+    """Counts observations into fixed buckets, plus count, sum and max."""
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS_MS) -> None:
+        self.bounds = tuple(bounds)
+        self.lock = Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.buckets = [0] * (len(self.bounds) + 1)
+            self.count = 0
+            self.total = 0.0
+            self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        with self.lock:
+            self.buckets[bisect_left(self.bounds, value)] += 1
+            self.count += 1
+            self.total += value
+            self.max = max(self.max, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            labels = [f"<={bound}" for bound in self.bounds] + [f">{self.bounds[-1]}"]
+            return {
+                "count": self.count,
+                "sum": self.total,
+                "max": self.max,
+                "mean": self.total / self.count if self.count else 0.0,
+                "buckets": dict(zip(labels, self.buckets)),
+            }
+
+
+class PoolMetrics:
+    """Counters and histograms for one engine and its pool.
+
+    `acquire_ms` is the time spent waiting for the pool to hand out a
+    connection and `query_ms` the time spent executing statements, so
+    slow requests can be blamed on one or the other. `hold_ms` is how
+    long connections stay checked out.
+
+    The statement_cache_* counters count executions whose SQL came from
+    the engine's compiled cache (hits), had to be compiled (misses) or
+    cannot be cached at all, such as DDL and driver level SQL."""
+
+    COUNTERS = (
+        "checkouts",
+        "checkins",
+        "connects",
+        "invalidations",
+        "overflow_connects",
+        "timeouts",
+        "queries",
+        "statement_cache_hits",
+        "statement_cache_misses",
+        "statement_cache_uncached",
+    )
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.acquire_ms = Histogram()
+        self.hold_ms = Histogram()
+        self.query_ms = Histogram()
+        self.reset()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.counters = dict.fromkeys(self.COUNTERS, 0)
+            self.peak_checked_out = 0
+            self.peak_overflow = 0
+        for histogram in (self.acquire_ms, self.hold_ms, self.query_ms):
+            histogram.reset()
+
+    def increment(self, name: str) -> None:
+        with self.lock:
+            self.counters[name] += 1
+
+    def observe_pool(self, pool: QueuePool) -> None:
+        with self.lock:
+            self.peak_checked_out = max(self.peak_checked_out, pool.checkedout())
+            self.peak_overflow = max(self.peak_overflow, pool.overflow())
+
+    def snapshot(self, pool: QueuePool = None) -> Dict[str, Any]:
+        with self.lock:
+            stats: Dict[str, Any] = dict(self.counters)
+            stats["peak_checked_out"] = self.peak_checked_out
+            stats["peak_overflow"] = self.peak_overflow
+        if isinstance(pool, QueuePool):
+            stats["pool_size"] = pool.size()
+            stats["checked_out"] = pool.checkedout()
+            stats["checked_in"] = pool.checkedin()
+            stats["overflow"] = max(pool.overflow(), 0)
+        stats["acquire_ms"] = self.acquire_ms.snapshot()
+        stats["hold_ms"] = self.hold_ms.snapshot()
+        stats["query_ms"] = self.query_ms.snapshot()
+        return stats
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times every connection request,
+    including those that wait for a free connection or time out."""
+
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        metrics = self.metrics
+        if metrics is None:
+            return super()._do_get()
+
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            metrics.increment("timeouts")
+            raise
+        finally:
+            metrics.acquire_ms.observe((time.perf_counter() - started) * 1000)
+        return record
+
+    def _inc_overflow(self):
+        created = super()._inc_overflow()
+        # The overflow count starts at -pool_size and only goes above
+        # zero for connections beyond the pool size
+        if created and self.metrics is not None and self._overflow > 0:
+            self.metrics.increment("overflow_connects")
+        return created
+
+    def recreate(self):
+        # Engine.dispose() replaces the pool; keep reporting into the
+        # same metrics
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def instrument_engine(engine: Engine, metrics: PoolMetrics) -> None:
+    """Feeds `metrics` from the pool and statement events of `engine`,
+    the sync_engine of an AsyncEngine."""
+    pool = engine.pool
+    if isinstance(pool, InstrumentedAsyncQueuePool):
+        pool.metrics = metrics
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        metrics.increment("connects")
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.increment("checkouts")
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        metrics.observe_pool(engine.pool)
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        metrics.increment("checkins")
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is not None:
+            metrics.hold_ms.observe((time.perf_counter() - started) * 1000)
+
+    @event.listens_for(engine, "invalidate")
+    def invalidate(dbapi_connection, connection_record, exception):
+        metrics.increment("invalidations")
+
+    # Start times are keyed by execution context, so a statement that
+    # fails, and never gets its after_cursor_execute, leaves nothing
+    # behind for the next one to pick up
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_execute(connection, cursor, statement, parameters, context, many):
+        connection.info.setdefault("query_started", {})[context] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_execute(connection, cursor, statement, parameters, context, many):
+        metrics.increment("queries")
+        started = connection.info.get("query_started", {}).pop(context, None)
+        if started is not None:
+            metrics.query_ms.observe((time.perf_counter() - started) * 1000)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None:
+            started_at = context.connection.info.get("query_started", {})
+            started_at.pop(context.execution_context, None)
+
+    @event.listens_for(engine, "after_execute")
+    def statement_cache(
+        connection, clauseelement, multiparams, params, options, result
+    ):
+        cache_hit = getattr(result.context, "cache_hit", None)
+        if cache_hit is CACHE_HIT:
+            metrics.increment("statement_cache_hits")
+        elif cache_hit is CACHE_MISS:
+            metrics.increment("statement_cache_misses")
+        else:
+            metrics.increment("statement_cache_uncached")
@@ -0,0 +1,98 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import Engine, Select
+from sqlalchemy.orm import sessionmaker
+
+from infrastructure.repository.persistent.write_events import on_committed_writes
+
+# Lookups kept in memory at once; the least recently used is dropped
+MAX_LOOKUPS = 16
+
+
+class LookupCache:
+    """Keeps small lookup tables, such as countries and departments,
+    in memory as key -> display name dictionaries.
+
+    Each lookup is loaded with one query the first time it is used and
+    then served from memory, so showing a name never runs a join per
+    cell. At most `max_lookups` are held, least recently used first out.
+    Once watch() is called on an engine, a committed INSERT, UPDATE or
+    DELETE on a table drops the lookups read from that table."""
+
+    def __init__(
+        self, session_factory: sessionmaker, max_lookups: int = MAX_LOOKUPS
+    ) -> None:
+        self.session_factory = session_factory
+        self.max_lookups = max_lookups
+        self.statements: Dict[str, Select] = {}
+        self.sources: Dict[str, Tuple[str, ...]] = {}
+        self.lookups: "OrderedDict[str, Dict[Any, str]]" = OrderedDict()
+        self.lock = Lock()
+
+    def register(
+        self, name: str, statement: Select, sources: Iterable[str] = None
+    ) -> None:
+        """Adds a lookup read with `statement`, which returns (key, name)
+        rows, or a single column used as both. Writes to the `sources`
+        tables drop it, by default the tables `statement` reads; pass
+        () for a lookup kept up to date with add() instead."""
+        self.statements[name] = statement
+        if sources is None:
+            sources = (table.name for table in statement.get_final_froms())
+        self.sources[name] = tuple(sources)
+        self.invalidate(name)
+
+    def labels(self, name: str) -> Dict[Any, str]:
+        """Key -> display name of every entry in the lookup."""
+        with self.lock:
+            labels = self.lookups.get(name)
+            if labels is not None:
+                self.lookups.move_to_end(name)
+                return labels
+
+        with self.session_factory() as session:
+            rows = session.execute(self.statements[name]).all()
+        labels = {row[0]: row[-1] for row in rows}
+
+        with self.lock:
+            self.lookups[name] = labels
+            while len(self.lookups) > self.max_lookups:
+                self.lookups.popitem(last=False)
+        return labels
+
+    def add(self, name: str, key: Any, label: Any = None) -> None:
+        """Adds `key` to the lookup if it is not in it yet, named
+        `label`, or the key itself."""
+        labels = self.labels(name)
+        if key not in labels:
+            with self.lock:
+                labels[key] = key if label is None else label
+
+    def label(self, name: str, key: Any) -> Any:
+        """Display name of `key`, or the key itself when it is unknown."""
+        return self.labels(name).get(key, key)
+
+    def choices(self, name: str) -> List[Tuple[Any, str]]:
+        """(key, name) pairs sorted by name, for editors."""
+        return sorted(self.labels(name).items(), key=lambda item: str(item[1]))
+
+    def invalidate(self, name: str = None) -> None:
+        """Drops one lookup, or all of them, to be reloaded on next use."""
+        with self.lock:
+            if name is None:
+                self.lookups.clear()
+            else:
+                self.lookups.pop(name, None)
+
+    def invalidate_tables(self, tables: Iterable[str]) -> None:
+        """Drops the lookups read from any of `tables`."""
+        tables = set(tables)
+        for name, sources in self.sources.items():
+            if tables.intersection(sources):
+                self.invalidate(name)
+
+    def watch(self, engine: Engine) -> None:
+        """Invalidates lookups when writes through `engine` commit."""
+        on_committed_writes(engine, self.invalidate_tables)
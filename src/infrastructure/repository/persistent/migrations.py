@@ -0,0 +1,308 @@
+"""Versioned schema migrations.
+
+Each migration runs once per database, in version order, inside its
+own transaction, and is recorded in the schema_version table in that
+same transaction. A migration that fails leaves the database at the
+version before it. Append new migrations to MIGRATIONS; never change
+or renumber one that has shipped.
+"""
+
+import datetime
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import (
+    Column,
+    Connection,
+    DateTime,
+    Integer,
+    String,
+    func,
+    insert,
+    inspect,
+    select,
+    text,
+)
+
+from infrastructure.repository.persistent.account_change_tracking import (
+    create_change_tracking,
+)
+from infrastructure.repository.persistent.db_model_base import Base
+
+# Held by a PostgreSQL migration run, so concurrent starts take turns
+POSTGRESQL_LOCK_KEY = 0x6D6967726174
+
+
+class SchemaVersionEntity(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String, nullable=False)
+    applied_on = Column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+# The migrations write their DDL out instead of building it from the
+# entities, so each keeps creating what it did when it shipped
+
+# Also the table make_country_id_integer() rebuilds on SQLite
+_SQLITE_ACCOUNTS = """CREATE TABLE {name} (
+    id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    employee_id INTEGER NOT NULL,
+    first_name VARCHAR NOT NULL,
+    last_name VARCHAR NOT NULL,
+    email VARCHAR NOT NULL,
+    department VARCHAR NOT NULL,
+    country_id INTEGER REFERENCES countries (id)
+)"""
+
+CREATE_TABLES = {
+    "sqlite": (
+        """CREATE TABLE IF NOT EXISTS countries (
+    id INTEGER NOT NULL PRIMARY KEY,
+    country VARCHAR(20) NOT NULL
+)""",
+        _SQLITE_ACCOUNTS.format(name="IF NOT EXISTS accounts"),
+    ),
+    "postgresql": (
+        """CREATE TABLE IF NOT EXISTS countries (
+    id SERIAL PRIMARY KEY,
+    country VARCHAR(20) NOT NULL
+)""",
+        """CREATE TABLE IF NOT EXISTS accounts (
+    id SERIAL PRIMARY KEY,
+    employee_id INTEGER NOT NULL,
+    first_name VARCHAR NOT NULL,
+    last_name VARCHAR NOT NULL,
+    email VARCHAR NOT NULL,
+    department VARCHAR NOT NULL,
+    country_id INTEGER REFERENCES countries (id)
+)""",
+    ),
+}
+
+# One (column, id) index per sortable column, a unique employee_id,
+# the full name and the unique country name
+CREATE_INDEXES = tuple(
+    f"CREATE INDEX IF NOT EXISTS ix_accounts_{name}_id ON accounts ({name}, id)"
+    for name in (
+        "employee_id",
+        "first_name",
+        "last_name",
+        "email",
+        "department",
+        "country_id",
+    )
+) + (
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_accounts_employee_id "
+    "ON accounts (employee_id)",
+    "CREATE INDEX IF NOT EXISTS ix_accounts_last_name_first_name "
+    "ON accounts (last_name, first_name)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_countries_country ON countries (country)",
+)
+
+
+def create_tables(connection: Connection) -> None:
+    """Creates the accounts and countries tables when they do not exist
+    yet. Databases made before migrations already have them and are
+    brought up to date by the later steps."""
+    dialect = connection.dialect.name
+    if dialect not in CREATE_TABLES:
+        raise NotImplementedError(f"No tables for the {dialect} dialect")
+    for statement in CREATE_TABLES[dialect]:
+        connection.execute(text(statement))
+
+
+def make_country_id_integer(connection: Connection) -> None:
+    """Older databases store accounts.country_id as VARCHAR, so it
+    compares as text with the integer countries.id and an index on it
+    cannot serve lookups by country."""
+    column = next(
+        column
+        for column in inspect(connection).get_columns("accounts")
+        if column["name"] == "country_id"
+    )
+    if isinstance(column["type"], Integer):
+        return
+
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        connection.execute(
+            text(
+                "ALTER TABLE accounts ALTER COLUMN country_id TYPE INTEGER "
+                "USING NULLIF(country_id, '')::integer"
+            )
+        )
+    elif dialect == "sqlite":
+        _rebuild_sqlite_accounts(connection)
+    else:
+        raise NotImplementedError(f"No country_id migration for the {dialect} dialect")
+
+
+def _rebuild_sqlite_accounts(connection: Connection) -> None:
+    # SQLite cannot change a column type in place: copy the rows into
+    # a table as migration 1 creates it, foreign key included, and swap
+    # it in. The old table's indexes and triggers go with it; the later
+    # migrations add them
+    old_columns = {
+        column["name"] for column in inspect(connection).get_columns("accounts")
+    }
+    names = [
+        name
+        for name in (
+            "id",
+            "employee_id",
+            "first_name",
+            "last_name",
+            "email",
+            "department",
+            "country_id",
+        )
+        if name in old_columns
+    ]
+    values = [
+        "CAST(NULLIF(country_id, '') AS INTEGER)" if name == "country_id" else name
+        for name in names
+    ]
+    sequence = connection.execute(
+        text("SELECT seq FROM sqlite_sequence WHERE name = 'accounts'")
+    ).scalar()
+
+    connection.execute(text(_SQLITE_ACCOUNTS.format(name="accounts_rebuilt")))
+    connection.execute(
+        text(
+            f"INSERT INTO accounts_rebuilt ({', '.join(names)}) "
+            f"SELECT {', '.join(values)} FROM accounts"
+        )
+    )
+    connection.execute(text("DROP TABLE accounts"))
+    connection.execute(text("ALTER TABLE accounts_rebuilt RENAME TO accounts"))
+    if sequence is not None:
+        # Keep the highest id ever handed out, not just the highest left
+        connection.execute(
+            text(
+                "UPDATE sqlite_sequence SET seq = MAX(seq, :sequence) "
+                "WHERE name = 'accounts'"
+            ),
+            {"sequence": sequence},
+        )
+
+
+def create_indexes(connection: Connection) -> None:
+    """Creates the account and country indexes that are missing, among
+    them the unique employee_id and country indexes."""
+    for statement in CREATE_INDEXES:
+        connection.execute(text(statement))
+
+
+def drop_employee_id_index(connection: Connection) -> None:
+    """uq_accounts_employee_id serves every lookup and page by employee
+    id; ix_accounts_employee_id_id only cost every write."""
+    connection.execute(text("DROP INDEX IF EXISTS ix_accounts_employee_id_id"))
+
+
+# Rows SQLite samples per index when collecting statistics, which
+# keeps ANALYZE to milliseconds on any table size
+SQLITE_ANALYSIS_LIMIT = 1000
+
+
+def collect_statistics(connection: Connection) -> None:
+    """Collects the table and index statistics the query planner uses.
+    Without them SQLite cannot tell the small countries table from the
+    accounts, and pages sorted by country name scan and sort every
+    account instead of walking the country name index."""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        connection.exec_driver_sql(f"PRAGMA analysis_limit={SQLITE_ANALYSIS_LIMIT}")
+        connection.exec_driver_sql("ANALYZE")
+    elif dialect == "postgresql":
+        connection.execute(text("ANALYZE accounts, countries"))
+
+
+MIGRATIONS = (
+    Migration(1, "Create the accounts and countries tables", create_tables),
+    Migration(2, "Store accounts.country_id as INTEGER", make_country_id_integer),
+    Migration(3, "Index the account and country lookups", create_indexes),
+    Migration(4, "Track account changes for the change feed", create_change_tracking),
+    Migration(5, "Collect query planner statistics", collect_statistics),
+    Migration(6, "Drop the redundant employee_id index", drop_employee_id_index),
+)
+
+
+def schema_version(connection: Connection) -> int:
+    """The newest migration applied to the database, 0 for none."""
+    if not inspect(connection).has_table(SchemaVersionEntity.__tablename__):
+        return 0
+    return connection.execute(
+        select(func.coalesce(func.max(SchemaVersionEntity.version), 0))
+    ).scalar_one()
+
+
+def apply_migrations(connection: Connection) -> List[int]:
+    """Applies the migrations the database is missing and returns
+    their versions. `connection` must not be in a transaction; each
+    migration gets its own. Safe to run on every start, also from
+    several processes at once: each migration is applied by one.
+
+    Works with sync connections and, through run_sync(), async ones."""
+    dialect = connection.dialect.name
+    if dialect != "sqlite":
+        applied = []
+        for migration in MIGRATIONS:
+            with connection.begin():
+                if dialect == "postgresql":
+                    connection.execute(
+                        text("SELECT pg_advisory_xact_lock(:key)"),
+                        {"key": POSTGRESQL_LOCK_KEY},
+                    )
+                if _apply(connection, migration):
+                    applied.append(migration.version)
+        return applied
+
+    # pysqlite would run DDL outside the transaction; with autocommit
+    # the BEGIN and COMMIT below are ours to issue. IMMEDIATE takes the
+    # write lock up front, so a second process waits for the first and
+    # then sees its versions
+    connection.execution_options(isolation_level="AUTOCOMMIT")
+    try:
+        applied = []
+        for migration in MIGRATIONS:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+            try:
+                if _apply(connection, migration):
+                    applied.append(migration.version)
+            except BaseException:
+                connection.exec_driver_sql("ROLLBACK")
+                raise
+            connection.exec_driver_sql("COMMIT")
+        return applied
+    finally:
+        connection.commit()
+        connection.execution_options(isolation_level=connection.default_isolation_level)
+
+
+def _apply(connection: Connection, migration: Migration) -> bool:
+    SchemaVersionEntity.__table__.create(connection, checkfirst=True)
+    already_applied = connection.execute(
+        select(SchemaVersionEntity.version).where(
+            SchemaVersionEntity.version == migration.version
+        )
+    ).first()
+    if already_applied is not None:
+        return False
+
+    migration.upgrade(connection)
+    connection.execute(
+        insert(SchemaVersionEntity).values(
+            version=migration.version,
+            description=migration.description,
+            applied_on=datetime.datetime.now(datetime.timezone.utc),
+        )
+    )
+    return True
@@ -0,0 +1,157 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Engine, Executable
+
+from infrastructure.repository.persistent.write_events import on_committed_writes
+
+QUERY_CACHE_SIZE = 512
+QUERY_CACHE_TTL = 30  # seconds
+
+
+def statement_tables(statement: Executable) -> FrozenSet[str]:
+    """Names of the tables a select reads from."""
+    return frozenset(
+        table.name
+        for table in statement.get_final_froms()
+        if getattr(table, "name", None) is not None
+    )
+
+
+def _hashable(value: Any) -> Hashable:
+    """Lists, as bound for IN, become tuples."""
+    return tuple(value) if isinstance(value, list) else value
+
+
+class QueryResultCache:
+    """Caches the rows of read statements, keyed by the statement's
+    SQLAlchemy cache key and its parameter values.
+
+    At most `max_entries` results are kept, least recently used first
+    out, and a result older than `ttl` seconds is never returned.
+    Writing to a table drops every result read from it, through
+    invalidate_tables() or, once watch() is called on an engine, when
+    a transaction writing to it commits."""
+
+    COUNTERS = ("hits", "misses", "evictions", "expirations", "invalidations")
+
+    def __init__(
+        self, max_entries: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = Lock()
+        # key -> (expires at, tables, rows)
+        self.entries: "OrderedDict[Hashable, Tuple[float, FrozenSet[str], list]]" = (
+            OrderedDict()
+        )
+        self.keys_by_table: Dict[str, Set[Hashable]] = {}
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        # Bumped by every invalidation, see put()
+        self.version = 0
+
+    @staticmethod
+    def key(statement: Executable, params: Dict[str, Any] = None) -> Hashable:
+        """The statement's SQLAlchemy cache key, the values bound in
+        it and the execution `params`. The cache key is memoized on
+        the statement, so a reused statement is not compiled again
+        just to look up its results."""
+        cache_key = statement._generate_cache_key()
+        if cache_key is None:  # Not cacheable, fall back to the SQL
+            compiled = statement.compile()
+            shape: Hashable = str(compiled)
+            bound = [
+                (name, _hashable(value))
+                for name, value in sorted(compiled.params.items())
+            ]
+        else:
+            # Anonymous parameter names differ between equal statements,
+            # so bound values are keyed by position
+            shape = cache_key.key
+            bound = [_hashable(bind.effective_value) for bind in cache_key.bindparams]
+        params = sorted((params or {}).items())
+        return (
+            shape,
+            tuple(bound),
+            tuple((name, _hashable(value)) for name, value in params),
+        )
+
+    def get(self, key: Hashable) -> Optional[List]:
+        """Cached rows for `key`, or None on a miss."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            expires_at, _, rows = entry
+            if time.monotonic() >= expires_at:
+                self._remove(key)
+                self.counters["expirations"] += 1
+                self.counters["misses"] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters["hits"] += 1
+            return list(rows)
+
+    def put(
+        self, key: Hashable, tables: Iterable[str], rows: List, version: int = None
+    ) -> None:
+        """Stores `rows`. Pass the `version` read before running the
+        query, so that rows read before an invalidation that happened
+        while the query ran are not stored."""
+        tables = frozenset(tables)
+        with self.lock:
+            if version is not None and version != self.version:
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, tables, list(rows))
+            for table in tables:
+                self.keys_by_table.setdefault(table, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+                self.counters["evictions"] += 1
+
+    def invalidate_tables(self, tables: Iterable[str]) -> None:
+        """Drops every result read from any of `tables`."""
+        with self.lock:
+            self.version += 1
+            for table in tables:
+                for key in self.keys_by_table.pop(table, ()):
+                    if key in self.entries:
+                        self._remove(key)
+                        self.counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.version += 1
+            self.entries.clear()
+            self.keys_by_table.clear()
+
+    def watch(self, engine: Engine) -> None:
+        """Invalidates results when writes through `engine` commit."""
+        on_committed_writes(engine, self.invalidate_tables)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats: Dict[str, Any] = dict(self.counters)
+            stats["entries"] = len(self.entries)
+            stats["max_entries"] = self.max_entries
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+            return stats
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.counters = dict.fromkeys(self.COUNTERS, 0)
+
+    def _remove(self, key: Hashable) -> None:
+        _, tables, _ = self.entries.pop(key)
+        for table in tables:
+            keys = self.keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_table[table]
@@ -0,0 +1,49 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session, SessionTransaction, SessionTransactionOrigin
+from sqlalchemy.sql.expression import Select, SelectBase
+
+# Session.info key set once a transaction has used the primary
+PRIMARY_PINNED = "primary_pinned"
+
+
+class RoutingSession(Session):
+    """Sends plain SELECTs to a read replica and everything else to
+    the primary: writes, flushes, SELECT ... FOR UPDATE, raw SQL and
+    every statement of a transaction opened with begin().
+
+    Once a transaction has written, its later reads also go to the
+    primary, so it sees its own writes whatever the replica lag.
+    Used as the sync_session_class of an AsyncSession. `router` picks
+    the engines through read_engine() and write_engine(), normally it
+    is the DbManager."""
+
+    def __init__(self, router=None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.router is None:
+            return super().get_bind(mapper, clause, **kwargs)
+        if self._reads_from_replica(clause):
+            return self.router.read_engine()
+        self.info[PRIMARY_PINNED] = True
+        return self.router.write_engine()
+
+    def _reads_from_replica(self, clause) -> bool:
+        if self._flushing or self.info.get(PRIMARY_PINNED):
+            return False
+        if not isinstance(clause, SelectBase):
+            return False
+        if isinstance(clause, Select) and clause._for_update_arg is not None:
+            return False
+        transaction = self.get_transaction()
+        return transaction is None or (
+            transaction.origin is SessionTransactionOrigin.AUTOBEGIN
+            and not self.in_nested_transaction()
+        )
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _unpin(session: Session, transaction: SessionTransaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(PRIMARY_PINNED, None)
@@ -0,0 +1,50 @@
+import os
+import time
+from threading import Lock
+from uuid import UUID
+
+_lock = Lock()
+_last_ms = 0
+_counter = 0
+
+# rand_a holds a counter so ids made in the same millisecond still sort
+# in creation order; it starts at a random value in the lower half to
+# leave room for increments
+_COUNTER_BITS = 12
+_COUNTER_MAX = (1 << _COUNTER_BITS) - 1
+
+
+def uuid7() -> UUID:
+    """Time ordered UUID, version 7 as laid out in RFC 9562:
+    48 bits of Unix time in milliseconds, the version, a 12 bit counter
+    for ordering within a millisecond, the variant and 62 random bits.
+
+    Ids made one after another compare (and index) in creation order,
+    so inserts land at the right edge of the primary key B-tree
+    instead of on random pages as with uuid4."""
+    global _last_ms, _counter
+
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _counter = int.from_bytes(os.urandom(2), "big") & (_COUNTER_MAX >> 1)
+        else:
+            # Same millisecond, or the clock went back: keep counting
+            # from the last timestamp so ids never go backwards
+            _counter += 1
+            if _counter > _COUNTER_MAX:
+                _last_ms += 1
+                _counter = 0
+        timestamp = _last_ms
+        counter = _counter
+
+    random_bits = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (
+        (timestamp & ((1 << 48) - 1)) << 80
+        | 0x7 << 76
+        | counter << 64
+        | 0b10 << 62
+        | random_bits
+    )
+    return UUID(int=value)
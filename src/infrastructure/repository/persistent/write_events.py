@@ -0,0 +1,29 @@
+from typing import Callable, Set
+
+from sqlalchemy import Connection, Engine, event
+
+WRITTEN_TABLES = "written_tables"
+
+
+def on_committed_writes(engine: Engine, callback: Callable[[Set[str]], None]) -> None:
+    """Calls `callback` with the names of the tables written by each
+    transaction on `engine`, once it commits. INSERT, UPDATE and DELETE
+    statements are tracked per connection; a rollback forgets them.
+    For an AsyncEngine pass its sync_engine."""
+
+    @event.listens_for(engine, "after_execute")
+    def after_execute(connection: Connection, statement, *args):
+        table = getattr(statement, "table", None)
+        if getattr(statement, "is_dml", False) and table is not None:
+            connection.info.setdefault(WRITTEN_TABLES, set()).add(table.name)
+
+    @event.listens_for(engine, "commit")
+    def commit(connection: Connection):
+        # Until the commit other connections still read the old rows
+        tables = connection.info.pop(WRITTEN_TABLES, None)
+        if tables:
+            callback(tables)
+
+    @event.listens_for(engine, "rollback")
+    def rollback(connection: Connection):
+        connection.info.pop(WRITTEN_TABLES, None)
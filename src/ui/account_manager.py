@@ -1,11 +1,11 @@
-import sys, os
-from typing import List
+import asyncio, sys, os
 from PyQt6.QtWidgets import (
     QApplication,
     QWidget,
     QLabel,
     QPushButton,
     QComboBox,
+    QLineEdit,
     QTableView,
     QHeaderView,
     QAbstractItemView,
@@ -13,235 +13,75 @@ from PyQt6.QtWidgets import (
     QHBoxLayout,
     QVBoxLayout,
     QSizePolicy,
+    QSpinBox,
+    QProgressBar,
+    QFileDialog,
 )
-from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QIcon
-from PyQt6.QtSql import (
-    QSqlDatabase,
-    QSqlQuery,
-    QSqlRelation,
-    QSqlRelationalTableModel,
-    QSqlRelationalDelegate,
+import qasync
+
+from infrastructure.repository.persistent.account_change_tracking import (
+    prune_tombstones,
+)
+from infrastructure.repository.persistent.account_queries import (
+    SELECT_LAST_CHANGE,
+    accounts_page_query,
+    select_country_names,
+    select_department_names,
 )
-from sqlalchemy import create_engine, Column, Integer, String
-from sqlalchemy.orm import declarative_base, sessionmaker
+from infrastructure.repository.persistent.account_repository import (
+    AccountRepository,
+)
+from infrastructure.repository.persistent.db_manager import DbManager
+from infrastructure.repository.persistent.lookup_cache import LookupCache
+from infrastructure.repository.persistent.migrations import collect_statistics
+from infrastructure.repository.persistent.query_cache import QueryResultCache
+from ui.accounts.account_change_feed import AccountChangeFeed
+from ui.accounts.account_export_worker import AccountExportWorker
+from ui.accounts.account_page_loader import AsyncAccountsPageLoader
+from ui.accounts.account_write_behind import AccountsWriteBehind
+from ui.accounts.accounts_filter_proxy_model import AccountsFilterProxyModel
+from ui.accounts.accounts_table_model import AccountsTableModel
+from ui.accounts.lookup_delegate import LookupDelegate
 
 WINDOW_TITLE = "Account Management"
 
+# Wait for a pause in typing before filtering
+SEARCH_DEBOUNCE_MS = 150
 
-Base = declarative_base()
-
+MAX_ADD_ROWS = 10000
 
-class AccountEntity(Base):
-    __tablename__ = "accounts"
-    id = Column(Integer, primary_key=True)
-    employee_id = Column(Integer)
-    first_name = Column(String)
-    last_name = Column(String)
-    email = Column(String)
-    department = Column(String)
-    country_id = Column(Integer)
+# Longest the window waits for the database pool to warm up
+PREWARM_WAIT_S = 0.5
 
 
-# SQLAlchemy engine and session setup
-engine = create_engine("sqlite:///accounts.db")
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
-session = Session()
+# SQLAlchemy engine and session setup. Reads go through the async
+# engine so the GUI keeps running while a page query is in flight;
+# writes, lookups and exports use the sync engine on the same file.
+db_manager = DbManager.get_instance()
+db_manager.setup_sqlite("accounts.db")
+engine = db_manager.sync_engine
+db_manager.migrate()
+with engine.begin() as connection:
+    prune_tombstones(connection)
+    # The tables may have been filled since the statistics were taken
+    collect_statistics(connection)
+Session = db_manager.sync_session_factory
+AsyncSession = db_manager.session_factory
 
+# Countries and departments, shown and edited by name
+lookups = LookupCache(Session)
+lookups.register("countries", select_country_names())
+# Reading the departments scans the accounts, so commits do not drop
+# them; new names are added as they are entered or read instead
+lookups.register("departments", select_department_names(), sources=())
+lookups.watch(engine)
 
-class AccountsTableItemModel:
-    def __init__(
-        self,
-        id: int = None,
-        employee_id: int = None,
-        first_name: str = None,
-        last_name: str = None,
-        email: str = None,
-        department: str = None,
-        country_id: int = None,
-    ) -> None:
-
-        self.id = id
-        self.employee_id = employee_id
-        self.first_name = first_name
-        self.last_name = last_name
-        self.email = email
-        self.department = department
-        self.country_id = country_id
-
-
-class AccountsTableModel(QAbstractTableModel):
-    def __init__(self, accounts: List[AccountsTableItemModel]):
-        super().__init__()
-        self.accounts: List[AccountsTableItemModel] = accounts
-
-    def data(self, index: QModelIndex, role: int):
-
-        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
-            return None
-
-        account = self.accounts[index.row()]
-
-        if index.column() == 0:
-            return account.id
-        if index.column() == 1:
-            return account.employee_id
-        if index.column() == 2:
-            return account.first_name
-        if index.column() == 3:
-            return account.last_name
-        if index.column() == 4:
-            return account.email
-        if index.column() == 5:
-            return account.department
-        if index.column() == 6:
-            return account.country_id
-
-        return None
-
-    def rowCount(self, index=QModelIndex()):
-        """Returns the number of rows"""
-        _ = index
-        return len(self.accounts)
-
-    def columnCount(self, index=QModelIndex()):
-        """Returns the column count"""
-        _ = index
-        return 7
-
-    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
-        """Enable editing of the table"""
-        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
-            return False
-
-        if not value:
-            return False
-
-        account = self.accounts[index.row()]
-        if index.column() == 0:  # Edit id
-            account.id = value
-        if index.column() == 1:  # Edit employee_id
-            account.employee_id = value
-        elif index.column() == 2:  # Edit first_name
-            account.first_name = value
-        elif index.column() == 3:  # Edit last_name
-            account.last_name = value
-        elif index.column() == 4:  # Edit email
-            account.email = value
-        elif index.column() == 5:  # Edit department
-            account.department = value
-        elif index.column() == 6:  # Edit country_id
-            account.country_id = int(value)
-
-        # session.commit()  # Commit changes to the database
-        self.dataChanged.emit(index, index, (Qt.ItemDataRole.DisplayRole,))
-        return True
-
-    def flags(self, index):
-        """Enable editing of the table"""
-        if index.column() >= 0:  # Allow editing for all columns except the id column
-            return (
-                Qt.ItemFlag.ItemIsEditable
-                | Qt.ItemFlag.ItemIsEnabled
-                | Qt.ItemFlag.ItemIsSelectable
-            )
-        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
-
-    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
-        """Set header names"""
-        if role != Qt.ItemDataRole.DisplayRole:
-            return None
-        if orientation == Qt.Orientation.Horizontal:
-            return ["ID", "Employee ID", "First", "Last", "Email", "Dept.", "Country"][
-                section
-            ]
-        return super().headerData(section, orientation, role)
-
-    # def removeRow(self, row, parent=QModelIndex()):
-    #     """Remove the selected row from the table"""
-    #     self.beginRemoveRows(parent, row, row)
-    #     account_to_delete = self.accounts[row]
-    #     session.delete(account_to_delete)  # Remove from database
-    #     session.commit()  # Commit to DB
-    #     self.accounts.pop(row)  # Remove from internal list
-    #     self.endRemoveRows()
-
-    # def addRow(
-    #     self,
-    #     id: int,
-    #     employee_id: int,
-    #     first_name: str,
-    #     last_name: str,
-    #     email: str,
-    #     department: str,
-    #     country_id: int,
-    # ):
-    #     """Add a row to the end of the table"""
-    #     self.beginInsertRows(QModelIndex(), self.rowCount(), self.rowCount())
-    #     new_account = AccountsTableItemModel(
-    #         id=id,
-    #         employee_id=employee_id,
-    #         first_name=first_name,
-    #         last_name=last_name,
-    #         email=email,
-    #         department=department,
-    #         country_id=country_id,
-    #     )
-    #     session.add(new_account)  # Add to database
-    #     session.commit()  # Commit to DB, assigns ID automatically
-    #     self.accounts.append(new_account)  # Add to internal list
-    #     self.endInsertRows()
-
-    def add_empty_row(self):
-        self.beginInsertRows(QModelIndex(), self.rowCount(), self.rowCount())
-        self.accounts.append(AccountsTableItemModel())
-        self.endInsertRows()
-
-    def removeRow(self, row, parent=QModelIndex()):
-        """Remove the selected row from the table"""
-        self.beginRemoveRows(parent, row, row)
-        # account_to_delete = self.accounts[row]
-        self.accounts.pop(row)  # Remove from internal list
-        self.endRemoveRows()
-
-    def sort(self, column: int, order=Qt.SortOrder.AscendingOrder):
-        """Sort rows"""
-        if column == 0:  # Sort by 'id'
-            self.accounts.sort(
-                key=lambda i: i.id, reverse=order == Qt.SortOrder.DescendingOrder
-            )
-        elif column == 1:  # Sort by 'employee_id'
-            self.accounts.sort(
-                key=lambda i: i.employee_id,
-                reverse=order == Qt.SortOrder.DescendingOrder,
-            )
-        elif column == 2:  # Sort by 'first_name'
-            self.accounts.sort(
-                key=lambda i: i.first_name,
-                reverse=order == Qt.SortOrder.DescendingOrder,
-            )
-        elif column == 3:  # Sort by 'last_name'
-            self.accounts.sort(
-                key=lambda i: i.last_name,
-                reverse=order == Qt.SortOrder.DescendingOrder,
-            )
-        elif column == 4:  # Sort by 'email'
-            self.accounts.sort(
-                key=lambda i: i.email,
-                reverse=order == Qt.SortOrder.DescendingOrder,
-            )
-        elif column == 5:  # Sort by 'department'
-            self.accounts.sort(
-                key=lambda i: i.department,
-                reverse=order == Qt.SortOrder.DescendingOrder,
-            )
-        elif column == 6:  # Sort by 'email'
-            self.accounts.sort(
-                key=lambda i: i.country_id,
-                reverse=order == Qt.SortOrder.DescendingOrder,
-            )
-        self.layoutChanged.emit()  # Notify the view that the model has changed
+# Pages read while scrolling and re-sorting, dropped when the write
+# behind commits changes to the accounts
+query_cache = QueryResultCache()
+query_cache.watch(engine)
 
 
 class MainWindow(QWidget):
@@ -249,7 +89,18 @@ class MainWindow(QWidget):
         super().__init__()
 
         self.model: AccountsTableModel = None
+        self.proxy_model: AccountsFilterProxyModel = None
+        self.write_behind: AccountsWriteBehind = None
+        self.change_feed: AccountChangeFeed = None
+        self.save_status_label = None
+        self.cancel_load_button = None
         self.table_view = None
+        self.search_edit = None
+        self.search_timer = None
+        self.add_count_spin = None
+        self.export_button = None
+        self.export_progress_bar = None
+        self.export_worker: AccountExportWorker = None
 
         self.initialize_ui()
 
@@ -264,42 +115,32 @@ class MainWindow(QWidget):
 
     def create_model(self):
         """Fetch data and bind to model"""
-        # accounts = session.query(Accounts).all()
-        accounts: List[AccountsTableItemModel] = []
-        accounts.append(
-            AccountsTableItemModel(
-                id=1,
-                employee_id="1000",
-                first_name="Mark",
-                last_name="Bass",
-                email="mark.bass@example.com",
-                department="Fulfilment",
-                country_id=1,
-            )
-        )
-        accounts.append(
-            AccountsTableItemModel(
-                id=2,
-                employee_id="1001",
-                first_name="Jamie",
-                last_name="Oliver",
-                email="jamie.oliver@example.com",
-                department="Kitchen",
-                country_id=2,
-            )
+        self.write_behind = AccountsWriteBehind(Session)
+        self.write_behind.pending_changed.connect(self.update_save_status)
+        self.write_behind.flush_failed.connect(self.show_save_error)
+        self.write_behind.changes_rejected.connect(self.show_rejected_changes)
+        repository = AccountRepository(AsyncSession, query_cache)
+        self.model = AccountsTableModel(
+            page_loader=AsyncAccountsPageLoader(repository),
+            write_behind=self.write_behind,
         )
-        accounts.append(
-            AccountsTableItemModel(
-                id=3,
-                employee_id="1002",
-                first_name="Gordon",
-                last_name="Ramsey",
-                email="gordon.ramsey@example.com",
-                department="Kitchen",
-                country_id=1,
-            )
+        self.model.loading_changed.connect(self.update_loading_status)
+        self.model.load_failed.connect(self.show_load_error)
+        # Sorted by the country names shown, as the database sorts them
+        self.model.set_sort_labels(6, lambda: lookups.labels("countries"))
+        self.model.dataChanged.connect(self.add_departments)
+        self.model.rowsInserted.connect(
+            lambda _, first, last: self.add_department_rows(first, last)
         )
-        self.model = AccountsTableModel(accounts)
+
+        # Rows changed by other windows and programs are merged in
+        # as they are found, without reloading
+        self.change_feed = AccountChangeFeed(repository)
+        self.change_feed.changes_found.connect(self.model.apply_changes)
+        self.change_feed.poll_failed.connect(self.show_refresh_error)
+        self.change_feed.start()
+        self.proxy_model = AccountsFilterProxyModel()
+        self.proxy_model.setSourceModel(self.model)
 
     def setup_main_window(self):
         """Create and arrange widgets in the main window."""
@@ -311,10 +152,26 @@ class MainWindow(QWidget):
         add_product_button.setIcon(QIcon(os.path.join(icons_path, "add_user.png")))
         add_product_button.setStyleSheet("padding: 10px")
         add_product_button.clicked.connect(self.add_item)
+        self.add_count_spin = QSpinBox()
+        self.add_count_spin.setRange(1, MAX_ADD_ROWS)
+        self.add_count_spin.setToolTip("Number of rows to add")
         del_product_button = QPushButton("Delete")
         del_product_button.setIcon(QIcon(os.path.join(icons_path, "trash_can.png")))
         del_product_button.setStyleSheet("padding: 10px")
         del_product_button.clicked.connect(self.delete_item)
+        save_button = QPushButton("Save")
+        save_button.setStyleSheet("padding: 10px")
+        save_button.clicked.connect(self.write_behind.flush)
+        self.save_status_label = QLabel("All changes saved")
+        self.cancel_load_button = QPushButton("Cancel Loading")
+        self.cancel_load_button.setStyleSheet("padding: 10px")
+        self.cancel_load_button.setEnabled(False)
+        self.cancel_load_button.clicked.connect(self.model.cancel_loading)
+        self.export_button = QPushButton("Export...")
+        self.export_button.setStyleSheet("padding: 10px")
+        self.export_button.clicked.connect(self.export_accounts)
+        self.export_progress_bar = QProgressBar()
+        self.export_progress_bar.setVisible(False)
 
         # Set up sorting combobox
         sorting_options = [
@@ -328,10 +185,28 @@ class MainWindow(QWidget):
         sort_combo = QComboBox()
         sort_combo.addItems(sorting_options)
         sort_combo.currentTextChanged.connect(self.set_sorting_order)
+
+        # Search box, filtering once typing pauses
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("Search ID, name or email...")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(self.apply_search)
+        self.search_edit.textChanged.connect(self.search_timer.start)
+
         buttons_h_box = QHBoxLayout()
         buttons_h_box.addWidget(add_product_button)
+        buttons_h_box.addWidget(self.add_count_spin)
         buttons_h_box.addWidget(del_product_button)
+        buttons_h_box.addWidget(save_button)
+        buttons_h_box.addWidget(self.save_status_label)
+        buttons_h_box.addWidget(self.export_button)
+        buttons_h_box.addWidget(self.export_progress_bar)
         buttons_h_box.addStretch()
+        buttons_h_box.addWidget(self.cancel_load_button)
+        buttons_h_box.addWidget(self.search_edit)
         buttons_h_box.addWidget(sort_combo)
 
         # Widget to contain editing buttons
@@ -339,21 +214,31 @@ class MainWindow(QWidget):
         edit_container.setLayout(buttons_h_box)
 
         self.table_view = QTableView()
-        self.table_view.setModel(self.model)
+        self.table_view.setModel(self.proxy_model)
         horizontal = self.table_view.horizontalHeader()
         horizontal.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         vertical = self.table_view.verticalHeader()
-        vertical.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        # Stretched rows would all fit in the viewport and make the view
+        # fetch every page up front, so rows keep a fixed height
+        vertical.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         self.table_view.setSelectionMode(
-            QAbstractItemView.SelectionMode.SingleSelection
+            QAbstractItemView.SelectionMode.ExtendedSelection
         )
         self.table_view.setSelectionBehavior(
             QAbstractItemView.SelectionBehavior.SelectRows
         )
 
-        # Instantiate the delegate
-        delegate = QSqlRelationalDelegate()
-        self.table_view.setItemDelegate(delegate)
+        # Country ids are shown as names, and both lookup columns are
+        # edited with a combo box
+        self.table_view.setItemDelegateForColumn(
+            5,
+            LookupDelegate(
+                lookups, "departments", show_names=False, editable=True, parent=self
+            ),
+        )
+        self.table_view.setItemDelegateForColumn(
+            6, LookupDelegate(lookups, "countries", parent=self)
+        )
 
         # Main layout
         main_v_box = QVBoxLayout()
@@ -363,14 +248,146 @@ class MainWindow(QWidget):
         self.setLayout(main_v_box)
 
     def add_item(self):
-        """Add a new record to the last row of the table."""
-        self.model.add_empty_row()
+        """Add new records to the end of the table."""
+        # An empty row matches no search, so show every row
+        self.search_edit.clear()
+        self.apply_search()
+        self.model.add_empty_rows(self.add_count_spin.value())
 
     def delete_item(self):
-        """Delete an entire row from the table."""
-        current_item = self.table_view.selectedIndexes()
-        if len(current_item):
-            self.model.removeRow(current_item[0].row())
+        """Delete every selected row from the table."""
+        proxy_rows = []
+        for selection_range in self.table_view.selectionModel().selection():
+            proxy_rows.extend(
+                range(selection_range.top(), selection_range.bottom() + 1)
+            )
+        if proxy_rows:
+            self.model.remove_rows(self.proxy_model.source_rows(proxy_rows))
+
+    def update_save_status(self, pending: int):
+        """Show whether there are edits not yet written to the database."""
+        self.save_status_label.setToolTip("")
+        if pending:
+            self.save_status_label.setText(f"{pending} unsaved change(s)")
+            self.setWindowTitle(f"{WINDOW_TITLE} *")
+        else:
+            self.save_status_label.setText("All changes saved")
+            self.setWindowTitle(WINDOW_TITLE)
+
+    def show_save_error(self, message: str):
+        """Saving failed, the write behind retries on its own."""
+        self.save_status_label.setText(
+            f"{self.write_behind.pending_count()} unsaved change(s), retrying"
+        )
+        self.save_status_label.setToolTip(message)
+
+    def show_rejected_changes(self, errors: dict):
+        """The database refused some changes; they are kept until they
+        are edited again, or reverted to the stored values."""
+        details = "\n".join(
+            f"Account {key if key > 0 else 'new'}: {error}"
+            for key, error in list(errors.items())[:10]
+        )
+        answer = QMessageBox.warning(
+            self,
+            "Changes not saved",
+            f"{len(errors)} change(s) were refused by the database.\n{details}\n\n"
+            "Revert them to the saved values? Otherwise edit them to try again.",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+        )
+        if answer == QMessageBox.StandardButton.Yes:
+            self.model.revert_changes(errors)
+
+    def show_refresh_error(self, message: str):
+        """Polling for changes failed, the next poll tries again."""
+        self.save_status_label.setToolTip(f"Unable to refresh: {message}")
+
+    def update_loading_status(self, loading: bool):
+        """Allow cancelling while a page query is running."""
+        self.cancel_load_button.setEnabled(loading)
+
+    def add_departments(self, top_left, bottom_right):
+        """Adds department names entered or changed in the table to the
+        department lookup."""
+        if top_left.column() <= 5 <= bottom_right.column():
+            self.add_department_rows(top_left.row(), bottom_right.row())
+
+    def add_department_rows(self, first: int, last: int):
+        for row in range(first, last + 1):
+            department = self.model.index(row, 5).data()
+            if department:
+                lookups.add("departments", department)
+
+    def show_load_error(self, message: str):
+        QMessageBox.warning(self, "Error", f"Unable to load accounts.\n{message}")
+
+    def export_accounts(self):
+        """Export every account to a file, or cancel a running export."""
+        if self.export_worker is not None:
+            self.export_worker.stop_running()
+            return
+
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            "Export Accounts",
+            "accounts.csv",
+            "CSV (*.csv);;JSON Lines (*.jsonl)",
+        )
+        if not path:
+            return
+
+        # The export reads the database, so include edits not yet written
+        self.write_behind.flush()
+        self.export_worker = AccountExportWorker(Session, path)
+        self.export_worker.progress_signal.connect(self.update_export_progress)
+        self.export_worker.exported_signal.connect(self.show_export_done)
+        self.export_worker.failed_signal.connect(self.show_export_error)
+        self.export_worker.finished.connect(self.export_finished)
+        self.export_button.setText("Cancel Export")
+        self.export_progress_bar.setRange(0, 0)
+        self.export_progress_bar.setVisible(True)
+        self.export_worker.start()
+
+    def update_export_progress(self, written: int, total: int):
+        self.export_progress_bar.setRange(0, total)
+        self.export_progress_bar.setValue(written)
+
+    def show_export_done(self, written: int):
+        QMessageBox.information(self, "Export", f"Exported {written} accounts.")
+
+    def show_export_error(self, message: str):
+        QMessageBox.warning(self, "Error", f"Unable to export accounts.\n{message}")
+
+    def export_finished(self):
+        self.export_worker.deleteLater()
+        self.export_worker = None
+        self.export_button.setText("Export...")
+        self.export_progress_bar.setVisible(False)
+
+    def closeEvent(self, event):
+        """Write pending edits before closing."""
+        if not self.write_behind.flush():
+            # A failed write, or new rows still missing required values
+            answer = QMessageBox.question(
+                self,
+                "Unsaved Changes",
+                f"{self.write_behind.pending_count()} changes could not be saved, "
+                "such as new rows with empty fields. Close anyway and lose them?",
+            )
+            if answer != QMessageBox.StandardButton.Yes:
+                event.ignore()
+                return
+        self.model.cancel_loading()
+        self.change_feed.stop()
+        if self.export_worker is not None:
+            self.export_worker.stop_running()
+            self.export_worker.wait()
+        event.accept()
+
+    def apply_search(self):
+        """Filter the table by the text in the search box."""
+        self.search_timer.stop()
+        self.proxy_model.set_filter_text(self.search_edit.text())
 
     def set_sorting_order(self, text):
         """Sort the rows in the table."""
@@ -392,5 +409,18 @@ class MainWindow(QWidget):
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    # Connect and compile the first queries before the window asks for
+    # its first page, so that page costs one round trip; a slow server
+    # delays the window by at most PREWARM_WAIT_S
+    prewarm = db_manager.start_prewarm(
+        statements=[accounts_page_query(None, 0), (SELECT_LAST_CHANGE, {})]
+    )
+    loop.run_until_complete(asyncio.wait([prewarm], timeout=PREWARM_WAIT_S))
+    # Keeps check_conn() and the replica rotation current while running
+    db_manager.start_health_checks()
     window = MainWindow()
-    sys.exit(app.exec())
+    with loop:
+        loop.run_forever()
+        loop.run_until_complete(db_manager.dispose())
@@ -0,0 +1,132 @@
+import asyncio
+import datetime
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+
+from domain.repository.account_repository import AbstractAccountRepository
+
+POLL_INTERVAL_MS = 2000
+
+# A transaction stamps its rows before it commits, so rows can become
+# visible after a poll that ran later than their stamp. Each poll also
+# reads back this far behind the database time of the previous poll
+CHANGE_OVERLAP = datetime.timedelta(seconds=5)
+
+
+class AccountChangeFeed(QObject):
+    """Polls the accounts table for rows whose last_updated_on is past
+    the newest change seen so far, and for new tombstones, and emits
+    only those. Connect changes_found to AccountsTableModel.apply_changes
+    of every open model to keep it current without reloading.
+
+    Times come from the database, never the local clock. Changes
+    stamped within CHANGE_OVERLAP of the previous poll are read again
+    but emitted once; so an idle database costs one indexed lookup per
+    poll that finds nothing. A row counts as changed when its values
+    differ from the ones last emitted for it, not by its stamp alone:
+    SQLite stamps with whole seconds, so two updates of a row within
+    one second carry the same stamp."""
+
+    changes_found = pyqtSignal(list, list)
+    poll_failed = pyqtSignal(str)
+
+    def __init__(
+        self,
+        repository: AbstractAccountRepository,
+        interval_ms: int = POLL_INTERVAL_MS,
+    ) -> None:
+        super().__init__()
+        self.repository = repository
+        self.watermark: Optional[datetime.datetime] = None
+        # Database time at the start of the previous poll
+        self.polled_at: Optional[datetime.datetime] = None
+        self.started = False
+        # (kind, id) -> (stamp, values) of the changes inside the
+        # overlap window; deletes have no values
+        self.seen: Dict[Hashable, Tuple[datetime.datetime, Any]] = {}
+        self.poll_task: asyncio.Task = None
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self.poll)
+
+    def start(self) -> None:
+        """Starts polling from the latest change in the database, so
+        rows already loaded are not emitted again."""
+        self.started = False
+        self.timer.start()
+        self.poll()
+
+    def stop(self) -> None:
+        self.timer.stop()
+        if self.poll_task is not None:
+            self.poll_task.cancel()
+
+    def poll(self) -> None:
+        if self.poll_task is None:
+            self.poll_task = asyncio.ensure_future(self._poll())
+            self.poll_task.add_done_callback(self._poll_done)
+
+    async def _poll(self) -> None:
+        if not self.started:
+            self.seen.clear()
+            self.polled_at = None
+            self.watermark = await self.repository.last_change()
+            # Changes inside the first overlap window are already in
+            # the loaded rows: remember them instead of emitting them
+            await self._read_changes()
+            self.started = True
+            return
+
+        rows, deleted_ids = await self._read_changes()
+        if rows or deleted_ids:
+            # Possibly written by another process, which the cache's
+            # watched engines do not see
+            self.repository.invalidate()
+            self.changes_found.emit(rows, deleted_ids)
+
+    async def _read_changes(self) -> Tuple[List[tuple], List[Hashable]]:
+        """Changes since the last poll that have not been seen yet."""
+        polled_at = await self.repository.database_time()
+        since = self.watermark
+        if since is not None:
+            # The first poll has no previous one, so reads back from now
+            previous = polled_at if self.polled_at is None else self.polled_at
+            since = min(since, previous - CHANGE_OVERLAP)
+        changed, deleted = await self.repository.fetch_changes(since)
+
+        rows = []
+        for row in changed:
+            values = tuple(row[:-1])
+            if self._is_new(("changed", row[0]), row[-1], values):
+                rows.append(values)
+        deleted_ids = [
+            key for key, stamp in deleted if self._is_new(("deleted", key), stamp)
+        ]
+
+        # The next poll reads back to polled_at - CHANGE_OVERLAP, so
+        # anything older cannot come again
+        self.polled_at = polled_at
+        cutoff = polled_at - CHANGE_OVERLAP
+        self.seen = {
+            change: seen for change, seen in self.seen.items() if seen[0] > cutoff
+        }
+        return rows, deleted_ids
+
+    def _is_new(
+        self, change: Hashable, stamp: datetime.datetime, values: Any = None
+    ) -> bool:
+        seen = self.seen.get(change)
+        is_new = seen is None or seen[1] != values
+        if is_new or stamp > seen[0]:
+            self.seen[change] = (stamp, values)
+        if self.watermark is None or stamp > self.watermark:
+            self.watermark = stamp
+        return is_new
+
+    def _poll_done(self, task: asyncio.Task) -> None:
+        if self.poll_task is task:
+            self.poll_task = None
+        if not task.cancelled() and task.exception() is not None:
+            self.poll_failed.emit(str(task.exception()))
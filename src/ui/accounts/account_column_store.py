@@ -0,0 +1,199 @@
+import sys
+from array import array
+from itertools import compress
+from operator import itemgetter
+from typing import Any, Iterable, List, Sequence, Tuple
+
+# array("q") cannot hold None, so empty integer cells store this value
+NULL_INT = -(2**63)
+
+# Rows removed in more runs than this are dropped in one filtering
+# pass per column instead of one slice deletion per run
+MAX_SLICE_DELETES = 64
+
+
+class IntColumn:
+    """Integer column backed by a typed array of signed 64 bit values."""
+
+    __slots__ = ("values",)
+
+    def __init__(self) -> None:
+        self.values = array("q")
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def get(self, row: int) -> Any:
+        value = self.values[row]
+        return None if value == NULL_INT else value
+
+    def set(self, row: int, value: Any) -> None:
+        self.values[row] = self.convert(value)
+
+    def append(self, value: Any) -> None:
+        self.values.append(self.convert(value))
+
+    def extend(self, values: Iterable[Any]) -> None:
+        self.values.extend(map(self.convert, values))
+
+    def delete(self, first: int, last: int) -> None:
+        del self.values[first : last + 1]
+
+    def keep(self, selectors: Sequence[int]) -> None:
+        """Keeps the rows whose selector is true."""
+        self.values = array("q", compress(self.values, selectors))
+
+    def truncate(self, length: int) -> None:
+        del self.values[length:]
+
+    def sort_keys(self) -> Sequence:
+        """Empty cells hold the smallest int64, so they sort first."""
+        return self.values
+
+    @staticmethod
+    def convert(value: Any) -> int:
+        return NULL_INT if value is None else int(value)
+
+
+class StrColumn:
+    """String column stored as a list of references.
+    Low cardinality columns intern their values so that repeated
+    names and departments share a single string object."""
+
+    __slots__ = ("values", "intern")
+
+    def __init__(self, intern: bool = False) -> None:
+        self.values: List[str] = []
+        self.intern = intern
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def get(self, row: int) -> Any:
+        return self.values[row]
+
+    def set(self, row: int, value: Any) -> None:
+        self.values[row] = self.convert(value)
+
+    def append(self, value: Any) -> None:
+        self.values.append(self.convert(value))
+
+    def extend(self, values: Iterable[Any]) -> None:
+        self.values.extend(map(self.convert, values))
+
+    def delete(self, first: int, last: int) -> None:
+        del self.values[first : last + 1]
+
+    def keep(self, selectors: Sequence[int]) -> None:
+        """Keeps the rows whose selector is true."""
+        self.values = list(compress(self.values, selectors))
+
+    def truncate(self, length: int) -> None:
+        del self.values[length:]
+
+    def sort_keys(self) -> Sequence:
+        """Empty cells sort first, together with empty strings."""
+        return [value if value is not None else "" for value in self.values]
+
+    def convert(self, value: Any) -> str:
+        if value is None:
+            return None
+        value = str(value)
+        return sys.intern(value) if self.intern else value
+
+
+class AccountColumnStore:
+    """Column oriented storage for the rows of the accounts table.
+    Column positions match AccountsTableModel, so `getters[column]`
+    returns a cell reader without any per-column branching."""
+
+    COLUMN_NAMES = (
+        "id",
+        "employee_id",
+        "first_name",
+        "last_name",
+        "email",
+        "department",
+        "country_id",
+    )
+
+    def __init__(self) -> None:
+        self.columns = [
+            IntColumn(),  # id
+            IntColumn(),  # employee_id
+            StrColumn(intern=True),  # first_name
+            StrColumn(intern=True),  # last_name
+            StrColumn(),  # email
+            StrColumn(intern=True),  # department
+            IntColumn(),  # country_id
+        ]
+        self.getters = [column.get for column in self.columns]
+
+    def __len__(self) -> int:
+        return len(self.columns[0])
+
+    def get(self, row: int, column: int) -> Any:
+        return self.getters[column](row)
+
+    def set(self, row: int, column: int, value: Any) -> None:
+        self.columns[column].set(row, value)
+
+    def row(self, row: int) -> tuple:
+        return tuple(getter(row) for getter in self.getters)
+
+    def append_row(self, values: Sequence[Any]) -> None:
+        for column, value in zip(self.columns, values):
+            column.append(value)
+
+    def extend_rows(self, rows: Iterable[Sequence[Any]]) -> None:
+        """Appends many rows, converting one column at a time. Values
+        past the last column, such as the sort name some pages add,
+        are ignored."""
+        for column, values in zip(self.columns, zip(*rows)):
+            column.extend(values)
+
+    def remove_rows(self, rows: Sequence[int]) -> None:
+        """Drops the given rows, which must be sorted and distinct."""
+        runs = contiguous_runs(rows)
+        if len(runs) <= MAX_SLICE_DELETES:
+            for first, last in reversed(runs):
+                for column in self.columns:
+                    column.delete(first, last)
+            return
+
+        selectors = bytearray(b"\x01") * len(self)
+        for row in rows:
+            selectors[row] = 0
+        for column in self.columns:
+            column.keep(selectors)
+
+    def truncate(self, length: int) -> None:
+        """Drops every row from `length` onwards."""
+        for column in self.columns:
+            column.truncate(length)
+
+    def clear(self) -> None:
+        self.truncate(0)
+
+    def sort_permutation(self, column: int, reverse: bool = False) -> List[int]:
+        """Returns the row order that sorts the store by `column`."""
+        keys = self.columns[column].sort_keys()
+        return sorted(range(len(self)), key=keys.__getitem__, reverse=reverse)
+
+
+def contiguous_runs(values: Iterable[int]) -> List[Tuple[int, int]]:
+    """Groups sorted, distinct integers into (first, last) runs."""
+    runs = []
+    for value in values:
+        if runs and runs[-1][1] == value - 1:
+            runs[-1] = (runs[-1][0], value)
+        else:
+            runs.append((value, value))
+    return runs
+
+
+def rows_from_items(items: Iterable[Any]) -> Iterable[tuple]:
+    """Adapts objects with account attributes to store rows."""
+    getter = itemgetter(*AccountColumnStore.COLUMN_NAMES)
+    for item in items:
+        yield getter(vars(item))
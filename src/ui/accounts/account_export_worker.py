@@ -0,0 +1,39 @@
+import threading
+
+from PyQt6.QtCore import QThread, pyqtSignal
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+from application.service.account_export_service import export_accounts
+
+
+class AccountExportWorker(QThread):
+    """Runs export_accounts() off the GUI thread."""
+
+    progress_signal = pyqtSignal(int, int)
+    exported_signal = pyqtSignal(int)
+    failed_signal = pyqtSignal(str)
+
+    def __init__(self, session_factory: sessionmaker, path: str):
+        super().__init__()
+        self.session_factory = session_factory
+        self.path = path
+        self.cancelled = threading.Event()
+
+    def stop_running(self):
+        """Stop after the batch being written; no file is left behind."""
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            written = export_accounts(
+                self.session_factory,
+                self.path,
+                progress=self.progress_signal.emit,
+                cancelled=self.cancelled,
+            )
+        except (OSError, SQLAlchemyError) as exc:
+            self.failed_signal.emit(str(exc))
+            return
+        if not self.cancelled.is_set():
+            self.exported_signal.emit(written)
@@ -0,0 +1,191 @@
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Row, Select
+from sqlalchemy.orm import Session
+
+from domain.repository.account_repository import AbstractAccountRepository
+from infrastructure.repository.persistent.account_queries import (
+    ACCOUNT_COLUMNS,
+    SORT_NAMES,
+    accounts_page_query,
+    accounts_prefix_query,
+)
+
+PAGE_SIZE = 256
+
+# Rows handed to the model at a time while a page streams in
+CHUNK_SIZE = 64
+
+
+class AccountsPageLoaderBase:
+    """Where a page loader is in the keyset paginated accounts: the
+    sort order, the (sort value, id) of the last row read and whether
+    the NULL pass or the end was reached. The subclasses read pages,
+    AccountsPageLoader through fetch_next() and AsyncAccountsPageLoader
+    through stream_next(); `is_async` tells which one a loader has."""
+
+    is_async = False
+
+    def __init__(self, page_size: int = PAGE_SIZE) -> None:
+        self.page_size = page_size
+        self.sort_column = 0
+        self.descending = False
+        self.last_key: Optional[Tuple] = None
+        self.reading_nulls = False
+        self.exhausted = False
+
+    def reset(self, sort_column: int = None, descending: bool = None) -> None:
+        """Start again from the first page, optionally in a new order."""
+        if sort_column is not None:
+            self.sort_column = sort_column
+        if descending is not None:
+            self.descending = descending
+        self.last_key = None
+        self.reading_nulls = False
+        self.exhausted = False
+
+    def position(self) -> tuple:
+        """Everything needed to resume reading where the loader is now."""
+        return (
+            self.sort_column,
+            self.descending,
+            self.last_key,
+            self.reading_nulls,
+            self.exhausted,
+        )
+
+    def restore(self, position: tuple) -> None:
+        (
+            self.sort_column,
+            self.descending,
+            self.last_key,
+            self.reading_nulls,
+            self.exhausted,
+        ) = position
+
+    def has_passed(self, row: Sequence) -> bool:
+        """Whether `row` sorts at or before the last row read, so that
+        no later page will contain it."""
+        if self.exhausted:
+            return True
+        value = row[self.sort_column]
+        if self.reading_nulls and value is not None:
+            # For columns in SORT_NAMES this takes a key as having a
+            # name; a key without a lookup row is read by the NULL pass
+            return True
+        if self.last_key is None:
+            return False
+        if self.sort_column in SORT_NAMES and not self.reading_nulls:
+            # Sorted by a name the row does not carry: left to a later
+            # page, or the NULL pass, rather than risk showing it twice
+            return False
+        if self.sort_column == 0 or self.reading_nulls:
+            key, last = row[0], self.last_key[1]
+        elif value is None:
+            return False  # Comes with the NULL pass
+        else:
+            key, last = (value, row[0]), self.last_key
+        return key >= last if self.descending else key <= last
+
+    def _query(self, limit: int) -> Tuple[Select, Dict[str, Any]]:
+        return accounts_page_query(
+            self.last_key,
+            limit,
+            sort_column=self.sort_column,
+            descending=self.descending,
+            nulls=self.reading_nulls,
+        )
+
+    def _seek_past(self, row: Row) -> None:
+        """The next query starts after `row`."""
+        if self.sort_column in SORT_NAMES and not self.reading_nulls:
+            # The looked up name, which the page adds as its last column
+            self.last_key = (row[len(ACCOUNT_COLUMNS)], row[0])
+        else:
+            self.last_key = (row[self.sort_column], row[0])
+
+    def _query_done(self, count: int, limit: int) -> None:
+        """A query asked for `limit` rows and returned `count`."""
+        if count < limit:
+            if self.reading_nulls or not ACCOUNT_COLUMNS[self.sort_column].nullable:
+                # The id and NOT NULL columns have no NULL pass
+                self.exhausted = True
+            else:
+                # Non NULL values are done, continue with the NULLs
+                self.reading_nulls = True
+                self.last_key = None
+
+
+class AccountsPageLoader(AccountsPageLoaderBase):
+    """Loads the accounts table one fixed size page at a time.
+    Only plain rows are selected so the session's identity map does
+    not grow with the number of pages read."""
+
+    def __init__(self, session: Session, page_size: int = PAGE_SIZE) -> None:
+        super().__init__(page_size)
+        self.session = session
+
+    def fetch_next(self) -> List[Row]:
+        """Returns the next page of rows, or an empty list when
+        the end of the table has been reached."""
+
+        rows: List[Row] = []
+        while not self.exhausted and len(rows) < self.page_size:
+            limit = self.page_size - len(rows)
+            read = self.session.execute(*self._query(limit)).all()
+            if read:
+                self._seek_past(read[-1])
+            self._query_done(len(read), limit)
+            rows.extend(read)
+        return rows
+
+    def fetch_matching(self, prefix: str) -> List[Row]:
+        """Every account the search `prefix` matches, loaded or not."""
+        return self.session.execute(accounts_prefix_query(prefix)).all()
+
+
+class AsyncAccountsPageLoader(AccountsPageLoaderBase):
+    """Reads pages through an account repository, streaming each page
+    in chunks so rows reach the view while the query is still running."""
+
+    is_async = True
+
+    def __init__(
+        self,
+        repository: AbstractAccountRepository,
+        page_size: int = PAGE_SIZE,
+        chunk_size: int = CHUNK_SIZE,
+    ) -> None:
+        super().__init__(page_size)
+        self.repository = repository
+        self.chunk_size = chunk_size
+
+    async def fetch_matching(self, prefix: str) -> List[Row]:
+        return await self.repository.fetch_matching(prefix)
+
+    async def stream_next(self) -> AsyncIterator[List[Row]]:
+        """Yields the next page in chunks of at most `chunk_size` rows."""
+
+        read = 0
+        while not self.exhausted and read < self.page_size:
+            limit = self.page_size - read
+            chunks = self.repository.stream_page(
+                self.last_key,
+                limit,
+                sort_column=self.sort_column,
+                descending=self.descending,
+                nulls=self.reading_nulls,
+                chunk_size=self.chunk_size,
+            )
+            count = 0
+            # Closed right away if the consumer stops mid page
+            async with aclosing(chunks):
+                async for chunk in chunks:
+                    # Advance per chunk, so a cancelled page resumes
+                    # after the rows the model already has
+                    self._seek_past(chunk[-1])
+                    count += len(chunk)
+                    yield chunk
+            self._query_done(count, limit)
+            read += count
@@ -0,0 +1,183 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+from ui.accounts.account_column_store import AccountColumnStore
+
+# employee_id, first_name, last_name, email
+SEARCH_COLUMNS = (1, 2, 3, 4)
+
+# Rows appended after the last build are scanned linearly until
+# there are this many of them (or an eighth of the indexed rows),
+# then merged into the sorted index
+MAX_UNINDEXED_ROWS = 4096
+
+# Sorts after every character a search prefix can end with
+PREFIX_END = "\U0010ffff"
+
+
+def search_key(value) -> str:
+    return "" if value is None else str(value).lower()
+
+
+class ColumnPrefixIndex:
+    """Sorted-key index of one column: `keys` holds the lower cased
+    values in sorted order and `rows` the store row of each key, so all
+    values starting with a prefix sit in one contiguous slice. Entries
+    are ordered by (key, row), and `row_keys` holds the key of every
+    indexed row, so an entry is found by bisection, not a scan."""
+
+    __slots__ = ("column", "keys", "rows", "row_keys")
+
+    def __init__(self, column: int) -> None:
+        self.column = column
+        self.keys: List[str] = []
+        self.rows = array("q")
+        self.row_keys: List[str] = []
+
+    def build(self, store: AccountColumnStore) -> None:
+        getter = store.getters[self.column]
+        values = [search_key(getter(row)) for row in range(len(store))]
+        # Stable, so rows with equal keys stay in row order
+        order = sorted(range(len(values)), key=values.__getitem__)
+        self.keys = [values[row] for row in order]
+        self.rows = array("q", order)
+        self.row_keys = values
+
+    def merge(self, store: AccountColumnStore, start: int) -> None:
+        """Adds the rows from `start` to the end of the store."""
+        getter = store.getters[self.column]
+        values = [search_key(getter(row)) for row in range(start, len(store))]
+        added = sorted(zip(values, range(start, len(store))))
+        # Two sorted runs, which Timsort merges in linear time
+        merged = sorted(
+            zip(
+                self.keys + [key for key, _ in added],
+                self.rows.tolist() + [row for _, row in added],
+            )
+        )
+        self.keys = [key for key, _ in merged]
+        self.rows = array("q", (row for _, row in merged))
+        self.row_keys.extend(values)
+
+    def update(self, row: int, value) -> None:
+        """Moves `row` to the position of its new value."""
+        key = search_key(value)
+        old_key = self.row_keys[row]
+        if key == old_key:
+            return
+        position = self._position(old_key, row)
+        del self.keys[position]
+        del self.rows[position]
+        position = self._position(key, row)
+        self.keys.insert(position, key)
+        self.rows.insert(position, row)
+        self.row_keys[row] = key
+
+    def _position(self, key: str, row: int) -> int:
+        """Where (key, row) is, or would go, in the index."""
+        start = bisect_left(self.keys, key)
+        end = bisect_right(self.keys, key, start)
+        return bisect_left(self.rows, row, start, end)
+
+    def bounds(self, prefix: str, lo: int = 0, hi: int = None) -> Tuple[int, int]:
+        """Returns the slice of keys starting with `prefix`, searching
+        only inside [lo, hi) when narrowing a previous search."""
+        if hi is None:
+            hi = len(self.keys)
+        start = bisect_left(self.keys, prefix, lo, hi)
+        end = bisect_left(self.keys, prefix + PREFIX_END, start, hi)
+        return start, end
+
+
+class AccountPrefixIndex:
+    """Prefix search over the employee id, name and email columns.
+    A search that extends the previous prefix only looks inside the
+    previous result, so typing narrows the match set keystroke by
+    keystroke instead of searching the whole table again."""
+
+    def __init__(self, store: AccountColumnStore) -> None:
+        self.store = store
+        self.indexes = [ColumnPrefixIndex(column) for column in SEARCH_COLUMNS]
+        self.indexed_rows = 0
+        self.valid = False
+
+        self.last_prefix: Optional[str] = None
+        self.last_bounds: List[Tuple[int, int]] = []
+        self.last_unindexed: List[int] = []
+
+    def invalidate(self) -> None:
+        """Rows moved or were removed, rebuild on the next search."""
+        self.valid = False
+        self.last_prefix = None
+
+    def rows_appended(self) -> None:
+        """Rows were appended to the store, they are scanned until merged."""
+        self.last_prefix = None
+
+    def row_changed(self, row: int, first_column: int, last_column: int) -> None:
+        """Columns first_column to last_column of `row` were edited;
+        only the indexes of those columns are updated."""
+        if not self.valid or row >= self.indexed_rows:
+            self.last_prefix = None
+            return
+        for index in self.indexes:
+            if first_column <= index.column <= last_column:
+                index.update(row, self.store.get(row, index.column))
+                self.last_prefix = None
+
+    def ensure(self) -> None:
+        if not self.valid:
+            for index in self.indexes:
+                index.build(self.store)
+            self.indexed_rows = len(self.store)
+            self.valid = True
+            self.last_prefix = None
+        elif len(self.store) - self.indexed_rows > max(
+            MAX_UNINDEXED_ROWS, self.indexed_rows // 8
+        ):
+            for index in self.indexes:
+                index.merge(self.store, self.indexed_rows)
+            self.indexed_rows = len(self.store)
+            self.last_prefix = None
+
+    def search(self, prefix: str) -> List[int]:
+        """Returns the sorted store rows with a search column starting
+        with `prefix`."""
+        self.ensure()
+
+        narrowing = self.last_prefix is not None and prefix.startswith(self.last_prefix)
+        bounds = []
+        matches = set()
+        for position, index in enumerate(self.indexes):
+            if narrowing:
+                start, end = index.bounds(prefix, *self.last_bounds[position])
+            else:
+                start, end = index.bounds(prefix)
+            bounds.append((start, end))
+            matches.update(index.rows[start:end])
+
+        candidates = (
+            self.last_unindexed
+            if narrowing
+            else range(self.indexed_rows, len(self.store))
+        )
+        unindexed = list(self.matching_rows(candidates, prefix))
+        matches.update(unindexed)
+
+        self.last_prefix = prefix
+        self.last_bounds = bounds
+        self.last_unindexed = unindexed
+        return sorted(matches)
+
+    def matching_rows(self, rows: Iterable[int], prefix: str) -> Iterable[int]:
+        """Scans `rows` directly, used for rows not yet in the index."""
+        for row in rows:
+            if self.row_matches(row, prefix):
+                yield row
+
+    def row_matches(self, row: int, prefix: str) -> bool:
+        return any(
+            search_key(self.store.get(row, column)).startswith(prefix)
+            for column in SEARCH_COLUMNS
+        )
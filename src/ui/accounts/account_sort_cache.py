@@ -0,0 +1,181 @@
+from array import array
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from ui.accounts.account_column_store import NULL_INT, AccountColumnStore, IntColumn
+
+# Appending more rows than this at once drops the cached permutations
+# instead of inserting the rows one at a time
+MAX_INCREMENTAL_ROWS = 16
+
+
+class AccountSortCache:
+    """Caches, per column, the ascending order of the store rows.
+    Rows are ordered by (value, row), so every row has exactly one
+    position and an edited row is moved with two binary searches
+    instead of sorting the column again. Descending orders read the
+    ascending permutation backwards, and multi-column orders are
+    composed from the ranks the cached permutations give each row.
+
+    Empty values sort last in both directions, as the page queries
+    read them in a NULL pass after the other rows."""
+
+    def __init__(self, store: AccountColumnStore) -> None:
+        self.store = store
+        self.permutations: Dict[int, array] = {}
+        # Column -> function returning value -> display name, for
+        # columns sorted by the name they are shown as
+        self.labels: Dict[int, Callable[[], Dict[Any, str]]] = {}
+
+    def set_labels(self, column: int, labels: Callable[[], Dict[Any, str]]) -> None:
+        """Sorts `column` by the name `labels()` maps each value to,
+        such as a country name for a country id, instead of by the
+        value. Values without a name sort last, like empty ones."""
+        self.labels[column] = labels
+        self.permutations.pop(column, None)
+
+    def clear(self) -> None:
+        self.permutations.clear()
+
+    def permutation(self, column: int) -> array:
+        """Store rows of `column` in ascending order, cached."""
+        permutation = self.permutations.get(column)
+        if permutation is None:
+            if column in self.labels:
+                # Stable, so rows with equal names stay in row order
+                key = self.key_function(column)
+                permutation = array("i", sorted(range(len(self.store)), key=key))
+            else:
+                # The store sorts empty cells first, in row order
+                rows = self.store.sort_permutation(column)
+                is_null = self.null_function(column)
+                permutation = array("i", [row for row in rows if not is_null(row)])
+                permutation.extend(row for row in rows if is_null(row))
+            self.permutations[column] = permutation
+        return permutation
+
+    def order(self, sort_keys: Sequence[Tuple[int, bool]]) -> array:
+        """Store rows sorted by `sort_keys`, a list of (column, descending)
+        pairs with the most significant column first."""
+        if len(sort_keys) == 1:
+            column, descending = sort_keys[0]
+            permutation = self.permutation(column)
+            if not descending:
+                return array("i", permutation)
+            # Backwards, but with the empty values still last
+            filled = bisect_left(permutation, True, key=self.null_function(column))
+            return permutation[:filled][::-1] + permutation[filled:][::-1]
+
+        # Fold the ranks of every column into one integer per row,
+        # most significant column first, and sort on that
+        combined = [0] * len(self.store)
+        for column, descending in sort_keys:
+            ranks, width = self.ranks(column)
+            if descending:
+                # Reversed, except that empty values keep the last rank
+                permutation = self.permutation(column)
+                filled = width
+                if permutation and self.null_function(column)(permutation[-1]):
+                    filled -= 1
+                ranks = [filled - 1 - rank if rank < filled else rank for rank in ranks]
+            combined = [key * width + rank for key, rank in zip(combined, ranks)]
+        return array("i", sorted(range(len(combined)), key=combined.__getitem__))
+
+    def ranks(self, column: int) -> Tuple[array, int]:
+        """Dense rank of every row in `column`, where equal values share
+        a rank, and the number of distinct ranks."""
+        key = self.key_function(column)
+        ranks = array("i", [0]) * len(self.store)
+        rank = -1
+        previous = object()
+        for row in self.permutation(column):
+            value = key(row)
+            if value != previous:
+                rank += 1
+                previous = value
+            ranks[row] = rank
+        return ranks, rank + 1
+
+    def row_changed(self, row: int, column: int, old_value: Any) -> None:
+        """Moves `row` within the cached permutation of `column`."""
+        permutation = self.permutations.get(column)
+        if permutation is None:
+            return
+
+        key = self.key_function(column)
+        old_key = (self.convert_key(column, old_value), row)
+        # The store already holds the new value, so `row` itself is
+        # looked up by its old key while it is still in the permutation
+        del permutation[
+            bisect_left(
+                permutation,
+                old_key,
+                key=lambda other: old_key if other == row else (key(other), other),
+            )
+        ]
+        permutation.insert(
+            bisect_left(
+                permutation, (key(row), row), key=lambda other: (key(other), other)
+            ),
+            row,
+        )
+
+    def rows_appended(self, start: int) -> None:
+        """Adds the store rows from `start` onwards."""
+        if len(self.store) - start > MAX_INCREMENTAL_ROWS:
+            self.clear()
+            return
+
+        for column, permutation in self.permutations.items():
+            key = self.key_function(column)
+            for row in range(start, len(self.store)):
+                permutation.insert(
+                    bisect_left(
+                        permutation,
+                        (key(row), row),
+                        key=lambda other: (key(other), other),
+                    ),
+                    row,
+                )
+
+    def key_function(self, column: int) -> Callable[[int], Any]:
+        """Sort key of a row: whether it is empty, then its value as
+        AccountColumnStore.sort_keys() gives it."""
+        values = self.store.columns[column].values
+        if column in self.labels:
+            names = self.labels[column]()
+            return lambda row: _name_key(names.get(values[row]))
+        if isinstance(self.store.columns[column], IntColumn):
+            return lambda row: (values[row] == NULL_INT, values[row])
+        return lambda row: (values[row] is None, values[row] or "")
+
+    def null_function(self, column: int) -> Callable[[int], bool]:
+        """Whether a row's value in `column` is empty, or has no name."""
+        values = self.store.columns[column].values
+        if column in self.labels:
+            names = self.labels[column]()
+            return lambda row: names.get(values[row]) is None
+        if isinstance(self.store.columns[column], IntColumn):
+            return lambda row: values[row] == NULL_INT
+        return lambda row: values[row] is None
+
+    def convert_key(self, column: int, value: Any) -> Any:
+        store_column = self.store.columns[column]
+        if column in self.labels:
+            return _name_key(self.labels[column]().get(store_column.convert(value)))
+        if isinstance(store_column, IntColumn):
+            value = store_column.convert(value)
+            return (value == NULL_INT, value)
+        return (value is None, value or "")
+
+
+def _name_key(name: Any) -> Tuple[bool, Any]:
+    return (name is None, name if name is not None else "")
+
+
+def inverse(order: Sequence[int]) -> List[int]:
+    """Position of every row in `order`."""
+    positions = [0] * len(order)
+    for position, row in enumerate(order):
+        positions[row] = position
+    return positions
@@ -0,0 +1,269 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from sqlalchemy import Row, delete, insert, select, update
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker
+
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from infrastructure.repository.persistent.account_queries import (
+    ACCOUNT_COLUMNS,
+    delete_conditions,
+)
+
+# Wait this long after the last edit before writing
+FLUSH_DELAY_MS = 2000
+RETRY_BASE_MS = 1000
+RETRY_MAX_MS = 60000
+
+# NOT NULL columns of the accounts table; new rows wait for these
+REQUIRED_COLUMNS = ("employee_id", "first_name", "last_name", "email", "department")
+INSERT_COLUMNS = REQUIRED_COLUMNS + ("country_id",)
+
+INSERT = "insert"
+UPDATE = "update"
+DELETE = "delete"
+
+
+class PendingChange:
+    """The net change to one account since the last flush. `error` is
+    set when the database refused the change; it is not written again
+    until it is edited."""
+
+    __slots__ = ("kind", "values", "error")
+
+    def __init__(self, kind: str, values: Dict[str, Any] = None) -> None:
+        self.kind = kind
+        self.values = values if values is not None else {}
+        self.error: Optional[str] = None
+
+    def is_ready(self) -> bool:
+        if self.error is not None:
+            return False
+        if self.kind != INSERT:
+            return True
+        return all(self.values.get(name) is not None for name in REQUIRED_COLUMNS)
+
+
+class AccountsWriteBehind(QObject):
+    """Queues account inserts, updates and deletes and writes them in
+    one batched transaction, after a pause in editing or on flush().
+    Changes are keyed by account id; new accounts use negative
+    temporary ids until the database assigns a real one.
+    Repeated edits to one account collapse into a single change, and
+    an account inserted and deleted before a flush is never written.
+
+    A change the database refuses, such as a duplicate employee id,
+    would fail every retry. It is found by writing the batch one change
+    at a time, kept back with its error and reported through
+    changes_rejected, while the rest of the batch is written. Only
+    OperationalError, such as a locked or unreachable database, is
+    retried with exponential backoff."""
+
+    pending_changed = pyqtSignal(int)
+    ids_assigned = pyqtSignal(dict)
+    flush_failed = pyqtSignal(str)
+    # Account id -> error of every change the database refused
+    changes_rejected = pyqtSignal(dict)
+
+    def __init__(self, session_factory: sessionmaker) -> None:
+        super().__init__()
+        self.session_factory = session_factory
+        self.pending: Dict[int, PendingChange] = {}
+        self.failed_attempts = 0
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def record_insert(self, key: int, values: Dict[str, Any]) -> None:
+        self.pending[key] = PendingChange(INSERT, dict(values))
+        self._changed()
+
+    def record_inserts(self, keys: Iterable[int]) -> None:
+        """Queues empty new accounts, with a single pending_changed."""
+        for key in keys:
+            self.pending[key] = PendingChange(INSERT)
+        self._changed()
+
+    def record_update(self, key: int, name: str, value: Any) -> None:
+        change = self.pending.get(key)
+        if change is None:
+            change = self.pending[key] = PendingChange(UPDATE)
+        change.values[name] = value
+        # Edited again, so it may be accepted now
+        change.error = None
+        self._changed()
+
+    def record_delete(self, key: int) -> None:
+        self.record_deletes((key,))
+
+    def record_deletes(self, keys: Iterable[int]) -> None:
+        for key in keys:
+            change = self.pending.get(key)
+            if change is not None and change.kind == INSERT:
+                # Never reached the database
+                del self.pending[key]
+            else:
+                self.pending[key] = PendingChange(DELETE)
+        self._changed()
+
+    def pending_count(self) -> int:
+        return len(self.pending)
+
+    def rejected(self) -> Dict[int, str]:
+        """Account id -> error of the changes the database refused."""
+        return {
+            key: change.error
+            for key, change in self.pending.items()
+            if change.error is not None
+        }
+
+    def discard(self, keys: Iterable[int]) -> List[Row]:
+        """Drops the changes to `keys` and returns the rows the database
+        holds for them, to show in place of the discarded changes."""
+        keys = [key for key in keys if self.pending.pop(key, None) is not None]
+        self.pending_changed.emit(len(self.pending))
+        stored = [key for key in keys if key > 0]
+        if not stored:
+            return []
+        with self.session_factory() as session:
+            return session.execute(
+                select(*ACCOUNT_COLUMNS).where(AccountEntity.id.in_(stored))
+            ).all()
+
+    def apply_pending(self, rows: Sequence[Sequence]) -> List[tuple]:
+        """Overlays unwritten changes on rows read from the database."""
+        names = [column.key for column in AccountEntity.__table__.columns]
+        result = []
+        for row in rows:
+            change = self.pending.get(row[0])
+            if change is None:
+                result.append(tuple(row))
+            elif change.kind == UPDATE:
+                result.append(
+                    tuple(
+                        change.values.get(name, value)
+                        for name, value in zip(names, row)
+                    )
+                )
+        return result
+
+    def unsaved_rows(self) -> List[tuple]:
+        """Rows of the new accounts not written yet, which no query
+        returns, with the values entered so far."""
+        names = [column.key for column in AccountEntity.__table__.columns]
+        return [
+            (key,) + tuple(change.values.get(name) for name in names[1:])
+            for key, change in self.pending.items()
+            if change.kind == INSERT
+        ]
+
+    def flush(self) -> bool:
+        """Writes every ready change in one transaction, and returns
+        whether the queue is now empty: False after a failure, and also
+        while new accounts are still missing required values or changes
+        are rejected. After an OperationalError nothing is removed from
+        the queue and a retry is scheduled with exponential backoff."""
+        self.timer.stop()
+        batch = {
+            key: change for key, change in self.pending.items() if change.is_ready()
+        }
+        if not batch:
+            return not self.pending
+
+        try:
+            with self.session_factory() as session, session.begin():
+                new_ids = self._write(session, batch)
+            written = list(batch)
+        except OperationalError as exc:
+            self._retry_later(exc)
+            return False
+        except SQLAlchemyError:
+            written, new_ids = self._write_each(batch)
+            if written is None:
+                return False
+
+        self.failed_attempts = 0
+        for key in written:
+            del self.pending[key]
+        if new_ids:
+            self.ids_assigned.emit(new_ids)
+        rejected = {key: change.error for key, change in batch.items() if change.error}
+        if rejected:
+            self.changes_rejected.emit(rejected)
+        self.pending_changed.emit(len(self.pending))
+        return not self.pending
+
+    def _write(self, session: Session, batch: Dict[int, PendingChange]) -> Dict:
+        """Writes `batch` and returns the ids given to new accounts,
+        by temporary id. Deletes go first, so they free unique values
+        for the updates and inserts."""
+        inserts = [
+            (key, change) for key, change in batch.items() if change.kind == INSERT
+        ]
+        updates = [
+            {"id": key, **change.values}
+            for key, change in batch.items()
+            if change.kind == UPDATE
+        ]
+        deletes = [key for key, change in batch.items() if change.kind == DELETE]
+
+        for condition in delete_conditions(deletes):
+            session.execute(delete(AccountEntity).where(condition))
+        if updates:
+            session.execute(update(AccountEntity), updates)
+        if not inserts:
+            return {}
+        new_ids = session.scalars(
+            insert(AccountEntity).returning(
+                AccountEntity.id, sort_by_parameter_order=True
+            ),
+            [
+                {name: change.values.get(name) for name in INSERT_COLUMNS}
+                for _, change in inserts
+            ],
+        ).all()
+        return {key: new_id for (key, _), new_id in zip(inserts, new_ids)}
+
+    def _write_each(
+        self, batch: Dict[int, PendingChange]
+    ) -> Tuple[Optional[List[int]], Dict]:
+        """Writes the changes of a refused batch one per transaction, in
+        the order the batch writes them, and marks the refused ones.
+        Returns the keys written and the new ids; the keys are None when
+        an OperationalError stopped it, with a retry scheduled."""
+        order = {DELETE: 0, UPDATE: 1, INSERT: 2}
+        written = []
+        new_ids = {}
+        for key, change in sorted(batch.items(), key=lambda item: order[item[1].kind]):
+            try:
+                with self.session_factory() as session, session.begin():
+                    new_ids.update(self._write(session, {key: change}))
+            except OperationalError as exc:
+                for done in written:
+                    del self.pending[done]
+                if new_ids:
+                    self.ids_assigned.emit(new_ids)
+                self._retry_later(exc)
+                return None, {}
+            except SQLAlchemyError as exc:
+                change.error = _error_message(exc)
+                continue
+            written.append(key)
+        return written, new_ids
+
+    def _retry_later(self, exc: SQLAlchemyError) -> None:
+        self.failed_attempts += 1
+        delay = min(RETRY_BASE_MS * 2 ** (self.failed_attempts - 1), RETRY_MAX_MS)
+        self.timer.start(delay)
+        self.flush_failed.emit(_error_message(exc))
+
+    def _changed(self) -> None:
+        self.pending_changed.emit(len(self.pending))
+        if not self.failed_attempts:
+            self.timer.start(FLUSH_DELAY_MS)
+
+
+def _error_message(exc: SQLAlchemyError) -> str:
+    return str(exc.orig if getattr(exc, "orig", None) is not None else exc)
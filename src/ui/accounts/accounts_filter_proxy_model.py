@@ -0,0 +1,244 @@
+from bisect import bisect_left
+from typing import List, Optional
+
+from PyQt6.QtCore import (
+    QAbstractProxyModel,
+    QModelIndex,
+    QPersistentModelIndex,
+    Qt,
+)
+
+from ui.accounts.account_prefix_index import SEARCH_COLUMNS, AccountPrefixIndex
+from ui.accounts.accounts_table_model import AccountsTableModel
+
+
+class AccountsFilterProxyModel(QAbstractProxyModel):
+    """Shows the accounts whose employee id, first name, last name or
+    email starts with the filter text.
+    `rows` holds the matching source rows in source order, or None when
+    no filter is set and every source row is shown unchanged. Matches
+    come from an AccountPrefixIndex, never from a scan of every row.
+    The index works on store rows, which do not move when the source
+    sorts, so sorting only changes how matches map to source rows."""
+
+    def __init__(self):
+        super().__init__()
+        self.prefix_index: AccountPrefixIndex = None
+        self.filter_text = ""
+        self.rows: Optional[List[int]] = None
+        self._layout_persistent: List[QModelIndex] = []
+        self._layout_sources: List[QPersistentModelIndex] = []
+        self._store_version = 0
+
+    def setSourceModel(self, source: AccountsTableModel):
+        """Connect to the source model signals and build the index on it"""
+        self.beginResetModel()
+        super().setSourceModel(source)
+        self.prefix_index = AccountPrefixIndex(source.store)
+        self.rows = None
+        self.filter_text = ""
+        self._store_version = source.store_version
+
+        source.dataChanged.connect(self._source_data_changed)
+        source.rowsAboutToBeInserted.connect(self._source_rows_about_to_be_inserted)
+        source.rowsInserted.connect(self._source_rows_inserted)
+        source.rowsAboutToBeRemoved.connect(self._source_rows_about_to_be_removed)
+        source.rowsRemoved.connect(self._source_rows_removed)
+        source.layoutAboutToBeChanged.connect(self._source_layout_about_to_be_changed)
+        source.layoutChanged.connect(self._source_layout_changed)
+        source.modelAboutToBeReset.connect(self.beginResetModel)
+        source.modelReset.connect(self._source_reset)
+        self.endResetModel()
+
+    def set_filter_text(self, text: str):
+        """Filter the rows, narrowing the previous result if the new
+        text extends the previous one. While the source reads pages,
+        it first loads the matching accounts it has not read yet."""
+        prefix = text.strip().lower()
+        if prefix == self.filter_text:
+            return
+
+        self.sourceModel().load_matches(prefix)
+        self.beginResetModel()
+        self.filter_text = prefix
+        self.rows = self._search(prefix) if prefix else None
+        self.endResetModel()
+
+    def index(self, row, column, parent=QModelIndex()):
+        if parent.isValid() or not self.hasIndex(row, column, parent):
+            return QModelIndex()
+        return self.createIndex(row, column)
+
+    def parent(self, index=QModelIndex()):
+        return QModelIndex()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.sourceModel() is None:
+            return 0
+        if self.rows is None:
+            return self.sourceModel().rowCount()
+        return len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        if self.sourceModel() is None:
+            return 0
+        return self.sourceModel().columnCount()
+
+    def mapToSource(self, proxy_index):
+        if not proxy_index.isValid():
+            return QModelIndex()
+        row = proxy_index.row()
+        if self.rows is not None:
+            row = self.rows[row]
+        return self.sourceModel().index(row, proxy_index.column())
+
+    def mapFromSource(self, source_index):
+        if not source_index.isValid():
+            return QModelIndex()
+        row = source_index.row()
+        if self.rows is not None:
+            position = bisect_left(self.rows, row)
+            if position == len(self.rows) or self.rows[position] != row:
+                return QModelIndex()
+            row = position
+        return self.index(row, source_index.column())
+
+    def source_rows(self, proxy_rows: List[int]) -> List[int]:
+        """Maps many proxy rows at once, without creating indexes"""
+        if self.rows is None:
+            return list(proxy_rows)
+        return [self.rows[row] for row in proxy_rows]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        return self.sourceModel().data(self.mapToSource(index), role)
+
+    def sort(self, column: int, order=Qt.SortOrder.AscendingOrder):
+        """Sorting is done by the source model"""
+        self.sourceModel().sort(column, order)
+
+    def _source_data_changed(self, top_left, bottom_right, roles=()):
+        source = self.sourceModel()
+        first_column, last_column = top_left.column(), bottom_right.column()
+        if first_column <= max(SEARCH_COLUMNS) and last_column >= min(SEARCH_COLUMNS):
+            for row in range(top_left.row(), bottom_right.row() + 1):
+                self.prefix_index.row_changed(
+                    source.physical_row(row), first_column, last_column
+                )
+
+        first, last = self._proxy_range(top_left.row(), bottom_right.row())
+        if first <= last:
+            self.dataChanged.emit(
+                self.index(first, top_left.column()),
+                self.index(last, bottom_right.column()),
+                roles,
+            )
+
+    def _source_rows_about_to_be_inserted(self, parent, first, last):
+        if self.rows is None:
+            self.beginInsertRows(QModelIndex(), first, last)
+
+    def _source_rows_inserted(self, parent, first, last):
+        count = last - first + 1
+        if first + count == self.sourceModel().rowCount():
+            self.prefix_index.rows_appended()
+        else:
+            self.prefix_index.invalidate()
+
+        if self.rows is None:
+            self.endInsertRows()
+            return
+
+        position = bisect_left(self.rows, first)
+        for i in range(position, len(self.rows)):
+            self.rows[i] += count
+        source = self.sourceModel()
+        matches = [
+            row
+            for row in range(first, last + 1)
+            if self.prefix_index.row_matches(source.physical_row(row), self.filter_text)
+        ]
+        if matches:
+            self.beginInsertRows(QModelIndex(), position, position + len(matches) - 1)
+            self.rows[position:position] = matches
+            self.endInsertRows()
+
+    def _source_rows_about_to_be_removed(self, parent, first, last):
+        if self.rows is None:
+            self.beginRemoveRows(QModelIndex(), first, last)
+            return
+
+        proxy_first, proxy_last = self._proxy_range(first, last)
+        if proxy_first <= proxy_last:
+            self.beginRemoveRows(QModelIndex(), proxy_first, proxy_last)
+            del self.rows[proxy_first : proxy_last + 1]
+            self.endRemoveRows()
+
+    def _source_rows_removed(self, parent, first, last):
+        self.prefix_index.invalidate()
+        self._store_version = self.sourceModel().store_version
+        if self.rows is None:
+            self.endRemoveRows()
+            return
+
+        count = last - first + 1
+        for i in range(bisect_left(self.rows, first), len(self.rows)):
+            self.rows[i] -= count
+
+    def _source_layout_about_to_be_changed(self):
+        # Announced first, so that views and selection models create
+        # their persistent indexes before the list below is taken
+        self.layoutAboutToBeChanged.emit()
+        # Remember which source row each persistent index points at;
+        # the source moves these along with its rows
+        self._layout_persistent = self.persistentIndexList()
+        self._layout_sources = [
+            QPersistentModelIndex(self.mapToSource(index))
+            for index in self._layout_persistent
+        ]
+
+    def _source_layout_changed(self):
+        if self.sourceModel().store_version != self._store_version:
+            # The source replaced its rows rather than reordering them
+            self._store_version = self.sourceModel().store_version
+            self.prefix_index.invalidate()
+        rows = self.rows
+        if rows is not None:
+            rows = self._search(self.filter_text)
+
+        if rows is not None and len(rows) != len(self.rows):
+            # Contents changed along with the order, start over
+            self._layout_persistent = []
+            self._layout_sources = []
+            self.layoutChanged.emit()
+            self.beginResetModel()
+            self.rows = rows
+            self.endResetModel()
+            return
+
+        self.rows = rows
+        self.changePersistentIndexList(
+            self._layout_persistent,
+            [
+                self.mapFromSource(QModelIndex(source))
+                for source in self._layout_sources
+            ],
+        )
+        self._layout_persistent = []
+        self._layout_sources = []
+        self.layoutChanged.emit()
+
+    def _source_reset(self):
+        self.prefix_index.invalidate()
+        if self.rows is not None:
+            self.rows = self._search(self.filter_text)
+        self.endResetModel()
+
+    def _search(self, prefix: str) -> List[int]:
+        """Source rows matching `prefix`, in source order"""
+        return self.sourceModel().view_rows(self.prefix_index.search(prefix))
+
+    def _proxy_range(self, first: int, last: int):
+        """Returns the proxy rows showing source rows first to last."""
+        if self.rows is None:
+            return first, last
+        return bisect_left(self.rows, first), bisect_left(self.rows, last + 1) - 1
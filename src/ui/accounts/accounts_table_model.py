@@ -0,0 +1,628 @@
+import asyncio
+from array import array
+from itertools import accumulate
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+from ui.accounts.account_column_store import (
+    AccountColumnStore,
+    contiguous_runs,
+    rows_from_items,
+)
+from ui.accounts.account_page_loader import AccountsPageLoaderBase
+from ui.accounts.account_sort_cache import AccountSortCache, inverse
+from ui.accounts.account_write_behind import AccountsWriteBehind
+
+# Removing rows in more separate runs than this resets the model
+# instead of signalling each run
+MAX_REMOVE_RUNS = 64
+
+# A change feed batch larger than this reloads the first page instead
+# of being applied row by row
+MAX_APPLIED_CHANGES = 5000
+
+
+class AccountsTableItemModel:
+    def __init__(
+        self,
+        id: int = None,
+        employee_id: int = None,
+        first_name: str = None,
+        last_name: str = None,
+        email: str = None,
+        department: str = None,
+        country_id: int = None,
+    ) -> None:
+
+        self.id = id
+        self.employee_id = employee_id
+        self.first_name = first_name
+        self.last_name = last_name
+        self.email = email
+        self.department = department
+        self.country_id = country_id
+
+
+class AccountsTableModel(QAbstractTableModel):
+    loading_changed = pyqtSignal(bool)
+    load_failed = pyqtSignal(str)
+
+    def __init__(
+        self,
+        accounts: List[AccountsTableItemModel] = None,
+        page_loader: AccountsPageLoaderBase = None,
+        write_behind: AccountsWriteBehind = None,
+    ):
+        super().__init__()
+        self.store = AccountColumnStore()
+        if accounts:
+            self.store.extend_rows(rows_from_items(accounts))
+        self.page_loader = page_loader
+        self.fetch_task: asyncio.Task = None
+
+        # New rows get negative ids until the write behind inserts them
+        self.write_behind = write_behind
+        self.next_temp_id = 0
+        if write_behind is not None:
+            write_behind.ids_assigned.connect(self.assign_ids)
+
+        self.getters = list(self.store.getters)
+        self.getters[0] = self._display_id
+
+        # View row -> store row once sorted in memory, None while the
+        # view shows the store in order
+        self.order: Optional[array] = None
+        self._inverse_order: Optional[List[int]] = None
+        self.sort_cache = AccountSortCache(self.store)
+        # Changes whenever store rows are removed or replaced
+        self.store_version = 0
+        # Account id -> store row, built when a change feed needs it
+        self._rows_by_id: Optional[Dict[int, int]] = None
+
+        # The filter text whose matches are loaded ahead of the pages,
+        # see load_matches(); later pages skip the ids loaded for it
+        self.search_prefix: Optional[str] = None
+        self._matches_loaded: Optional[str] = None
+        self._searched_ids: Set[int] = set()
+
+    def data(self, index: QModelIndex, role: int):
+
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+
+        row = index.row()
+        if self.order is not None:
+            row = self.order[row]
+        return self.getters[index.column()](row)
+
+    def physical_row(self, row: int) -> int:
+        """Store row shown at view `row`"""
+        return row if self.order is None else self.order[row]
+
+    def view_row(self, physical_row: int) -> int:
+        """View row showing store row `physical_row`"""
+        if self.order is None:
+            return physical_row
+        if self._inverse_order is None:
+            self._inverse_order = inverse(self.order)
+        return self._inverse_order[physical_row]
+
+    def view_rows(self, physical_rows: Sequence[int]) -> List[int]:
+        """Sorted view rows showing the given store rows"""
+        if self.order is None:
+            return sorted(physical_rows)
+        return sorted(self.view_row(row) for row in physical_rows)
+
+    def _display_id(self, row: int):
+        """Temporary ids of unsaved rows are not shown"""
+        value = self.store.get(row, 0)
+        return value if value is None or value > 0 else None
+
+    def rowCount(self, index=QModelIndex()):
+        """Returns the number of rows"""
+        _ = index
+        if self.order is not None:
+            return len(self.order)
+        return len(self.store)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        """Returns True while the page loader has unread rows"""
+        if parent.isValid() or self.page_loader is None:
+            return False
+        return not self.page_loader.exhausted and self.fetch_task is None
+
+    def fetchMore(self, parent=QModelIndex()):
+        """Called by the view when it scrolls near the last loaded row.
+        Appends the next page from the database."""
+        if parent.isValid() or self.page_loader is None:
+            return
+
+        if self.page_loader.is_async:
+            if self.fetch_task is None:
+                self._start_task(self._fetch_more_async())
+            return
+
+        self.append_rows(self._read_page())
+
+    def append_rows(self, rows):
+        """Adds rows read from the database to the end of the table"""
+        if not rows:
+            return
+
+        first = len(self.store)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self.store.extend_rows(rows)
+        self._rows_appended(first)
+        self.endInsertRows()
+
+    def _rows_appended(self, first: int):
+        """New store rows are shown at the end of the view"""
+        if self.order is not None:
+            self.order.extend(range(first, len(self.store)))
+            if self._inverse_order is not None:
+                self._inverse_order.extend(range(first, len(self.store)))
+        self.sort_cache.rows_appended(first)
+        if self._rows_by_id is not None:
+            ids = self.store.columns[0].values
+            for row in range(first, len(self.store)):
+                self._rows_by_id[ids[row]] = row
+
+    def cancel_loading(self):
+        """Stops the running page query, keeping the rows read so far"""
+        if self.fetch_task is not None:
+            self.fetch_task.cancel()
+
+    async def _fetch_more_async(self):
+        async for chunk in self.page_loader.stream_next():
+            self.append_rows(self._apply_pending(self._skip_searched(chunk)))
+
+    def load_matches(self, prefix: str):
+        """Loads the accounts the search `prefix` matches that no page
+        has brought yet, so that a filter over the loaded rows finds
+        every match. Each column is searched through its index, see
+        accounts_prefix_query(). Nothing is read once every page is
+        loaded, or when `prefix` extends one whose matches are loaded.
+        The matches are loaded again after a sort in the database,
+        until the prefix is cleared."""
+        self.search_prefix = prefix or None
+        loaded = self._matches_loaded
+        if prefix and (loaded is None or not prefix.startswith(loaded)):
+            self._load_matches()
+
+    def _load_matches(self):
+        if self.page_loader is None or self.page_loader.exhausted:
+            return
+        prefix = self.search_prefix
+        if self.page_loader.is_async:
+            self._start_task(self._load_matches_async(prefix, self.fetch_task))
+            return
+        self._add_matches(prefix, self.page_loader.fetch_matching(prefix))
+
+    async def _load_matches_async(self, prefix: str, previous: asyncio.Task = None):
+        if previous is not None:
+            # Appends after the page or sort that is under way
+            await asyncio.gather(previous, return_exceptions=True)
+        self._add_matches(prefix, await self.page_loader.fetch_matching(prefix))
+
+    def _add_matches(self, prefix: str, rows):
+        rows_by_id = self._id_index()
+        new_rows = [row for row in rows if row[0] not in rows_by_id]
+        self._searched_ids.update(row[0] for row in new_rows)
+        self.append_rows(self._apply_pending(new_rows))
+        self._matches_loaded = prefix
+
+    def _skip_searched(self, rows):
+        """Drops the rows of a page that a search already loaded"""
+        if not self._searched_ids:
+            return rows
+        return [row for row in rows if row[0] not in self._searched_ids]
+
+    def _start_task(self, coroutine):
+        self.fetch_task = asyncio.ensure_future(coroutine)
+        self.fetch_task.add_done_callback(self._task_done)
+        self.loading_changed.emit(True)
+
+    def _task_done(self, task: asyncio.Task):
+        if self.fetch_task is task:
+            self.fetch_task = None
+            self.loading_changed.emit(False)
+        if not task.cancelled() and task.exception() is not None:
+            self.load_failed.emit(str(task.exception()))
+
+    def columnCount(self, index=QModelIndex()):
+        """Returns the column count"""
+        _ = index
+        return len(AccountColumnStore.COLUMN_NAMES)
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        """Enable editing of the table"""
+        if not index.isValid() or role != Qt.ItemDataRole.EditRole:
+            return False
+
+        if not value:
+            return False
+
+        row = self.physical_row(index.row())
+        old_value = self.store.get(row, index.column())
+        try:
+            self.store.set(row, index.column(), value)
+        except ValueError:  # Text entered into an integer column
+            return False
+        self.sort_cache.row_changed(row, index.column(), old_value)
+
+        if self.write_behind is not None:
+            self.write_behind.record_update(
+                self.store.get(row, 0),
+                AccountColumnStore.COLUMN_NAMES[index.column()],
+                self.store.get(row, index.column()),
+            )
+
+        self.dataChanged.emit(index, index, (Qt.ItemDataRole.DisplayRole,))
+        return True
+
+    def flags(self, index):
+        """Enable editing of the table"""
+        if index.column() > 0:  # Allow editing for all columns except the id column
+            return (
+                Qt.ItemFlag.ItemIsEditable
+                | Qt.ItemFlag.ItemIsEnabled
+                | Qt.ItemFlag.ItemIsSelectable
+            )
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        """Set header names"""
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return ["ID", "Employee ID", "First", "Last", "Email", "Dept.", "Country"][
+                section
+            ]
+        return super().headerData(section, orientation, role)
+
+    def add_empty_rows(self, count: int = 1):
+        """Appends `count` empty rows in a single insert"""
+        if count <= 0:
+            return
+
+        keys = range(self.next_temp_id - 1, self.next_temp_id - count - 1, -1)
+        self.next_temp_id -= count
+        first = self.rowCount()
+        start = len(self.store)
+        self.beginInsertRows(QModelIndex(), first, first + count - 1)
+        empty = (None,) * (self.columnCount() - 1)
+        self.store.extend_rows((key,) + empty for key in keys)
+        self._rows_appended(start)
+        self.endInsertRows()
+        if self.write_behind is not None:
+            self.write_behind.record_inserts(keys)
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        """Remove rows row to row + count - 1 from the table"""
+        if parent.isValid() or count <= 0 or row < 0 or row + count > self.rowCount():
+            return False
+        self.remove_rows(range(row, row + count))
+        return True
+
+    def remove_rows(self, rows: Iterable[int]):
+        """Removes the given view rows. Each run of adjacent rows is
+        one remove signal, and the store is compacted once at the end."""
+        rows = sorted(set(rows))
+        if not rows:
+            return
+
+        physical_rows = sorted(self.physical_row(row) for row in rows)
+        if self.write_behind is not None:
+            ids = self.store.columns[0].values
+            self.write_behind.record_deletes(ids[row] for row in physical_rows)
+        self._remove_view_rows(rows, physical_rows)
+
+    def _remove_view_rows(self, rows: List[int], physical_rows: List[int]):
+        runs = contiguous_runs(rows)
+        if len(runs) > MAX_REMOVE_RUNS:
+            self.beginResetModel()
+            self._remove_store_rows(physical_rows)
+            self.endResetModel()
+            return
+
+        # The view keeps reading the uncompacted store through `order`
+        # while the runs are removed, last run first
+        sorted_in_memory = self.order is not None
+        if not sorted_in_memory:
+            self.order = array("i", range(len(self.store)))
+        for first, last in reversed(runs):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self.order[first : last + 1]
+            self._inverse_order = None
+            self.endRemoveRows()
+        if not sorted_in_memory:
+            # Unsorted again once the store is compacted
+            self.order = None
+        self._remove_store_rows(physical_rows)
+
+    def _remove_store_rows(self, physical_rows: List[int]):
+        """Drops sorted store rows and renumbers `order` to match"""
+        if self.order is not None:
+            removed = bytearray(len(self.store))
+            for row in physical_rows:
+                removed[row] = 1
+            # Rows after a removed one move up by the removals before them
+            shift = list(accumulate(removed))
+            self.order = array(
+                "i", (row - shift[row] for row in self.order if not removed[row])
+            )
+        self.store.remove_rows(physical_rows)
+        self._store_rows_moved()
+
+    def _store_rows_moved(self):
+        """Store rows were removed or replaced, cached positions are stale"""
+        self._inverse_order = None
+        self._rows_by_id = None
+        self.sort_cache.clear()
+        self.store_version += 1
+
+    def assign_ids(self, ids: dict):
+        """Replace temporary ids with the ids given by the database.
+        Rows are found through the id index, which is kept up to date,
+        and the whole change is one dataChanged on the id column."""
+        values = self.store.columns[0].values
+        rows_by_id = self._id_index()
+        view_rows = []
+        for temp_id, new_id in ids.items():
+            row = rows_by_id.pop(temp_id, None)
+            if row is None:  # Removed before its insert was written
+                continue
+            values[row] = new_id
+            rows_by_id[new_id] = row
+            view_rows.append(self.view_row(row))
+        if not view_rows:
+            return
+
+        self.sort_cache.permutations.pop(0, None)
+        self.dataChanged.emit(
+            self.index(min(view_rows), 0),
+            self.index(max(view_rows), 0),
+            (Qt.ItemDataRole.DisplayRole,),
+        )
+
+    def apply_changes(self, rows: List[Sequence], deleted_ids: List[int]):
+        """Applies accounts changed or deleted by any writer, as found by
+        an AccountChangeFeed. Loaded rows are updated in place with one
+        dataChanged each and deleted ones removed; new rows are appended
+        when no later page would bring them. Unsaved local edits win."""
+        if len(rows) + len(deleted_ids) > MAX_APPLIED_CHANGES:
+            if self.page_loader is not None:
+                self.sort_in_database(
+                    self.page_loader.sort_column,
+                    (
+                        Qt.SortOrder.DescendingOrder
+                        if self.page_loader.descending
+                        else Qt.SortOrder.AscendingOrder
+                    ),
+                )
+                return
+
+        rows_by_id = self._id_index()
+        deleted = sorted(
+            rows_by_id[key] for key in set(deleted_ids) if key in rows_by_id
+        )
+        if deleted:
+            self._remove_view_rows(
+                sorted(self.view_row(row) for row in deleted), deleted
+            )
+            rows_by_id = self._id_index()
+
+        new_rows = []
+        for values in self._apply_pending(rows):
+            row = rows_by_id.get(values[0])
+            if row is None:
+                if self.page_loader is None or self.page_loader.has_passed(values):
+                    new_rows.append(values)
+                continue
+            self._update_row(row, values)
+        self.append_rows(new_rows)
+
+    def revert_changes(self, keys: Iterable[int]):
+        """Drops the unsaved changes to the accounts `keys`, such as the
+        ones the database refused, and shows the stored rows again. New
+        accounts that were never stored are removed."""
+        keys = set(keys)
+        rows = self.write_behind.discard(keys)
+        rows_by_id = self._id_index()
+        unsaved = sorted(
+            rows_by_id[key] for key in keys if key < 0 and key in rows_by_id
+        )
+        if unsaved:
+            self._remove_view_rows(
+                sorted(self.view_row(row) for row in unsaved), unsaved
+            )
+        self.apply_changes(rows, [])
+
+    def _update_row(self, row: int, values: Sequence):
+        """Stores `values` in store row `row` and signals the columns
+        that differ."""
+        changed = []
+        for column in range(1, self.columnCount()):
+            old_value = self.store.get(row, column)
+            # Compared once stored, as the store converts some values
+            self.store.set(row, column, values[column])
+            if self.store.get(row, column) != old_value:
+                self.sort_cache.row_changed(row, column, old_value)
+                changed.append(column)
+        if changed:
+            view_row = self.view_row(row)
+            self.dataChanged.emit(
+                self.index(view_row, changed[0]),
+                self.index(view_row, changed[-1]),
+                (Qt.ItemDataRole.DisplayRole,),
+            )
+
+    def _id_index(self) -> Dict[int, int]:
+        if self._rows_by_id is None:
+            self._rows_by_id = {
+                key: row for row, key in enumerate(self.store.columns[0].values)
+            }
+        return self._rows_by_id
+
+    def _read_page(self):
+        """Next page from a sync loader with unsaved edits applied; async
+        loaders stream their pages, see _fetch_more_async()"""
+        return self._apply_pending(self._skip_searched(self.page_loader.fetch_next()))
+
+    def _apply_pending(self, rows):
+        if self.write_behind is not None:
+            rows = self.write_behind.apply_pending(rows)
+        return rows
+
+    def _with_unsaved(self, rows):
+        """`rows` followed by the new rows still waiting to be written,
+        which a query cannot return and would otherwise be lost"""
+        if self.write_behind is None:
+            return rows
+        return list(rows) + self.write_behind.unsaved_rows()
+
+    def set_sort_labels(self, column: int, labels: Callable[[], Dict[Any, str]]):
+        """Sorts `column` in memory by the name `labels()` gives each
+        value, to match a column shown through a lookup. The database
+        sorts the columns in SORT_NAMES the same way."""
+        self.sort_cache.set_labels(column, labels)
+
+    def sort(self, column: int, order=Qt.SortOrder.AscendingOrder):
+        """Sort rows"""
+        if self.page_loader is not None and not self.page_loader.exhausted:
+            self.sort_in_database(column, order)
+            return
+
+        # Every row is loaded, so sorting in memory is cheaper than a query
+        self.sort_by([(column, order)])
+
+    def sort_by(self, sort_keys: List[Tuple[int, Qt.SortOrder]]):
+        """Stable sort on several columns, most significant first, using
+        the cached permutation of each column"""
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        physical_rows = [self.physical_row(index.row()) for index in persistent]
+
+        self.order = self.sort_cache.order(
+            [
+                (column, order == Qt.SortOrder.DescendingOrder)
+                for column, order in sort_keys
+            ]
+        )
+        self._inverse_order = None
+
+        # Move the view's selection and current index along with their rows
+        if persistent:
+            self.changePersistentIndexList(
+                persistent,
+                [
+                    self.index(self.view_row(row), index.column())
+                    for index, row in zip(persistent, physical_rows)
+                ],
+            )
+        self.layoutChanged.emit()  # Notify the view that the model has changed
+
+    def sort_in_database(self, column: int, order=Qt.SortOrder.AscendingOrder):
+        """Sort with ORDER BY on the accounts table.
+        Only the first page in the new order is read; further pages are
+        fetched as the view scrolls, as with the initial load."""
+        if self.write_behind is not None:
+            # The new order must include edits still waiting to be written
+            self.write_behind.flush()
+
+        if self.page_loader.is_async:
+            previous = self.fetch_task
+            self.cancel_loading()
+            self._start_task(self._sort_async(column, order, previous))
+            return
+
+        self.page_loader.reset(column, order == Qt.SortOrder.DescendingOrder)
+        rows = self._apply_pending(self.page_loader.fetch_next())
+        self.replace_rows(self._with_unsaved(rows))
+        self._reload_matches()
+
+    async def _sort_async(self, column: int, order, previous: asyncio.Task = None):
+        if previous is not None:
+            # Let the cancelled query finish unwinding before reusing the loader
+            await asyncio.gather(previous, return_exceptions=True)
+        position = self.page_loader.position()
+        self.page_loader.reset(column, order == Qt.SortOrder.DescendingOrder)
+        rows = []
+        try:
+            async for chunk in self.page_loader.stream_next():
+                rows.extend(chunk)
+        except asyncio.CancelledError:
+            # Keep reading in the order the rows on screen are in
+            self.page_loader.restore(position)
+            raise
+        self.replace_rows(self._with_unsaved(self._apply_pending(rows)))
+        self._reload_matches()
+
+    def _reload_matches(self):
+        """The rows a search loaded were replaced by the first page"""
+        self._searched_ids.clear()
+        self._matches_loaded = None
+        if self.search_prefix is not None:
+            self._load_matches()
+
+    def replace_rows(self, rows):
+        """Shows `rows` in place of the loaded rows, keeping persistent
+        indexes on rows that are in both."""
+        old_count = len(self.store)
+        new_count = len(rows)
+        if new_count > old_count:
+            # Grow first so the layout change keeps the row count; when
+            # sorted in memory the view counts rows through `order`
+            self.beginInsertRows(QModelIndex(), old_count, new_count - 1)
+            self.store.extend_rows(
+                [(None,) * self.columnCount()] * (new_count - old_count)
+            )
+            if self.order is not None:
+                self.order.extend(range(old_count, new_count))
+                self._inverse_order = None
+            self.endInsertRows()
+
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        old_ids = [
+            self.store.get(self.physical_row(index.row()), 0) for index in persistent
+        ]
+
+        self.store.clear()
+        self.store.extend_rows(rows)
+        self.order = None
+        self._store_rows_moved()
+        new_rows = {row[0]: position for position, row in enumerate(rows)}
+
+        # Rows past the new first page are padded with empty rows and
+        # removed below; indexes on rows that left the page become invalid
+        padding = max(old_count - new_count, 0)
+        self.store.extend_rows([(None,) * self.columnCount()] * padding)
+        self.changePersistentIndexList(
+            persistent,
+            [
+                (
+                    self.index(new_rows[row_id], index.column())
+                    if row_id in new_rows
+                    else QModelIndex()
+                )
+                for index, row_id in zip(persistent, old_ids)
+            ],
+        )
+        self.layoutChanged.emit()
+
+        if padding:
+            self.beginRemoveRows(QModelIndex(), new_count, old_count - 1)
+            self.store.truncate(new_count)
+            self.endRemoveRows()
@@ -0,0 +1,57 @@
+from PyQt6.QtCore import QAbstractItemModel, QModelIndex, Qt
+from PyQt6.QtWidgets import QComboBox, QStyledItemDelegate, QWidget
+
+from infrastructure.repository.persistent.lookup_cache import LookupCache
+
+
+class LookupDelegate(QStyledItemDelegate):
+    """Shows the display name of a key column, such as country_id, and
+    edits it with a combo box, both served from a LookupCache.
+    With `show_names` off the cell shows its own value, which suits
+    lookups keyed by name. With `editable` on, values that are not in
+    the lookup yet can be typed into the combo box."""
+
+    def __init__(
+        self,
+        cache: LookupCache,
+        lookup: str,
+        show_names: bool = True,
+        editable: bool = False,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.cache = cache
+        self.lookup = lookup
+        self.show_names = show_names
+        self.editable = editable
+
+    def displayText(self, value, locale):
+        if self.show_names and value is not None:
+            value = self.cache.label(self.lookup, value)
+        return super().displayText(value, locale)
+
+    def createEditor(self, parent: QWidget, option, index: QModelIndex):
+        combo = QComboBox(parent)
+        combo.setEditable(self.editable)
+        for key, name in self.cache.choices(self.lookup):
+            combo.addItem(str(name), key)
+        return combo
+
+    def setEditorData(self, editor: QComboBox, index: QModelIndex):
+        value = index.data(Qt.ItemDataRole.DisplayRole)
+        position = editor.findData(value)
+        if position >= 0:
+            editor.setCurrentIndex(position)
+        elif self.editable and value is not None:
+            editor.setEditText(str(value))
+
+    def setModelData(
+        self, editor: QComboBox, model: QAbstractItemModel, index: QModelIndex
+    ):
+        if self.editable and editor.currentText() != editor.itemText(
+            editor.currentIndex()
+        ):
+            value = editor.currentText()
+        else:
+            value = editor.currentData()
+        model.setData(index, value, Qt.ItemDataRole.EditRole)
@@ -1,4 +1,5 @@
-import os, sys, time
+import os, sys
+from threading import Lock
 from PyQt6.QtWidgets import (
     QApplication,
     QWidget,
@@ -11,7 +12,7 @@ from PyQt6.QtWidgets import (
     QFileDialog,
     QGridLayout,
 )
-from PyQt6.QtCore import pyqtSignal, QThread
+from PyQt6.QtCore import pyqtSignal, QObject, QThread, QTimer
 
 style_sheet = """
     QProgressBar{
@@ -29,25 +30,80 @@ style_sheet = """
     }
 """
 
+# Most progress updates delivered to the GUI per second
+PROGRESS_RATE_HZ = 30
+# Older lines are dropped from the text edit past this many
+LOG_MAX_LINES = 5000
+
+
+class ProgressChannel(QObject):
+    """Carries progress from a worker thread to the GUI at a fixed
+    maximum rate. The worker posts as often as it likes; the latest
+    value and the log lines posted since the last delivery are sent
+    together on each tick of a GUI thread timer, so a fast worker
+    costs the GUI at most `rate_hz` updates a second, not one queued
+    signal per file."""
+
+    value_changed = pyqtSignal(int)
+    lines_added = pyqtSignal(list)
+
+    def __init__(self, rate_hz: int = PROGRESS_RATE_HZ, parent: QObject = None):
+        super().__init__(parent)
+        self.lock = Lock()
+        self.value = None
+        self.lines = []
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(1000 // rate_hz)
+        self.timer.timeout.connect(self.deliver)
+
+    def post(self, value: int = None, line: str = None):
+        """Safe to call from any thread."""
+        with self.lock:
+            if value is not None:
+                self.value = value
+            if line is not None:
+                self.lines.append(line)
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        """Stops the timer after delivering what is still pending."""
+        self.timer.stop()
+        self.deliver()
+
+    def deliver(self):
+        with self.lock:
+            value, self.value = self.value, None
+            lines, self.lines = self.lines, []
+        if lines:
+            self.lines_added.emit(lines)
+        if value is not None:
+            self.value_changed.emit(value)
+
 
 # Create worker thread for running tasks like updating
 # the progress bar, renaming photos, displaying information
 # in the text edit widget.
 class Worker(QThread):
     update_value_signal = pyqtSignal(int)
-    update_text_edit_signal = pyqtSignal(str, str)
     clear_text_edit_signal = pyqtSignal()
 
-    def __init__(self, dir, ext, prefix):
+    def __init__(self, dir, ext, prefix, progress: ProgressChannel):
         super().__init__()
         self.dir = dir
         self.ext = ext
         self.prefix = prefix
+        # Progress and log lines go through here, throttled
+        self.progress = progress
 
     def stop_running(self):
-        """Terminate the thread."""
-        self.terminate()
+        """Asks the thread to stop after the file it is renaming, so
+        no rename is cut off halfway, and waits for it."""
+        self.requestInterruption()
         self.wait()
+        self.progress.stop()
         self.update_value_signal.emit(0)
         self.clear_text_edit_signal.emit()
 
@@ -55,6 +111,8 @@ class Worker(QThread):
         """The thread begins running from here.
         run() is only called after start()."""
         for i, file in enumerate(os.listdir(self.dir)):
+            if self.isInterruptionRequested():
+                return
             _, file_ext = os.path.splitext(file)
             if file_ext == self.ext:
                 new_file_name = self.prefix + str(i) + self.ext
@@ -66,16 +124,12 @@ class Worker(QThread):
                 # location with new name
                 os.rename(src_path, dst_path)
 
-                # Uncomment if process is too fast and want to
-                # see the updates
-                time.sleep(1.0)
-                self.update_value_signal.emit(i + 1)
-                self.update_text_edit_signal.emit(file, new_file_name)
+                self.progress.post(i + 1, f"[INFO] {file} changed to {new_file_name}.")
             else:
                 pass
 
         # Reset the value of the progress bar
-        self.update_value_signal.emit(0)
+        self.progress.post(0)
 
 
 class MainWindow(QWidget):
@@ -89,6 +143,7 @@ class MainWindow(QWidget):
         self.stop_button = None
         self.directory = None
         self.worker = None
+        self.progress = None
         self.combo_value = None
 
         self.initialize_ui()
@@ -104,19 +159,15 @@ class MainWindow(QWidget):
 
     def setup_main_window(self):
         """Create and arrange widgets in the main window."""
-        dir_label = QLabel(
-            """<p>Use Button to Choose Directory and
-            Change File Names:</p>"""
-        )
+        dir_label = QLabel("""<p>Use Button to Choose Directory and
+            Change File Names:</p>""")
         self.dir_edit = QLineEdit()
         dir_button = QPushButton("Select Directory")
         dir_button.setToolTip("Select file directory.")
         dir_button.clicked.connect(self.choose_directory)
         self.change_name_edit = QLineEdit()
-        self.change_name_edit.setToolTip(
-            """<p>Files will be appended with numerical
-            values. For example: filename<b>01</b>.jpg</p>"""
-        )
+        self.change_name_edit.setToolTip("""<p>Files will be appended with numerical
+            values. For example: filename<b>01</b>.jpg</p>""")
         self.change_name_edit.setPlaceholderText("Change file names to...")
         file_exts = [".jpg", ".jpeg", ".png", ".gif", ".txt"]
         self.combo_value = file_exts[0]
@@ -134,6 +185,7 @@ class MainWindow(QWidget):
         # are updated
         self.display_files_tedit = QTextEdit()
         self.display_files_tedit.setReadOnly(True)
+        self.display_files_tedit.document().setMaximumBlockCount(LOG_MAX_LINES)
         self.progress_bar = QProgressBar()
         self.progress_bar.setValue(0)
         self.stop_button = QPushButton("Stop")
@@ -173,14 +225,20 @@ class MainWindow(QWidget):
         prefix_text = self.change_name_edit.text()
 
         if self.directory != "" and prefix_text != "":
-            self.worker = Worker(self.directory, self.combo_value, prefix_text)
+            self.progress = ProgressChannel(parent=self)
+            self.progress.value_changed.connect(self.update_progress_bar)
+            self.progress.lines_added.connect(self.update_text_edit)
+            self.worker = Worker(
+                self.directory, self.combo_value, prefix_text, self.progress
+            )
             self.worker.clear_text_edit_signal.connect(self.display_files_tedit.clear)
             self.stop_button.setEnabled(True)
             self.stop_button.repaint()
             self.stop_button.clicked.connect(self.worker.stop_running)
             self.worker.update_value_signal.connect(self.update_progress_bar)
-            self.worker.update_text_edit_signal.connect(self.update_text_edit)
+            self.worker.finished.connect(self.progress.stop)
             self.worker.finished.connect(self.worker.deleteLater)
+            self.progress.start()
             self.worker.start()
 
     def update_combo_value(self, text):
@@ -193,8 +251,9 @@ class MainWindow(QWidget):
         """Updates the progress bar"""
         self.progress_bar.setValue(value)
 
-    def update_text_edit(self, old_text, new_text):
-        self.display_files_tedit.append(f"[INFO] {old_text} changed to {new_text}.")
+    def update_text_edit(self, lines):
+        """Appends a batch of log lines in one go"""
+        self.display_files_tedit.append("\n".join(lines))
 
 
 if __name__ == "__main__":
@@ -9,6 +9,15 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtGui import QStandardItemModel, QStandardItem
 
 
+def load_csv_model(model: QStandardItemModel, file_name: str) -> None:
+    """Load header and rows from a CSV file into `model`."""
+    with open(file_name, "r", encoding="utf-8", newline="") as csv_f:
+        reader = csv.reader(csv_f)
+        model.setHorizontalHeaderLabels(next(reader))
+        for i, row in enumerate(reader):
+            model.insertRow(i, [QStandardItem(item) for item in row])
+
+
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
@@ -37,16 +46,9 @@ class MainWindow(QWidget):
         main_v_box.addWidget(table_view)
         self.setLayout(main_v_box)
 
-    def loadCSVFile(self):
+    def loadCSVFile(self, file_name: str = "parts.csv"):
         """Load header and rows from CSV file."""
-        file_name = "parts.csv"
-        with open(file_name, "r", encoding="utf-8") as csv_f:
-            reader = csv.reader(csv_f)
-            header_labels = next(reader)
-            self.model.setHorizontalHeaderLabels(header_labels)
-            for i, row in enumerate(csv.reader(csv_f)):
-                items = [QStandardItem(item) for item in row]
-                self.model.insertRow(i, items)
+        load_csv_model(self.model, file_name)
 
 
 if __name__ == "__main__":
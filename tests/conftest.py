@@ -0,0 +1,43 @@
+import os
+import sys
+
+import pytest
+from PyQt6.QtWidgets import QApplication
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# The application imports its packages from src, as when run from there
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "src"))
+# Headless: no window is ever shown
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from infrastructure.repository.persistent.db_manager import (  # noqa: E402
+    set_sqlite_pragmas,
+)
+from infrastructure.repository.persistent.migrations import (  # noqa: E402
+    apply_migrations,
+)
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def sqlite_url(tmp_path) -> str:
+    """A migrated, empty accounts database."""
+    url = f"sqlite:///{tmp_path / 'accounts.db'}"
+    engine = create_engine(url)
+    with engine.connect() as connection:
+        apply_migrations(connection)
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def session_factory(sqlite_url):
+    engine = create_engine(sqlite_url)
+    set_sqlite_pragmas(engine)
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
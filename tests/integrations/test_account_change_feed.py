@@ -0,0 +1,147 @@
+import datetime
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select, update
+
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from infrastructure.repository.persistent.account_repository import AccountRepository
+from infrastructure.repository.persistent.account_queries import SELECT_ACCOUNT_COUNT
+from infrastructure.repository.persistent.db_manager import DbManager
+from infrastructure.repository.persistent.query_cache import QueryResultCache
+from ui.accounts.account_change_feed import AccountChangeFeed
+
+OLD_STAMP = datetime.datetime(2020, 1, 1)
+
+
+def account(id: int, **values) -> dict:
+    return {
+        "id": id,
+        "employee_id": id,
+        "first_name": "Emma",
+        "last_name": "Smith",
+        "email": f"smithe{id}@job.com",
+        "department": "HR",
+        "country_id": 1,
+        **values,
+    }
+
+
+@pytest_asyncio.fixture
+async def db_manager(tmp_path):
+    db_manager = DbManager()
+    db_manager.setup_sqlite(str(tmp_path / "accounts.db"))
+    db_manager.migrate()
+    yield db_manager
+    await db_manager.dispose()
+
+
+@pytest.fixture
+def cache() -> QueryResultCache:
+    return QueryResultCache()
+
+
+@pytest.fixture
+def repository(db_manager, cache) -> AccountRepository:
+    return AccountRepository(db_manager.session_factory, cache)
+
+
+def write(db_manager: DbManager, statement, params=None) -> None:
+    # Through the sync engine, which the cache does not watch, as a
+    # write from another process would be
+    with db_manager.sync_engine.begin() as connection:
+        connection.execute(statement, params)
+
+
+async def poll(feed: AccountChangeFeed) -> None:
+    feed.poll()
+    await feed.poll_task
+
+
+def record(feed: AccountChangeFeed) -> list:
+    emitted = []
+    feed.changes_found.connect(lambda rows, ids: emitted.append((rows, ids)))
+    return emitted
+
+
+@pytest.mark.asyncio
+async def test_idle_feed_emits_nothing_and_keeps_the_cache(
+    db_manager, cache, repository
+):
+    # Stamped just now, so inside the overlap every poll reads back
+    write(db_manager, insert(AccountEntity), [account(1), account(2)])
+    feed = AccountChangeFeed(repository)
+    emitted = record(feed)
+
+    await poll(feed)
+    assert await repository.count() == 2
+    key = cache.key(SELECT_ACCOUNT_COUNT)
+    for _ in range(3):
+        await poll(feed)
+
+    assert emitted == []
+    assert cache.get(key) is not None
+
+
+@pytest.mark.asyncio
+async def test_feed_emits_each_change_once_and_invalidates_the_cache(
+    db_manager, cache, repository
+):
+    write(
+        db_manager,
+        insert(AccountEntity),
+        [account(1, last_updated_on=OLD_STAMP), account(2, last_updated_on=OLD_STAMP)],
+    )
+    feed = AccountChangeFeed(repository)
+    emitted = record(feed)
+    await poll(feed)
+    await repository.count()
+    key = cache.key(SELECT_ACCOUNT_COUNT)
+
+    write(
+        db_manager,
+        update(AccountEntity).where(AccountEntity.id == 1).values(first_name="Ada"),
+    )
+    write(db_manager, AccountEntity.__table__.delete().where(AccountEntity.id == 2))
+    await poll(feed)
+    await poll(feed)
+
+    assert len(emitted) == 1
+    rows, deleted_ids = emitted[0]
+    assert [(row[0], row[2]) for row in rows] == [(1, "Ada")]
+    assert deleted_ids == [2]
+    assert cache.get(key) is None
+
+
+def rename(db_manager: DbManager, name: str) -> datetime.datetime:
+    """Renames account 1, stamped by the database, and returns its stamp."""
+    write(
+        db_manager,
+        update(AccountEntity).where(AccountEntity.id == 1).values(first_name=name),
+    )
+    with db_manager.sync_engine.connect() as connection:
+        return connection.execute(
+            select(AccountEntity.last_updated_on).where(AccountEntity.id == 1)
+        ).scalar_one()
+
+
+@pytest.mark.asyncio
+async def test_updates_within_one_stamp_are_all_emitted(db_manager, repository):
+    write(db_manager, insert(AccountEntity), [account(1)])
+    feed = AccountChangeFeed(repository)
+    emitted = record(feed)
+    await poll(feed)
+
+    # SQLite stamps with whole seconds, so two quick updates usually
+    # share a stamp; try again in the rare case a second ends between
+    for attempt in range(5):
+        emitted.clear()
+        first = rename(db_manager, f"B{attempt}")
+        await poll(feed)
+        second = rename(db_manager, f"C{attempt}")
+        await poll(feed)
+        if first == second:
+            break
+    assert first == second
+
+    assert [rows[0][2] for rows, _ in emitted] == [f"B{attempt}", f"C{attempt}"]
@@ -0,0 +1,116 @@
+import csv
+import json
+import os
+import threading
+
+import pytest
+from sqlalchemy import insert
+
+from application.service.account_export_service import export_accounts
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from ui.accounts.account_export_worker import AccountExportWorker
+
+ROWS = 25
+HEADER = [
+    "id",
+    "employee_id",
+    "first_name",
+    "last_name",
+    "email",
+    "department",
+    "country_id",
+]
+
+
+@pytest.fixture
+def accounts(session_factory):
+    with session_factory() as session, session.begin():
+        session.execute(
+            insert(AccountEntity),
+            [
+                {
+                    "id": id,
+                    "employee_id": id,
+                    "first_name": "Emma",
+                    "last_name": "Smith",
+                    "email": f"smithe{id}@job.com",
+                    "department": "HR",
+                    "country_id": None if id % 5 else 1,
+                }
+                for id in range(1, ROWS + 1)
+            ],
+        )
+    return session_factory
+
+
+def test_csv_export_writes_a_header_and_every_row(accounts, tmp_path):
+    path = str(tmp_path / "accounts.csv")
+    progress = []
+
+    written = export_accounts(
+        accounts, path, batch_size=10, progress=lambda *args: progress.append(args)
+    )
+
+    with open(path, newline="", encoding="utf-8") as file:
+        rows = list(csv.reader(file))
+    assert written == ROWS
+    assert rows[0] == HEADER
+    assert [int(row[0]) for row in rows[1:]] == list(range(1, ROWS + 1))
+    assert rows[5][6] == "1" and rows[1][6] == ""
+    assert progress == [(10, ROWS), (20, ROWS), (ROWS, ROWS)]
+
+
+def test_jsonl_export_writes_one_object_per_row(accounts, tmp_path):
+    path = str(tmp_path / "accounts.jsonl")
+
+    assert export_accounts(accounts, path) == ROWS
+
+    with open(path, encoding="utf-8") as file:
+        rows = [json.loads(line) for line in file]
+    assert len(rows) == ROWS
+    assert list(rows[0]) == HEADER
+    assert rows[4]["country_id"] == 1 and rows[0]["country_id"] is None
+
+
+def test_cancelled_export_leaves_no_file(accounts, tmp_path):
+    path = str(tmp_path / "accounts.csv")
+    cancelled = threading.Event()
+
+    written = export_accounts(
+        accounts,
+        path,
+        batch_size=10,
+        progress=lambda *_: cancelled.set(),
+        cancelled=cancelled,
+    )
+
+    assert written == 10
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".part")
+
+
+def test_worker_reports_progress_and_the_rows_written(qapp, accounts, tmp_path):
+    worker = AccountExportWorker(accounts, str(tmp_path / "accounts.csv"))
+    progress, exported, failed = [], [], []
+    worker.progress_signal.connect(lambda *args: progress.append(args))
+    worker.exported_signal.connect(exported.append)
+    worker.failed_signal.connect(failed.append)
+
+    worker.run()  # On this thread, so the signals arrive right away
+
+    assert progress[-1] == (ROWS, ROWS)
+    assert exported == [ROWS]
+    assert failed == []
+
+
+def test_stopped_worker_reports_nothing_exported(qapp, accounts, tmp_path):
+    path = str(tmp_path / "accounts.csv")
+    worker = AccountExportWorker(accounts, path)
+    exported = []
+    worker.exported_signal.connect(exported.append)
+
+    worker.stop_running()
+    worker.run()
+
+    assert exported == []
+    assert not os.path.exists(path)
@@ -0,0 +1,126 @@
+import pytest
+from PyQt6.QtCore import Qt
+from sqlalchemy import insert
+
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from infrastructure.repository.persistent.country_entity import CountryEntity
+from ui.accounts.account_page_loader import AccountsPageLoader
+from ui.accounts.accounts_filter_proxy_model import AccountsFilterProxyModel
+from ui.accounts.accounts_table_model import AccountsTableModel
+
+ASCENDING = Qt.SortOrder.AscendingOrder
+DESCENDING = Qt.SortOrder.DescendingOrder
+
+COUNTRIES = {1: "Spain", 2: "Austria", 3: "Peru"}
+# id -> (department, country_id)
+ACCOUNTS = {
+    1: ("HR", 1),
+    2: ("Sales", 2),
+    3: ("IT", None),
+    4: ("Finance", 3),
+    5: ("Sales", None),
+    6: ("HR", 2),
+    7: ("IT", 3),
+    8: ("IT", 9),  # No such country
+}
+
+
+@pytest.fixture
+def session(session_factory):
+    with session_factory() as session, session.begin():
+        session.execute(
+            insert(CountryEntity),
+            [{"id": id, "country": name} for id, name in COUNTRIES.items()],
+        )
+        session.execute(
+            insert(AccountEntity),
+            [
+                {
+                    "id": id,
+                    "employee_id": id,
+                    "first_name": "Emma",
+                    "last_name": "Smith",
+                    "email": f"smithe{id}@job.com",
+                    "department": department,
+                    "country_id": country_id,
+                }
+                for id, (department, country_id) in ACCOUNTS.items()
+            ],
+        )
+    with session_factory() as session:
+        yield session
+
+
+def read_all(loader: AccountsPageLoader) -> list:
+    ids = []
+    while page := loader.fetch_next():
+        assert len(page) <= loader.page_size
+        ids.extend(row[0] for row in page)
+    return ids
+
+
+def test_pages_seek_past_equal_values(session):
+    loader = AccountsPageLoader(session, page_size=2)
+    loader.reset(5)
+
+    # Finance, HR, IT, Sales
+    assert read_all(loader) == [4, 1, 6, 3, 7, 8, 2, 5]
+
+
+@pytest.mark.parametrize(
+    "descending, ids",
+    [(False, [2, 6, 4, 7, 1, 3, 5, 8]), (True, [1, 7, 4, 6, 2, 8, 5, 3])],
+)
+def test_pages_sorted_by_country_use_the_name_then_read_nulls(session, descending, ids):
+    loader = AccountsPageLoader(session, page_size=2)
+    loader.reset(6, descending)
+
+    # Austria, Peru, Spain, then the accounts without a country name
+    assert read_all(loader) == ids
+
+
+def test_has_passed_rows_already_read(session):
+    loader = AccountsPageLoader(session, page_size=3)
+    loader.reset(5)
+    loader.fetch_next()  # Finance 4, HR 1, HR 6
+
+    assert loader.has_passed((1, 0, "", "", "", "HR", 1))
+    assert not loader.has_passed((9, 0, "", "", "", "HR", 1))
+    assert not loader.has_passed((0, 0, "", "", "", "IT", 1))
+
+
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("sort_column", [0, 5, 6])
+def test_memory_sort_matches_the_database(qapp, session, sort_column, descending):
+    model = AccountsTableModel(page_loader=AccountsPageLoader(session, page_size=3))
+    while model.canFetchMore():
+        model.fetchMore()
+    model.set_sort_labels(6, lambda: COUNTRIES)
+    model.sort(sort_column, DESCENDING if descending else ASCENDING)
+
+    loader = AccountsPageLoader(session, page_size=3)
+    loader.reset(sort_column, descending)
+    in_memory = [model.index(row, 0).data() for row in range(model.rowCount())]
+    assert in_memory == read_all(loader)
+
+
+def test_search_finds_accounts_on_pages_not_read_yet(qapp, session):
+    model = AccountsTableModel(page_loader=AccountsPageLoader(session, page_size=3))
+    model.fetchMore()  # 1, 2, 3
+    proxy = AccountsFilterProxyModel()
+    proxy.setSourceModel(model)
+
+    proxy.set_filter_text("7")
+    assert [proxy.index(row, 0).data() for row in range(proxy.rowCount())] == [7]
+    proxy.set_filter_text("SMITHE5")
+    assert [proxy.index(row, 0).data() for row in range(proxy.rowCount())] == [5]
+
+    # Kept through a sort in the database
+    model.sort(1, DESCENDING)
+    assert [proxy.index(row, 0).data() for row in range(proxy.rowCount())] == [5]
+
+    # Pages do not bring the matches a second time
+    while model.canFetchMore():
+        model.fetchMore()
+    ids = [model.index(row, 0).data() for row in range(model.rowCount())]
+    assert sorted(ids) == list(ACCOUNTS)
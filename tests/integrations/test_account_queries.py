@@ -0,0 +1,51 @@
+from sqlalchemy import delete, insert, select
+
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from infrastructure.repository.persistent.account_queries import (
+    DELETE_BATCH_SIZE,
+    delete_conditions,
+)
+
+
+def account(id: int) -> dict:
+    return {
+        "id": id,
+        "employee_id": id,
+        "first_name": "Emma",
+        "last_name": "Smith",
+        "email": f"smithe{id}@job.com",
+        "department": "HR",
+        "country_id": None,
+    }
+
+
+def parameter_count(condition) -> int:
+    compiled = condition.compile(compile_kwargs={"render_postcompile": True})
+    return len(compiled.params)
+
+
+def test_delete_conditions_batch_and_match_exactly_the_ids(session_factory):
+    # 600 scattered ids, 300 runs of three and one long run
+    singles = set(range(1, 1200, 2))
+    runs = {id for start in range(2000, 3200, 4) for id in range(start, start + 3)}
+    block = set(range(5000, 6000))
+    ids = singles | runs | block
+    kept = set(range(1, 6100)) - ids
+    with session_factory() as session, session.begin():
+        session.execute(insert(AccountEntity), [account(id) for id in ids | kept])
+
+    conditions = list(delete_conditions(ids))
+
+    assert all(parameter_count(c) <= DELETE_BATCH_SIZE for c in conditions)
+    # 301 ranges in two statements, 600 single ids in two
+    assert len(conditions) == 4
+    with session_factory() as session, session.begin():
+        for condition in conditions:
+            session.execute(delete(AccountEntity).where(condition))
+    with session_factory() as session:
+        left = set(session.scalars(select(AccountEntity.id)))
+    assert left == kept
+
+
+def test_delete_conditions_of_no_ids(session_factory):
+    assert list(delete_conditions([])) == []
@@ -0,0 +1,103 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from infrastructure.repository.persistent import account_repository
+from infrastructure.repository.persistent.account_repository import AccountRepository
+from infrastructure.repository.persistent.query_cache import QueryResultCache
+
+
+def account(id: int, **values) -> dict:
+    return {
+        "id": id,
+        "employee_id": id,
+        "first_name": "Emma",
+        "last_name": "Smith",
+        "email": f"smithe{id}@job.com",
+        "department": "HR",
+        "country_id": 1,
+        **values,
+    }
+
+
+@pytest_asyncio.fixture
+async def engine(sqlite_url):
+    engine = create_async_engine(sqlite_url.replace("sqlite:", "sqlite+aiosqlite:"))
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def repository(engine):
+    return AccountRepository(async_sessionmaker(engine))
+
+
+async def stored(repository: AccountRepository) -> dict:
+    rows = []
+    async for batch in repository.iterate():
+        rows.extend(batch)
+    return {row.id: (row.employee_id, row.first_name) for row in rows}
+
+
+@pytest.mark.asyncio
+async def test_add_many_inserts_every_account(repository):
+    assert await repository.add_many(account(id) for id in range(1, 4)) == 3
+    assert await stored(repository) == {id: (id, "Emma") for id in range(1, 4)}
+
+
+@pytest.mark.asyncio
+async def test_add_many_commits_each_batch(repository, monkeypatch):
+    monkeypatch.setattr(account_repository, "BULK_BATCH_SIZE", 3)
+    assert await repository.add_many(account(id) for id in range(1, 8)) == 7
+    assert await repository.count() == 7
+
+    # The third batch repeats an employee id: the two before it stay
+    accounts = [account(id) for id in range(8, 14)] + [account(14, employee_id=8)]
+    with pytest.raises(IntegrityError):
+        await repository.add_many(accounts)
+    assert await repository.count() == 13
+
+
+@pytest.mark.asyncio
+async def test_upsert_many_updates_existing_ids_and_inserts_new_ones(repository):
+    await repository.add_many([account(1), account(2)])
+
+    written = await repository.upsert_many(
+        [account(1, first_name="Ada"), account(3, first_name="Grace")]
+    )
+
+    assert written == 2
+    assert await stored(repository) == {
+        1: (1, "Ada"),
+        2: (2, "Emma"),
+        3: (3, "Grace"),
+    }
+
+
+@pytest.mark.asyncio
+async def test_upsert_many_across_batches(repository, monkeypatch):
+    monkeypatch.setattr(account_repository, "BULK_BATCH_SIZE", 2)
+    await repository.add_many(account(id) for id in range(1, 4))
+
+    written = await repository.upsert_many(
+        account(id, first_name=f"Name{id}") for id in range(2, 7)
+    )
+
+    assert written == 5
+    accounts = await stored(repository)
+    assert accounts[1] == (1, "Emma")
+    assert [accounts[id] for id in range(2, 7)] == [
+        (id, f"Name{id}") for id in range(2, 7)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_bulk_writes_invalidate_cached_reads(engine):
+    repository = AccountRepository(async_sessionmaker(engine), QueryResultCache())
+    assert await repository.count() == 0
+
+    await repository.add_many([account(1)])
+    assert await repository.count() == 1
+    await repository.upsert_many([account(2)])
+    assert await repository.count() == 2
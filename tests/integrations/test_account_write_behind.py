@@ -0,0 +1,186 @@
+import pytest
+from PyQt6.QtCore import Qt
+from sqlalchemy import insert, select, text
+
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from ui.accounts.account_page_loader import AccountsPageLoader
+from ui.accounts.account_write_behind import AccountsWriteBehind
+from ui.accounts.accounts_table_model import AccountsTableModel
+
+
+def account(id: int, **values) -> dict:
+    return {
+        "id": id,
+        "employee_id": id,
+        "first_name": "Emma",
+        "last_name": "Smith",
+        "email": f"smithe{id}@job.com",
+        "department": "HR",
+        "country_id": 1,
+        **values,
+    }
+
+
+def new_account(employee_id: int) -> dict:
+    values = account(0, employee_id=employee_id)
+    del values["id"]
+    return values
+
+
+def stored(session_factory) -> dict:
+    with session_factory() as session:
+        rows = session.execute(
+            select(
+                AccountEntity.id, AccountEntity.employee_id, AccountEntity.first_name
+            )
+        ).all()
+    return {row.id: (row.employee_id, row.first_name) for row in rows}
+
+
+@pytest.fixture
+def write_behind(qapp, session_factory):
+    with session_factory() as session, session.begin():
+        session.execute(insert(AccountEntity), [account(1), account(2)])
+    write_behind = AccountsWriteBehind(session_factory)
+    yield write_behind
+    write_behind.timer.stop()
+
+
+def test_edits_collapse_into_one_write(write_behind, session_factory):
+    write_behind.record_update(1, "first_name", "Ada")
+    write_behind.record_update(1, "first_name", "Grace")
+    assert write_behind.pending_count() == 1
+
+    assert write_behind.flush()
+    assert stored(session_factory)[1] == (1, "Grace")
+    assert write_behind.pending_count() == 0
+
+
+def test_new_ids_are_assigned_in_insert_order(write_behind, session_factory):
+    assigned = []
+    write_behind.ids_assigned.connect(assigned.append)
+    write_behind.record_insert(-1, new_account(30))
+    write_behind.record_insert(-2, new_account(10))
+    write_behind.record_insert(-3, new_account(20))
+
+    assert write_behind.flush()
+    rows = stored(session_factory)
+    (ids,) = assigned
+    assert [rows[ids[key]][0] for key in (-1, -2, -3)] == [30, 10, 20]
+
+
+def test_delete_frees_an_employee_id_for_an_insert_in_the_same_flush(
+    write_behind, session_factory
+):
+    # Deletes run first, so the unique employee_id is free again
+    write_behind.record_insert(-1, new_account(2))
+    write_behind.record_delete(2)
+
+    assert write_behind.flush()
+    rows = stored(session_factory)
+    assert 2 not in rows
+    assert sorted(employee_id for employee_id, _ in rows.values()) == [1, 2]
+
+
+def test_inserted_then_deleted_account_is_never_written(write_behind, session_factory):
+    write_behind.record_insert(-1, new_account(3))
+    write_behind.record_delete(-1)
+
+    assert write_behind.pending_count() == 0
+    assert write_behind.flush()
+    assert sorted(stored(session_factory)) == [1, 2]
+
+
+def test_flush_reports_incomplete_new_rows_as_unsaved(write_behind, session_factory):
+    write_behind.record_inserts([-1])
+    write_behind.record_update(1, "first_name", "Ada")
+
+    assert not write_behind.flush()
+    assert stored(session_factory)[1] == (1, "Ada")
+    assert write_behind.pending_count() == 1
+
+    for name, value in new_account(3).items():
+        write_behind.record_update(-1, name, value)
+    assert write_behind.flush()
+    assert write_behind.pending_count() == 0
+
+
+def test_refused_change_is_set_aside_and_the_rest_written(
+    write_behind, session_factory
+):
+    rejected = []
+    write_behind.changes_rejected.connect(rejected.append)
+    # employee_id is unique
+    write_behind.record_update(2, "employee_id", 1)
+    write_behind.record_update(1, "first_name", "Ada")
+    write_behind.record_insert(-1, new_account(3))
+
+    assert not write_behind.flush()
+    rows = stored(session_factory)
+    assert rows[1] == (1, "Ada")
+    assert sorted(employee_id for employee_id, _ in rows.values()) == [1, 2, 3]
+    assert list(rejected[0]) == [2]
+    assert "UNIQUE" in rejected[0][2]
+    assert write_behind.pending_count() == 1
+    assert not write_behind.timer.isActive()
+
+    # Not retried until edited again
+    assert not write_behind.flush()
+    assert len(rejected) == 1
+    write_behind.record_update(2, "employee_id", 20)
+    assert write_behind.flush()
+    assert stored(session_factory)[2] == (20, "Emma")
+
+
+def test_refused_changes_can_be_reverted(qapp, write_behind, session_factory):
+    with session_factory() as session:
+        loader = AccountsPageLoader(session)
+        model = AccountsTableModel(page_loader=loader, write_behind=write_behind)
+        model.fetchMore()
+    write_behind.changes_rejected.connect(model.revert_changes)
+    model.setData(model.index(1, 1), 1)
+    model.add_empty_rows(1)
+    for column, value in enumerate(new_account(1).values(), start=1):
+        model.setData(model.index(2, column), value)
+
+    # Reverted as soon as they are refused, so nothing is left
+    assert write_behind.flush()
+    assert [model.index(row, 1).data() for row in range(model.rowCount())] == [1, 2]
+
+
+def test_unsaved_new_rows_survive_a_sort_in_the_database(
+    qapp, write_behind, session_factory
+):
+    with session_factory() as session:
+        loader = AccountsPageLoader(session)
+        model = AccountsTableModel(page_loader=loader, write_behind=write_behind)
+        model.fetchMore()
+        model.add_empty_rows(1)
+        model.setData(model.index(2, 1), 30)
+        model.sort_in_database(1, Qt.SortOrder.DescendingOrder)
+
+    assert [model.index(row, 1).data() for row in range(model.rowCount())] == [
+        2,
+        1,
+        30,
+    ]
+    assert model.store.get(model.physical_row(2), 0) < 0
+    assert write_behind.pending_count() == 1
+
+
+def test_operational_errors_keep_the_queue_and_retry(write_behind, session_factory):
+    failures = []
+    write_behind.flush_failed.connect(failures.append)
+    write_behind.record_update(1, "first_name", "Ada")
+    with session_factory() as session, session.begin():
+        session.execute(text("ALTER TABLE accounts RENAME TO accounts_away"))
+
+    assert not write_behind.flush()
+    assert len(failures) == 1
+    assert write_behind.pending_count() == 1
+    assert write_behind.timer.isActive()
+
+    with session_factory() as session, session.begin():
+        session.execute(text("ALTER TABLE accounts_away RENAME TO accounts"))
+    assert write_behind.flush()
+    assert stored(session_factory)[1] == (1, "Ada")
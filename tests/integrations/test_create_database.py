@@ -0,0 +1,70 @@
+import csv
+
+from sqlalchemy import func, insert, select
+
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from ui.create_database import (
+    SHARD_COLUMNS,
+    account_rows,
+    create_database,
+    create_database_engine,
+    shard_ranges,
+    write_csv_shard,
+)
+
+
+def test_new_rows_get_ids_past_the_loaded_ones(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'accounts.db'}")
+    create_database(engine, 50, seed=1)
+    with engine.begin() as connection:
+        result = connection.execute(
+            insert(AccountEntity).values(
+                employee_id=10**9,
+                first_name="Ada",
+                last_name="Lovelace",
+                email="lovelacea@job.com",
+                department="R&D",
+            )
+        )
+        assert result.inserted_primary_key[0] == 51
+        assert connection.execute(select(func.count(AccountEntity.id))).scalar() == 51
+    engine.dispose()
+
+
+def all_accounts(engine) -> list:
+    with engine.connect() as connection:
+        return connection.execute(
+            select(*(getattr(AccountEntity, name) for name in SHARD_COLUMNS)).order_by(
+                AccountEntity.id
+            )
+        ).all()
+
+
+def test_parallel_load_matches_the_serial_one(tmp_path):
+    serial = create_database_engine(f"sqlite:///{tmp_path / 'serial.db'}")
+    parallel = create_database_engine(f"sqlite:///{tmp_path / 'parallel.db'}")
+    create_database(serial, 500, seed=3)
+    create_database(parallel, 500, seed=3, batch_size=64, workers=3)
+
+    rows = all_accounts(serial)
+    assert len(rows) == 500
+    assert all_accounts(parallel) == rows
+    serial.dispose()
+    parallel.dispose()
+
+
+def test_csv_shards_together_hold_every_row_once(tmp_path):
+    ranges = shard_ranges(0, 100, 3)
+    assert ranges == [(0, 33), (33, 66), (66, 100)]
+
+    rows = []
+    for number, (start, stop) in enumerate(ranges):
+        path = tmp_path / f"{number}.shard"
+        assert write_csv_shard(str(path), 5, start, stop, batch_size=10) == stop - start
+        with open(path, newline="", encoding="utf-8") as file:
+            rows.extend(csv.reader(file))
+
+    expected = [
+        [str(row[name]) for name in SHARD_COLUMNS] for row in account_rows(5, 0, 100)
+    ]
+    assert rows == expected
@@ -0,0 +1,142 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.exc import OperationalError
+
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from infrastructure.repository.persistent.country_entity import CountryEntity
+from infrastructure.repository.persistent.db_manager import DbManager
+from infrastructure.repository.persistent.migrations import apply_migrations
+
+
+@pytest_asyncio.fixture
+async def db_manager(tmp_path):
+    db_manager = DbManager()
+    db_manager.setup_sqlite(str(tmp_path / "accounts.db"), compiled_cache_size=50)
+    db_manager.migrate()
+    yield db_manager
+    await db_manager.dispose()
+
+
+@pytest.mark.asyncio
+async def test_failed_statements_leave_no_start_time_behind(db_manager):
+    async with db_manager.engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                await connection.execute(text("SELECT * FROM missing"))
+        await connection.execute(select(AccountEntity.id))
+        info = await connection.run_sync(lambda sync: sync.info)
+        assert not info.get("query_started")
+
+    stats = db_manager.pool_stats()
+    assert stats["queries"] == 1
+    assert stats["query_ms"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_statement_cache_stats(db_manager):
+    db_manager.reset_pool_stats()
+    async with db_manager.session_factory() as session:
+        for _ in range(3):
+            await session.execute(select(AccountEntity.id))
+
+    stats = db_manager.statement_cache_stats()
+    assert stats["hits"] >= 2
+    assert stats["size"] == 50
+
+
+def test_check_conn_checks_when_no_loop_is_running(tmp_path):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    db_manager = DbManager()
+    db_manager.setup_sqlite(str(tmp_path / "accounts.db"))
+    try:
+        assert db_manager.check_conn()
+        assert db_manager.conn_checked_at is not None
+    finally:
+        loop.run_until_complete(db_manager.dispose())
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def test_health_checks_started_before_the_loop_runs(tmp_path):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    db_manager = DbManager()
+    db_manager.setup_sqlite(str(tmp_path / "accounts.db"))
+    try:
+        db_manager.start_health_checks(interval=0.01)
+        loop.run_until_complete(asyncio.sleep(0.05))
+        assert db_manager.conn_ok
+    finally:
+        loop.run_until_complete(db_manager.dispose())
+        asyncio.set_event_loop(None)
+        loop.close()
+
+
+def country_file(path, name: str) -> str:
+    """A migrated database holding one country called `name`."""
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as connection:
+        apply_migrations(connection)
+        connection.execute(insert(CountryEntity), {"id": 1, "country": name})
+        connection.commit()
+    engine.dispose()
+    return str(path)
+
+
+@pytest_asyncio.fixture
+async def routed(tmp_path):
+    db_manager = DbManager()
+    db_manager.setup_sqlite(
+        country_file(tmp_path / "primary.db", "Primary"),
+        replica_paths=[country_file(tmp_path / "replica.db", "Replica")],
+    )
+    yield db_manager
+    await db_manager.dispose()
+
+
+SELECT_COUNTRIES = select(CountryEntity.country).order_by(CountryEntity.id)
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_the_replica_and_writes_to_the_primary(routed):
+    async with routed.session_factory() as session:
+        assert (await session.execute(SELECT_COUNTRIES)).scalars().all() == ["Replica"]
+
+        await session.execute(insert(CountryEntity), {"id": 2, "country": "Added"})
+        # The transaction has written, so it reads its own writes
+        assert (await session.execute(SELECT_COUNTRIES)).scalars().all() == [
+            "Primary",
+            "Added",
+        ]
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_replicas_are_skipped(routed):
+    (replica,) = routed.replica_engines
+    routed.replica_ok[replica] = False
+
+    async with routed.session_factory() as session:
+        countries = (await session.execute(SELECT_COUNTRIES)).scalars().all()
+    assert countries == ["Primary"]
+    assert routed.replica_health() == {str(replica.url): False}
+
+
+@pytest.mark.asyncio
+async def test_replica_pools_are_instrumented(routed):
+    (replica,) = routed.replica_engines
+    routed.reset_pool_stats()
+    async with routed.session_factory() as session:
+        for _ in range(3):
+            await session.execute(SELECT_COUNTRIES)
+
+    stats = routed.replica_pool_stats()[str(replica.url)]
+    assert stats["queries"] == 3
+    assert stats["checkouts"] >= 1
+    assert stats["acquire_ms"]["count"] >= 1
+    assert routed.pool_stats()["queries"] == 0
+    assert routed.statement_cache_stats()["hits"] >= 2
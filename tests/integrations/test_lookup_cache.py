@@ -0,0 +1,36 @@
+from sqlalchemy import insert, update
+
+from infrastructure.repository.persistent.account_entity import AccountEntity
+from infrastructure.repository.persistent.account_queries import (
+    select_department_names,
+)
+from infrastructure.repository.persistent.lookup_cache import LookupCache
+
+
+def test_departments_survive_writes_and_take_added_names(session_factory):
+    engine = session_factory.kw["bind"]
+    lookups = LookupCache(session_factory)
+    lookups.register("departments", select_department_names(), sources=())
+    lookups.watch(engine)
+    with session_factory() as session, session.begin():
+        session.execute(
+            insert(AccountEntity),
+            {
+                "id": 1,
+                "employee_id": 1,
+                "first_name": "Emma",
+                "last_name": "Smith",
+                "email": "smithe1@job.com",
+                "department": "HR",
+                "country_id": 1,
+            },
+        )
+    labels = lookups.labels("departments")
+    assert labels == {"HR": "HR"}
+
+    with session_factory() as session, session.begin():
+        session.execute(update(AccountEntity).values(department="IT"))
+    assert lookups.labels("departments") is labels
+
+    lookups.add("departments", "IT")
+    assert lookups.choices("departments") == [("HR", "HR"), ("IT", "IT")]
@@ -0,0 +1,86 @@
+from sqlalchemy import create_engine, inspect, text
+
+from infrastructure.repository.persistent.migrations import (
+    MIGRATIONS,
+    apply_migrations,
+    schema_version,
+)
+
+LATEST = MIGRATIONS[-1].version
+
+# The tables as the original create_database made them
+LEGACY_SCHEMA = (
+    "CREATE TABLE countries (id INTEGER PRIMARY KEY UNIQUE NOT NULL, "
+    "country VARCHAR(20) NOT NULL)",
+    "CREATE TABLE accounts ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT UNIQUE NOT NULL, "
+    "employee_id INTEGER NOT NULL, first_name VARCHAR(30) NOT NULL, "
+    "last_name VARCHAR(30) NOT NULL, email VARCHAR(40) NOT NULL, "
+    "department VARCHAR(20) NOT NULL, "
+    "country_id VARCHAR(20) REFERENCES countries(id))",
+)
+
+
+def test_migrations_apply_once_in_order(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'accounts.db'}")
+    with engine.connect() as connection:
+        assert schema_version(connection) == 0
+        connection.rollback()
+        assert apply_migrations(connection) == [
+            migration.version for migration in MIGRATIONS
+        ]
+        assert apply_migrations(connection) == []
+        assert schema_version(connection) == LATEST
+
+        indexes = {
+            index["name"] for index in inspect(connection).get_indexes("accounts")
+        }
+        foreign_keys = connection.exec_driver_sql(
+            "PRAGMA foreign_key_list(accounts)"
+        ).all()
+    engine.dispose()
+    assert {"uq_accounts_employee_id", "ix_accounts_country_id_id"} <= indexes
+    # Covered by uq_accounts_employee_id
+    assert "ix_accounts_employee_id_id" not in indexes
+    assert [(key.table, key._mapping["from"], key.to) for key in foreign_keys] == [
+        ("countries", "country_id", "id")
+    ]
+
+
+def test_legacy_country_ids_become_integers(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'accounts.db'}")
+    with engine.connect() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO countries VALUES (3, 'Peru')")
+        for employee_id, country_id in enumerate(("3", "", "3")):
+            connection.exec_driver_sql(
+                "INSERT INTO accounts (employee_id, first_name, last_name, "
+                "email, department, country_id) "
+                f"VALUES ({employee_id}, 'Emma', 'Smith', 'e@job.com', 'HR', "
+                f"'{country_id}')"
+            )
+        # The highest id is gone but must not be handed out again
+        connection.exec_driver_sql("DELETE FROM accounts WHERE id = 3")
+        connection.commit()
+
+        apply_migrations(connection)
+
+        rows = connection.execute(
+            text("SELECT id, country_id, typeof(country_id) FROM accounts ORDER BY id")
+        ).all()
+        assert rows == [(1, 3, "integer"), (2, None, "null")]
+        sequence = connection.execute(
+            text("SELECT seq FROM sqlite_sequence WHERE name = 'accounts'")
+        ).scalar()
+        assert sequence == 3
+        assert schema_version(connection) == LATEST
+
+        # The rebuilt table keeps the reference to the countries
+        foreign_keys = connection.exec_driver_sql(
+            "PRAGMA foreign_key_list(accounts)"
+        ).all()
+        assert [(key.table, key._mapping["from"], key.to) for key in foreign_keys] == [
+            ("countries", "country_id", "id")
+        ]
+    engine.dispose()
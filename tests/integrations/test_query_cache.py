@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import insert, select
+
+from infrastructure.repository.persistent.account_queries import (
+    SELECT_ALL_ACCOUNTS,
+    accounts_page_query,
+    select_country_names,
+)
+from infrastructure.repository.persistent.country_entity import CountryEntity
+from infrastructure.repository.persistent.query_cache import (
+    QueryResultCache,
+    statement_tables,
+)
+
+
+@pytest.fixture
+def cache(session_factory):
+    cache = QueryResultCache()
+    cache.watch(session_factory.kw["bind"])
+    return cache
+
+
+def test_keys_tell_parameters_apart():
+    first = QueryResultCache.key(*accounts_page_query((1, 1), 10, sort_column=2))
+    again = QueryResultCache.key(*accounts_page_query((1, 1), 10, sort_column=2))
+    later = QueryResultCache.key(*accounts_page_query((1, 2), 10, sort_column=2))
+    assert first == again
+    assert first != later
+    assert QueryResultCache.key(
+        select(CountryEntity.id).where(CountryEntity.id == 1)
+    ) != QueryResultCache.key(select(CountryEntity.id).where(CountryEntity.id == 2))
+
+
+def test_committed_writes_drop_results_of_their_tables(cache, session_factory):
+    accounts = QueryResultCache.key(SELECT_ALL_ACCOUNTS)
+    countries = QueryResultCache.key(select_country_names())
+    cache.put(accounts, statement_tables(SELECT_ALL_ACCOUNTS), [])
+    cache.put(countries, statement_tables(select_country_names()), [])
+
+    with session_factory() as session:
+        session.execute(insert(CountryEntity), {"id": 1, "country": "Peru"})
+        session.rollback()
+    assert cache.get(countries) == []
+
+    with session_factory() as session, session.begin():
+        session.execute(insert(CountryEntity), {"id": 1, "country": "Peru"})
+    assert cache.get(countries) is None
+    assert cache.get(accounts) == []
+
+
+def test_results_read_before_an_invalidation_are_not_stored():
+    cache = QueryResultCache()
+    key = QueryResultCache.key(select_country_names())
+    version = cache.version
+    cache.invalidate_tables(["countries"])
+
+    cache.put(key, ["countries"], [(1, "Peru")], version)
+    assert cache.get(key) is None
+
+
+def test_least_recently_used_results_are_evicted_first():
+    cache = QueryResultCache(max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, ["accounts"], [key])
+    cache.get("a")
+    cache.put("c", ["accounts"], ["c"])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == ["a"]
+    assert cache.stats()["evictions"] == 1
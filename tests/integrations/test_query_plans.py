@@ -0,0 +1,15 @@
+from infrastructure.repository.persistent.query_plans import check_query_plans
+from ui.create_database import create_database, create_database_engine
+
+
+def test_migrated_database_serves_every_query_from_an_index(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'accounts.db'}")
+    # Rows first, so the statistics the migrations collect describe a
+    # table with many accounts per country
+    create_database(engine, 2000, seed=1)
+    with engine.connect() as connection:
+        checks = check_query_plans(connection)
+    engine.dispose()
+
+    assert checks
+    assert {check.name: check.problems for check in checks if check.problems} == {}
@@ -0,0 +1,39 @@
+from ui.accounts.account_column_store import AccountColumnStore, contiguous_runs
+
+
+def make_store(count: int) -> AccountColumnStore:
+    store = AccountColumnStore()
+    store.extend_rows(
+        (row, 1000 - row, f"First{row}", "Smith", None, "HR", row % 3 or None)
+        for row in range(count)
+    )
+    return store
+
+
+def test_rows_round_trip_with_none():
+    store = make_store(3)
+    assert store.row(1) == (1, 999, "First1", "Smith", None, "HR", 1)
+    assert store.get(0, 6) is None
+
+
+def test_remove_rows_keeps_the_others_in_order():
+    store = make_store(10)
+    store.remove_rows([0, 1, 5, 9])
+    assert [store.get(row, 0) for row in range(len(store))] == [2, 3, 4, 6, 7, 8]
+
+
+def test_remove_many_scattered_rows():
+    store = make_store(1000)
+    store.remove_rows(list(range(0, 1000, 2)))
+    assert [store.get(row, 0) for row in range(len(store))] == list(range(1, 1000, 2))
+
+
+def test_sort_permutation_puts_none_first():
+    store = make_store(6)
+    assert store.sort_permutation(1) == [5, 4, 3, 2, 1, 0]
+    permutation = store.sort_permutation(6)
+    assert [store.get(row, 6) for row in permutation] == [None, None, 1, 1, 2, 2]
+
+
+def test_contiguous_runs():
+    assert contiguous_runs([1, 2, 3, 7, 9, 10]) == [(1, 3), (7, 7), (9, 10)]
@@ -0,0 +1,89 @@
+from ui.accounts.account_column_store import AccountColumnStore
+from ui.accounts import account_prefix_index
+from ui.accounts.account_prefix_index import SEARCH_COLUMNS, AccountPrefixIndex
+
+FIRST_NAME = 2
+LAST_NAME = 3
+
+
+def make_store(count: int) -> AccountColumnStore:
+    store = AccountColumnStore()
+    names = ["Smith", "Smyth", "Jones", "Brown"]
+    store.extend_rows(
+        (
+            row + 1,
+            1000 + row,
+            ["Emma", "Ava", "Liam"][row % 3],
+            names[row % len(names)],
+            f"{names[row % len(names)].lower()}{row}@job.com",
+            "HR",
+            1,
+        )
+        for row in range(count)
+    )
+    return store
+
+
+def scan(store: AccountColumnStore, prefix: str) -> list:
+    return [
+        row
+        for row in range(len(store))
+        if any(
+            str(store.get(row, column)).lower().startswith(prefix)
+            for column in SEARCH_COLUMNS
+        )
+    ]
+
+
+def test_search_matches_a_scan():
+    store = make_store(200)
+    index = AccountPrefixIndex(store)
+    for prefix in ("sm", "smi", "smy", "1", "10", "ava", "x"):
+        assert index.search(prefix) == scan(store, prefix)
+
+
+def test_edits_move_only_the_edited_column():
+    store = make_store(200)
+    index = AccountPrefixIndex(store)
+    index.search("s")
+    first_names = index.indexes[SEARCH_COLUMNS.index(FIRST_NAME)]
+    keys_before = list(first_names.keys)
+
+    for row in (0, 7, 199):
+        store.set(row, LAST_NAME, "Zed")
+        index.row_changed(row, LAST_NAME, LAST_NAME)
+    assert index.search("ze") == [0, 7, 199]
+    assert index.search("sm") == scan(store, "sm")
+    assert first_names.keys == keys_before
+
+    # The id column is not searched: assigning ids touches no index
+    store.set(5, 0, 999)
+    index.row_changed(5, 0, 0)
+    assert first_names.keys == keys_before
+
+
+def test_appended_rows_are_found_before_and_after_merging(monkeypatch):
+    monkeypatch.setattr(account_prefix_index, "MAX_UNINDEXED_ROWS", 8)
+    store = make_store(100)
+    index = AccountPrefixIndex(store)
+    index.search("sm")
+    store.extend_rows(
+        (row + 1, 1000 + row, "Zoe", "Smart", f"smart{row}@job.com", "HR", 1)
+        for row in range(100, 105)
+    )
+    index.rows_appended()
+    assert index.search("sma") == scan(store, "sma")
+    assert index.indexed_rows == 100
+
+    store.extend_rows(
+        (row + 1, 1000 + row, "Zoe", "Smart", f"smart{row}@job.com", "HR", 1)
+        for row in range(105, 120)
+    )
+    index.rows_appended()
+    assert index.search("zo") == list(range(100, 120))
+    assert index.indexed_rows == 120
+
+    store.set(110, FIRST_NAME, "Ada")
+    index.row_changed(110, FIRST_NAME, FIRST_NAME)
+    assert 110 not in index.search("zo")
+    assert 110 in index.search("ad")
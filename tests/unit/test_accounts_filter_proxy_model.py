@@ -0,0 +1,72 @@
+import pytest
+from PyQt6.QtCore import Qt
+
+from ui.accounts.accounts_filter_proxy_model import AccountsFilterProxyModel
+from ui.accounts.accounts_table_model import AccountsTableModel
+
+DESCENDING = Qt.SortOrder.DescendingOrder
+LAST_NAME = 3
+NAMES = ("Smith", "Jones", "Smyth", "Brown")
+
+
+def rows(ids) -> list:
+    return [
+        (
+            id,
+            1000 + id,
+            "Emma",
+            NAMES[id % len(NAMES)],
+            f"e{id}@job.com",
+            "HR",
+            1,
+        )
+        for id in ids
+    ]
+
+
+def ids(proxy: AccountsFilterProxyModel) -> list:
+    return [proxy.index(row, 0).data() for row in range(proxy.rowCount())]
+
+
+@pytest.fixture
+def proxy(qapp):
+    model = AccountsTableModel()
+    model.append_rows(rows(range(1, 9)))
+    proxy = AccountsFilterProxyModel()
+    proxy.setSourceModel(model)
+    return proxy
+
+
+def test_filter_follows_the_source_order(proxy):
+    proxy.set_filter_text("sm")
+    assert ids(proxy) == [2, 4, 6, 8]
+
+    proxy.sort(0, DESCENDING)
+    assert ids(proxy) == [8, 6, 4, 2]
+    assert proxy.source_rows([0, 3]) == [0, 6]
+
+    proxy.set_filter_text("")
+    assert ids(proxy) == list(range(8, 0, -1))
+
+
+def test_edits_and_new_rows_update_the_filter(proxy):
+    proxy.set_filter_text("sm")
+    model = proxy.sourceModel()
+
+    model.setData(model.index(0, LAST_NAME), "Smart")
+    proxy.set_filter_text("sma")
+    assert ids(proxy) == [1]
+
+    model.append_rows(
+        rows([9, 10]) + [(11, 1011, "Emma", "Smart", "e@job.com", "HR", 1)]
+    )
+    assert ids(proxy) == [1, 11]
+
+
+def test_removed_rows_leave_the_filter(proxy):
+    proxy.set_filter_text("sm")
+    model = proxy.sourceModel()
+
+    model.remove_rows([1, 2, 3])
+    assert ids(proxy) == [6, 8]
+    assert proxy.mapFromSource(model.index(2, 0)).row() == 0
@@ -0,0 +1,190 @@
+from PyQt6.QtCore import Qt
+
+from ui.accounts.accounts_table_model import MAX_REMOVE_RUNS, AccountsTableModel
+
+DESCENDING = Qt.SortOrder.DescendingOrder
+FIRST_NAME = 2
+
+
+def rows(ids) -> list:
+    return [
+        (id, 1000 + id, f"Name{id:03}", "Smith", f"smith{id}@job.com", "HR", 1)
+        for id in ids
+    ]
+
+
+def column(model: AccountsTableModel, number: int) -> list:
+    return [model.index(row, number).data() for row in range(model.rowCount())]
+
+
+def test_replace_rows_when_sorted_in_memory_announces_the_rows_it_adds(qapp):
+    model = AccountsTableModel()
+    model.append_rows(rows(range(1, 4)))
+    model.sort_by([(0, DESCENDING)])
+    counts = []
+    model.rowsInserted.connect(
+        lambda parent, first, last: counts.append((last + 1, model.rowCount()))
+    )
+
+    model.replace_rows(rows(range(10, 16)))
+
+    assert counts == [(6, 6)]
+    assert column(model, 0) == list(range(10, 16))
+
+
+def test_replace_rows_with_fewer_rows(qapp):
+    model = AccountsTableModel()
+    model.append_rows(rows(range(1, 6)))
+    model.sort_by([(0, DESCENDING)])
+
+    model.replace_rows(rows(range(10, 12)))
+
+    assert column(model, 0) == [10, 11]
+
+
+def test_assign_ids_is_one_data_changed_on_the_id_column(qapp):
+    model = AccountsTableModel()
+    model.append_rows(rows(range(1, 4)))
+    model.add_empty_rows(3)
+    assert column(model, 0) == [1, 2, 3, None, None, None]
+    changes = []
+    model.dataChanged.connect(
+        lambda top_left, bottom_right, roles: changes.append(
+            (
+                top_left.row(),
+                top_left.column(),
+                bottom_right.row(),
+                bottom_right.column(),
+            )
+        )
+    )
+
+    model.assign_ids({-1: 7, -3: 9})
+
+    assert changes == [(3, 0, 5, 0)]
+    assert column(model, 0) == [1, 2, 3, 7, None, 9]
+    model.assign_ids({-2: 8})
+    assert column(model, 0) == [1, 2, 3, 7, 8, 9]
+
+
+def test_assigned_ids_sort_and_update_from_changes(qapp):
+    model = AccountsTableModel()
+    model.append_rows(rows(range(1, 4)))
+    model.add_empty_rows(1)
+    model.assign_ids({-1: 4})
+    model.sort_by([(0, DESCENDING)])
+    assert column(model, 0) == [4, 3, 2, 1]
+
+    (changed,) = rows([4])
+    model.apply_changes([changed], [2])
+    assert column(model, 0) == [4, 3, 1]
+    assert model.index(0, FIRST_NAME).data() == "Name004"
+
+
+def test_edits_keep_the_in_memory_sort_cache_current(qapp):
+    model = AccountsTableModel()
+    model.append_rows(rows(range(1, 6)))
+    model.sort_by([(FIRST_NAME, DESCENDING)])
+    model.setData(model.index(4, FIRST_NAME), "Zed")
+
+    model.sort_by([(FIRST_NAME, DESCENDING)])
+    assert column(model, FIRST_NAME)[0] == "Zed"
+    assert column(model, 0) == [1, 5, 4, 3, 2]
+
+
+def test_sort_by_country_uses_the_names_shown(qapp):
+    model = AccountsTableModel()
+    model.append_rows(
+        [row[:6] + (country,) for row, country in zip(rows(range(1, 5)), (1, 2, 3, 9))]
+    )
+    names = {1: "Spain", 2: "Austria", 3: "Peru"}
+    model.set_sort_labels(6, lambda: names)
+
+    model.sort(6)
+    # Ids without a name sort last, like empty values
+    assert column(model, 6) == [2, 3, 1, 9]
+    model.sort(6, DESCENDING)
+    assert column(model, 6) == [1, 3, 2, 9]
+
+    # The cached order takes in edits by name as well
+    model.setData(model.index(3, 6), 3)
+    model.sort(6)
+    assert column(model, 6) == [2, 3, 3, 1]
+
+
+def test_empty_values_sort_last_in_both_directions(qapp):
+    model = AccountsTableModel()
+    countries = (2, None, 1, None, 2)
+    model.append_rows(
+        [row[:6] + (country,) for row, country in zip(rows(range(1, 6)), countries)]
+    )
+
+    model.sort(6)
+    assert column(model, 0) == [3, 1, 5, 2, 4]
+    model.sort(6, DESCENDING)
+    assert column(model, 0) == [5, 1, 3, 4, 2]
+    model.sort_by([(6, DESCENDING), (0, Qt.SortOrder.AscendingOrder)])
+    assert column(model, 0) == [1, 5, 3, 2, 4]
+
+
+def signals(model: AccountsTableModel) -> list:
+    emitted = []
+    model.rowsRemoved.connect(
+        lambda parent, first, last: emitted.append(("removed", first, last))
+    )
+    model.modelReset.connect(lambda: emitted.append(("reset",)))
+    return emitted
+
+
+def test_remove_rows_is_one_signal_per_run_last_run_first(qapp):
+    model = AccountsTableModel()
+    model.append_rows(rows(range(1, 11)))
+    emitted = signals(model)
+
+    model.remove_rows([1, 2, 3, 6, 7])
+
+    assert emitted == [("removed", 6, 7), ("removed", 1, 3)]
+    assert column(model, 0) == [1, 5, 6, 9, 10]
+    assert model.order is None
+    assert len(model.store) == 5
+
+
+def test_remove_rows_when_sorted_in_memory(qapp):
+    model = AccountsTableModel()
+    model.append_rows(rows(range(1, 11)))
+    model.sort_by([(0, DESCENDING)])
+    emitted = signals(model)
+
+    # Shown as 10, 9, ... 1: removes 9, 8 and 4
+    model.remove_rows([1, 2, 6])
+
+    assert emitted == [("removed", 6, 6), ("removed", 1, 2)]
+    assert column(model, 0) == [10, 7, 6, 5, 3, 2, 1]
+    assert len(model.store) == 7
+
+
+def test_remove_rows_in_more_runs_than_the_limit_resets(qapp):
+    model = AccountsTableModel()
+    count = 4 * MAX_REMOVE_RUNS
+    model.append_rows(rows(range(1, count + 1)))
+    model.sort_by([(0, DESCENDING)])
+    emitted = signals(model)
+
+    # Every other row: one run per removed row
+    model.remove_rows(range(0, count, 2))
+
+    assert emitted == [("reset",)]
+    assert column(model, 0) == list(range(count - 1, 0, -2))
+    assert len(model.store) == count // 2
+
+
+def test_remove_rows_at_the_run_limit_still_signals_each_run(qapp):
+    model = AccountsTableModel()
+    model.append_rows(rows(range(1, 2 * MAX_REMOVE_RUNS + 1)))
+    emitted = signals(model)
+
+    model.remove_rows(range(0, 2 * MAX_REMOVE_RUNS, 2))
+
+    assert len(emitted) == MAX_REMOVE_RUNS
+    assert ("reset",) not in emitted
+    assert column(model, 0) == list(range(2, 2 * MAX_REMOVE_RUNS + 1, 2))
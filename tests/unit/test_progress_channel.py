@@ -0,0 +1,71 @@
+from threading import Thread
+
+from ui.file_rename_threading import PROGRESS_RATE_HZ, ProgressChannel
+
+
+def channel_signals(channel: ProgressChannel):
+    values, lines = [], []
+    channel.value_changed.connect(values.append)
+    channel.lines_added.connect(lines.append)
+    return values, lines
+
+
+def test_posts_are_coalesced_to_the_tick_rate(qapp):
+    channel = ProgressChannel()
+    values, lines = channel_signals(channel)
+    interval = channel.timer.interval()
+    assert interval == 1000 // PROGRESS_RATE_HZ
+
+    # One simulated second: a post every millisecond, and a timer tick
+    # whenever the fake clock crosses an interval
+    for now_ms in range(1, 1001):
+        channel.post(now_ms, f"file {now_ms}")
+        if now_ms % interval == 0:
+            channel.timer.timeout.emit()
+
+    ticks = 1000 // interval
+    assert len(values) == ticks
+    assert values[0] == interval
+    assert values == sorted(values)
+    assert len(lines) == ticks
+    assert sum(len(batch) for batch in lines) == ticks * interval
+
+
+def test_idle_ticks_emit_nothing(qapp):
+    channel = ProgressChannel()
+    values, lines = channel_signals(channel)
+    channel.post(1)
+    channel.timer.timeout.emit()
+    channel.timer.timeout.emit()
+    assert values == [1]
+    assert lines == []
+
+
+def test_stop_delivers_the_final_value(qapp):
+    channel = ProgressChannel()
+    values, lines = channel_signals(channel)
+    channel.start()
+    for value in range(1, 101):
+        channel.post(value)
+    channel.post(line="done")
+
+    # Before any tick of the real timer
+    channel.stop()
+
+    assert values == [100]
+    assert lines == [["done"]]
+    assert not channel.timer.isActive()
+
+
+def test_posts_from_another_thread(qapp):
+    channel = ProgressChannel()
+    values, lines = channel_signals(channel)
+    worker = Thread(
+        target=lambda: [channel.post(value, str(value)) for value in range(500)]
+    )
+    worker.start()
+    worker.join()
+
+    channel.timer.timeout.emit()
+    assert values == [499]
+    assert lines == [[str(value) for value in range(500)]]
@@ -0,0 +1,54 @@
+import time
+import uuid
+
+import pytest
+
+from infrastructure.repository.persistent import uuid7 as uuid7_module
+from infrastructure.repository.persistent.uuid7 import uuid7
+
+NOW_MS = 1_700_000_000_000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A clock that stands still at NOW_MS until moved."""
+    now = [NOW_MS]
+    monkeypatch.setattr(uuid7_module, "_last_ms", 0)
+    monkeypatch.setattr(uuid7_module, "_counter", 0)
+    monkeypatch.setattr(time, "time_ns", lambda: now[0] * 1_000_000)
+    return now
+
+
+def timestamp_ms(value: uuid.UUID) -> int:
+    return value.int >> 80
+
+
+def test_version_and_variant_bits():
+    for _ in range(100):
+        value = uuid7()
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+
+
+def test_starts_with_the_unix_time_in_milliseconds(clock):
+    assert timestamp_ms(uuid7()) == NOW_MS
+    clock[0] += 5
+    assert timestamp_ms(uuid7()) == NOW_MS + 5
+
+
+def test_ids_made_in_one_millisecond_keep_their_order(clock):
+    values = [uuid7() for _ in range(1000)]
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+
+
+def test_counter_overflow_moves_to_the_next_millisecond(clock):
+    values = [uuid7() for _ in range(5000)]
+    assert values == sorted(values)
+    assert timestamp_ms(values[-1]) == NOW_MS + 1
+
+
+def test_ids_never_go_backwards_with_the_clock(clock):
+    first = uuid7()
+    clock[0] -= 1000
+    assert uuid7() > first